@@ -0,0 +1,133 @@
+'''
+One worker thread that drives every actuator output pin.
+
+Callers request a desired state per pin with ActuatorDriver.request(). The
+worker sleeps on a condition variable (no polling) and, when woken, takes all
+pending requests at once. Only the last request per pin survives, and a pin is
+only written when its state actually changes, so bursts of redundant on/off
+commands collapse into at most one GPIO write per pin.
+
+Every applied transition is timestamped and kept in a short history; listeners
+can subscribe to it (SensorsController feeds it into the metrics registry).
+'''
+import threading
+import time
+from collections import deque
+from typing import Callable, NamedTuple
+
+from .backend import HardwareBackend, get_backend
+
+
+class Transition(NamedTuple):
+    pin: int
+    on: bool
+    # time.monotonic_ns() when the state was requested and when the pin was written
+    requested_ns: int
+    applied_ns: int
+    # Backend time of the write (virtual time on a simulated clock)
+    at: float
+
+    @property
+    def latency_ns(self) -> int:
+        return self.applied_ns - self.requested_ns
+
+
+class ActuatorDriver(threading.Thread):
+    def __init__(self, gpio: HardwareBackend | None = None, history_size: int = 1000) -> None:
+        super().__init__(daemon=True, name="actuator-driver")
+        self.gpio: HardwareBackend = gpio or get_backend()
+        if self.gpio.getmode() is None:
+            self.gpio.setmode(self.gpio.BCM)
+            self.gpio.setwarnings(False)
+        self._cond: threading.Condition = threading.Condition()
+        self._pending: dict[int, tuple[bool, int]] = {}
+        self._stopping: bool = False
+        # pin -> (level when on, level when off)
+        self._levels: dict[int, tuple[int, int]] = {}
+        self.states: dict[int, bool] = {}
+        self.transitions: deque[Transition] = deque(maxlen=history_size)
+        self.coalesced: int = 0
+        self.listeners: list[Callable[[Transition], None]] = []
+
+    def register(self, pin: int, active_low: bool = False) -> None:
+        '''Set up `pin` as an output, initially off'''
+        on_level, off_level = (self.gpio.LOW, self.gpio.HIGH) if active_low else (self.gpio.HIGH, self.gpio.LOW)
+        with self._cond:
+            self._levels[pin] = (on_level, off_level)
+            self.states[pin] = False
+        self.gpio.setup(pin, self.gpio.OUT, initial=off_level)
+
+    def ensure_started(self) -> None:
+        if not self.is_alive() and not self._stopping:
+            try:
+                self.start()
+            except RuntimeError:
+                # Started concurrently by another caller
+                pass
+
+    def request(self, pin: int, on: bool) -> None:
+        with self._cond:
+            if pin not in self._levels:
+                raise ValueError(f"Pin {pin} is not registered with the actuator driver")
+            if pin in self._pending:
+                self.coalesced += 1
+            self._pending[pin] = (on, time.monotonic_ns())
+            self._cond.notify()
+
+    def run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    _ = self._cond.wait()
+                batch = self._pending
+                self._pending = {}
+                stopping = self._stopping
+            for pin, (on, requested_ns) in batch.items():
+                self._apply(pin, on, requested_ns)
+            if stopping:
+                break
+        # Leave every actuator off
+        for pin, (_, off_level) in list(self._levels.items()):
+            self.gpio.output(pin, off_level)
+            self.states[pin] = False
+
+    def _apply(self, pin: int, on: bool, requested_ns: int) -> None:
+        if self.states.get(pin) == on:
+            self.coalesced += 1
+            return
+        on_level, off_level = self._levels[pin]
+        self.gpio.output(pin, on_level if on else off_level)
+        transition = Transition(pin, on, requested_ns, time.monotonic_ns(), self.gpio.time())
+        self.states[pin] = on
+        self.transitions.append(transition)
+        for listener in self.listeners:
+            try:
+                listener(transition)
+            except Exception as e:
+                print(f"[ERROR] Actuator transition listener failed: {e}")
+
+    def stop(self, timeout: float | None = 1.0) -> None:
+        '''Switch every pin off and end the worker; returns once it has exited'''
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+
+
+_driver: ActuatorDriver | None = None
+_driver_lock = threading.Lock()
+
+
+def get_driver() -> ActuatorDriver:
+    '''The shared driver for the current backend, started on first use'''
+    global _driver
+    with _driver_lock:
+        backend = get_backend()
+        if _driver is None or _driver.gpio is not backend or _driver._stopping:
+            if _driver is not None:
+                _driver.stop()
+            _driver = ActuatorDriver(backend)
+        driver = _driver
+    driver.ensure_started()
+    return driver
@@ -1,6 +1,6 @@
 from typing import Any
 
-device0 = "/sys/bus/iio/devices/iio:device0"
+from .backend import get_backend
 
 def readFirstLine(filename: str) -> tuple[bool, Any]:
     try:
@@ -15,6 +15,7 @@ def readFirstLine(filename: str) -> tuple[bool, Any]:
         return False,0
 
 def read_air_sensor_data() -> tuple[int, int]:
+    device0 = get_backend().iio_device()
     Flag1, Temperature = readFirstLine(device0+"/in_temp_input")
     Flag2, Humidity = readFirstLine(device0+"/in_humidityrelative_input")
     if Flag1 and Flag2:
@@ -1,15 +1,12 @@
 from enum import IntEnum
-import spidev
 
-# Create SPI object
-spi = spidev.SpiDev()
-spi.open(0, 0)  # Open bus 0, device 0 (CE0)
-spi.max_speed_hz = 1350000
+from .backend import get_backend
 
 # Function to read a channel (0–7)
+# SPI is opened by the backend on the first transfer, not at import
 def read_channel(channel):
     # MCP3008 protocol: start bit, single-ended bit, channel (3 bits)
-    adc = spi.xfer2([1, (8 + channel) << 4, 0])
+    adc = get_backend().spi_xfer2([1, (8 + channel) << 4, 0])
     data = ((adc[1] & 3) << 8) + adc[2]
     return data
 
@@ -28,5 +25,5 @@ class Channel(IntEnum):
 #         time.sleep(0.5)
 
 # except KeyboardInterrupt:
-#     spi.close()
+#     get_backend().cleanup()
 #     print("SPI connection closed.")
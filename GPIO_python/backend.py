@@ -0,0 +1,147 @@
+'''
+Pluggable hardware backend.
+
+The sensor and actuator modules in this package talk to the hardware only through
+the object returned by get_backend(). It mirrors the small part of the RPi.GPIO
+API we use (setmode/setup/output/input/cleanup and the pin constants), plus the
+SPI transfer used by the MCP3008 ADC, the IIO device directory of the DHT11 and
+the time functions used by the ultrasonic sensor.
+
+By default the Raspberry Pi backend is used. RPi.GPIO and spidev are imported
+when it is first created, and SPI is opened on the first transfer, so importing
+this package never touches the hardware.
+
+Set PLANT_HARDWARE_BACKEND=sim, or call set_backend() with a
+GPIO_python.simulated.SimulatedBackend, to run without a Pi.
+'''
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Any
+
+BACKEND_ENV_VAR = "PLANT_HARDWARE_BACKEND"
+IIO_DEVICE0 = "/sys/bus/iio/devices/iio:device0"
+
+
+class HardwareBackend(ABC):
+    # Same meaning as the RPi.GPIO constants; backends may use different values
+    BCM: int = 11
+    OUT: int = 0
+    IN: int = 1
+    LOW: int = 0
+    HIGH: int = 1
+
+    @abstractmethod
+    def setmode(self, mode: int) -> None:
+        pass
+
+    @abstractmethod
+    def getmode(self) -> int | None:
+        pass
+
+    @abstractmethod
+    def setwarnings(self, enabled: bool) -> None:
+        pass
+
+    @abstractmethod
+    def setup(self, pin: int, mode: int, initial: int | None = None) -> None:
+        pass
+
+    @abstractmethod
+    def output(self, pin: int, value: int | bool) -> None:
+        pass
+
+    @abstractmethod
+    def input(self, pin: int) -> int:
+        pass
+
+    @abstractmethod
+    def cleanup(self) -> None:
+        pass
+
+    @abstractmethod
+    def spi_xfer2(self, data: list[int]) -> list[int]:
+        '''Full-duplex SPI transfer on bus 0, device 0 (the MCP3008)'''
+        pass
+
+    @abstractmethod
+    def iio_device(self) -> str:
+        '''Directory of the DHT11 IIO device (contains in_temp_input etc.)'''
+        pass
+
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+
+class RaspberryPiBackend(HardwareBackend):
+    def __init__(self) -> None:
+        import RPi.GPIO as GPIO
+        self.GPIO: Any = GPIO
+        self.BCM = GPIO.BCM
+        self.OUT = GPIO.OUT
+        self.IN = GPIO.IN
+        self.LOW = GPIO.LOW
+        self.HIGH = GPIO.HIGH
+        self._spi: Any = None
+
+    def setmode(self, mode: int) -> None:
+        self.GPIO.setmode(mode)
+
+    def getmode(self) -> int | None:
+        return self.GPIO.getmode()
+
+    def setwarnings(self, enabled: bool) -> None:
+        self.GPIO.setwarnings(enabled)
+
+    def setup(self, pin: int, mode: int, initial: int | None = None) -> None:
+        if initial is None:
+            self.GPIO.setup(pin, mode)
+        else:
+            self.GPIO.setup(pin, mode, initial=initial)
+
+    def output(self, pin: int, value: int | bool) -> None:
+        self.GPIO.output(pin, value)
+
+    def input(self, pin: int) -> int:
+        return self.GPIO.input(pin)
+
+    def cleanup(self) -> None:
+        self.GPIO.cleanup()
+        if self._spi is not None:
+            self._spi.close()
+            self._spi = None
+
+    def spi_xfer2(self, data: list[int]) -> list[int]:
+        if self._spi is None:
+            import spidev
+            spi = spidev.SpiDev()
+            spi.open(0, 0)  # Open bus 0, device 0 (CE0)
+            spi.max_speed_hz = 1350000
+            self._spi = spi
+        return self._spi.xfer2(data)
+
+    def iio_device(self) -> str:
+        return IIO_DEVICE0
+
+
+_backend: HardwareBackend | None = None
+
+
+def get_backend() -> HardwareBackend:
+    global _backend
+    if _backend is None:
+        if os.environ.get(BACKEND_ENV_VAR, "").lower() in ("sim", "simulated"):
+            from .simulated import SimulatedBackend
+            _backend = SimulatedBackend()
+        else:
+            _backend = RaspberryPiBackend()
+    return _backend
+
+
+def set_backend(backend: HardwareBackend | None) -> None:
+    '''Replace the process-wide backend; None restores lazy default selection'''
+    global _backend
+    _backend = backend
@@ -1,10 +1,19 @@
-import RPi.GPIO as GPIO
-import time
-
-def get_distance() -> float:
+from .backend import get_backend
+
+# Seconds to wait for the echo to start before giving up; the HC-SR04 answers
+# within a millisecond, so this only trips when the sensor is disconnected
+ECHO_TIMEOUT = 0.1
+TRIG_PIN = 23
+ECHO_PIN = 24
+
+def get_distance(trig: int = TRIG_PIN, echo: int = ECHO_PIN) -> float:
+    GPIO = get_backend()
+    # Bound once so the busy-wait loops below cost the same as calling the modules directly
+    gpio_input = GPIO.input
+    now = GPIO.time
     # Pin setup
-    TRIG = 23
-    ECHO = 24
+    TRIG = trig
+    ECHO = echo
 
     pulse_start = 0
     pulse_end = 0
@@ -13,19 +22,22 @@ def get_distance() -> float:
     GPIO.setup(ECHO, GPIO.IN)
     # Ensure trigger is low
     GPIO.output(TRIG, False)
-    time.sleep(0.05)  # Let sensor settle
+    GPIO.sleep(0.05)  # Let sensor settle
 
     # Send 10µs pulse to trigger
     GPIO.output(TRIG, True)
-    time.sleep(0.00001)
+    GPIO.sleep(0.00001)
     GPIO.output(TRIG, False)
 
     # Wait for echo to go high and measure time
-    while GPIO.input(ECHO) == 0:
-        pulse_start = time.time()
-
-    while GPIO.input(ECHO) == 1:
-        pulse_end = time.time()
+    waiting_since = now()
+    while gpio_input(ECHO) == 0:
+        pulse_start = now()
+        if pulse_start - waiting_since > ECHO_TIMEOUT:
+            raise TimeoutError("No echo from the ultrasonic sensor")
+
+    while gpio_input(ECHO) == 1:
+        pulse_end = now()
 
     # Calculate distance (speed of sound = 34300 cm/s)
     pulse_duration = pulse_end - pulse_start
@@ -1,43 +1,40 @@
 import threading
 import time
-import RPi.GPIO as GPIO
+from datetime import datetime
+
+from plant_module.mqtt_client.control_rules import DEFAULT_RULES, RuleEngine
 
 from .distance_sensor import get_distance
 from .air_temp_moisture import read_air_sensor_data
 from .analog_inputs import read_channel, Channel
-from .relay import RelayThread
-from .motor import MotorThread
+from .relay import Relay
+from .motor import Motor
+from .actuator import get_driver
+from .backend import get_backend
+from .sensor_bus import SensorBus
 
+GPIO = get_backend()
 GPIO.setmode(GPIO.BCM)
 GPIO.setwarnings(False)
 
-relay_thread = RelayThread()
-motor_thread = MotorThread()
-
-relay_thread.start()
-motor_thread.start()
+relay = Relay()
+motor = Motor()
+actuators = {"water_pump": motor, "light_bulb": relay}
+rule_engine = RuleEngine(DEFAULT_RULES)
 
 READ_INTERVAL = 1  # seconds between sensor reads
+RULE_TICK = 1  # seconds between re-evaluations of the rules while no reading changes
 RUNNING = True
 
-# Shared sensor data
-sensor_data = {
-    "distance": None,
-    "temperature": None,
-    "humidity": None,
-    "soil_moisture": None,
-    "gas_quality": None,
-    "light": None,
-}
-data_lock = threading.Lock()
+# Every poll function publishes its readings here as soon as they are read;
+# subscribers are told about values that changed
+sensor_bus = SensorBus()
 
 def poll_distance():
     global RUNNING
     while RUNNING:
         try:
-            distance = get_distance()
-            with data_lock:
-                sensor_data["distance"] = distance
+            sensor_bus.publish(water_level_sensor=get_distance())
             time.sleep(READ_INTERVAL)
         except Exception as e:
             print(f"[ERROR] Distance sensor: {e}")
@@ -49,9 +46,7 @@ def poll_air_sensor():
     while RUNNING:
         try:
             temp, hum = read_air_sensor_data()
-            with data_lock:
-                sensor_data["temperature"] = temp
-                sensor_data["humidity"] = hum
+            sensor_bus.publish(temperature_sensor=temp, air_humidity_sensor=hum)
             time.sleep(READ_INTERVAL)
         except Exception as e:
             print(f"[ERROR] Air sensor: {e}")
@@ -62,49 +57,44 @@ def poll_analog():
     global RUNNING
     while RUNNING:
         try:
-            soil = read_channel(Channel.SOIL_MOISTURE_SENSOR)
-            gas = read_channel(Channel.GAS_QUALITY_SENSOR)
-            light = read_channel(Channel.LIGHT_SENSOR)
-            with data_lock:
-                sensor_data["soil_moisture"] = soil
-                sensor_data["gas_quality"] = gas
-                sensor_data["light"] = light
+            # Publish each channel right away so rules on it don't wait for the others
+            sensor_bus.publish(soil_moisture_sensor=read_channel(Channel.SOIL_MOISTURE_SENSOR))
+            sensor_bus.publish(air_quality_sensor=read_channel(Channel.GAS_QUALITY_SENSOR))
+            sensor_bus.publish(light_sensor=read_channel(Channel.LIGHT_SENSOR))
             time.sleep(READ_INTERVAL)
         except Exception as e:
             print(f"[ERROR] Analog sensors: {e}")
             time.sleep(2)
 
-def control_logic():
+# control_logic runs on the bus thread and on the main thread's RULE_TICK
+rules_lock = threading.Lock()
+
+def control_logic(snapshot, changed):
     """
-    This runs in the main thread — decides when to turn on/off actuators.
-    Example: turn on relay if distance < threshold.
+    Called by the sensor bus whenever a reading changes — decides when to turn on/off actuators.
+    The thresholds live in control_rules.DEFAULT_RULES; actuators are only
+    commanded when the rules change their desired state. It is also called
+    every RULE_TICK seconds, since minimum on/off times and daily windows run
+    out while the readings stay the same.
     """
-    while RUNNING:
-        with data_lock:
-            distance = sensor_data["distance"]
-            temperature = sensor_data["temperature"]
-            humidity = sensor_data["humidity"]
-            soil = sensor_data["soil_moisture"]
-            gas = sensor_data["gas_quality"]
-            light = sensor_data["light"]
+    with rules_lock:
+        for actuator, on in rule_engine.evaluate(snapshot, datetime.now()):
+            if on:
+                actuators[actuator].turn_on()
+            else:
+                actuators[actuator].turn_off()
 
-        print(f"[DATA] Distance: {distance} cm, Temp: {temperature} °C, Humidity: {humidity} %, Soil: {soil}, Gas: {gas}, Light: {light}")
 
-        if soil is not None and soil > 800:
-            motor_thread.turn_on()
-        else:
-            motor_thread.turn_off()
-
-        if light is not None and light < 600:
-            relay_thread.turn_on()
-        else:
-            relay_thread.turn_off()
-
-        time.sleep(1) # control how often it prints
+def log_data(snapshot, changed):
+    get = snapshot.get
+    print(f"[DATA] Distance: {get('water_level_sensor')} cm, Temp: {get('temperature_sensor')} °C, Humidity: {get('air_humidity_sensor')} %, Soil: {get('soil_moisture_sensor')}, Gas: {get('air_quality_sensor')}, Light: {get('light_sensor')}")
 
 
 if __name__ == "__main__":
     try:
+        sensor_bus.subscribe(control_logic, fields={rule.sensor for rule in rule_engine.rules})
+        sensor_bus.subscribe(log_data)
+
         threads = [
             threading.Thread(target=poll_distance, daemon=True),
             threading.Thread(target=poll_air_sensor, daemon=True),
@@ -116,13 +106,14 @@ if __name__ == "__main__":
 
         print("Sensor polling started.")
 
-        control_logic()
+        while RUNNING:
+            time.sleep(RULE_TICK)
+            control_logic(sensor_bus.snapshot(), frozenset())
 
     except KeyboardInterrupt:
         print("\n🛑 Stopping...")
         RUNNING = False
-        relay_thread.stop()
-        motor_thread.stop()
-        time.sleep(1)
+        sensor_bus.stop()
+        get_driver().stop()
         GPIO.cleanup()
-        print("✅ Clean exit.")
\ No newline at end of file
+        print("✅ Clean exit.")
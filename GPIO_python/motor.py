@@ -1,40 +1,23 @@
-import RPi.GPIO as GPIO
-import queue
-import threading
+from .actuator import ActuatorDriver, get_driver
 
 PWM_PIN = 18
 
-class MotorThread(threading.Thread):
-    def __init__(self):
-        super().__init__(daemon=True)
-        self.cmd_queue = queue.Queue()
-        self.running = True
-        GPIO.setup(PWM_PIN, GPIO.OUT)
-        GPIO.output(PWM_PIN, GPIO.LOW)
+class Motor:
+    '''Water pump motor on PWM_PIN (or ``pin``), driven by the shared ActuatorDriver'''
+    def __init__(self, driver: ActuatorDriver | None = None, pin: int = PWM_PIN):
+        self.driver = driver or get_driver()
+        self.pin = pin
+        self.driver.register(pin)  # LOW = off
 
-    def run(self):
-        while self.running:
-            try:
-                cmd = self.cmd_queue.get(timeout=0.5)
-                if cmd == "on":
-                    GPIO.output(PWM_PIN, GPIO.HIGH)   # 3.3V
-                elif cmd == "off":
-                    GPIO.output(PWM_PIN, GPIO.LOW)    # 0V
-                elif cmd == "exit":
-                    GPIO.output(PWM_PIN, GPIO.LOW)
-                    break
-            except queue.Empty:
-                continue
-
-        # cleanup
-        GPIO.output(PWM_PIN, GPIO.LOW)
+    def start(self):
+        self.driver.ensure_started()
 
     def turn_on(self):
-        self.cmd_queue.put("on")
+        self.driver.request(self.pin, True)   # 3.3V
 
     def turn_off(self):
-        self.cmd_queue.put("off")
+        self.driver.request(self.pin, False)  # 0V
 
     def stop(self):
-        self.cmd_queue.put("exit")
-        self.running = False
+        # The driver is shared with other actuators; only leave this one off
+        self.turn_off()
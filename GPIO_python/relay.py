@@ -1,42 +1,23 @@
-import RPi.GPIO as GPIO
-import queue
-import threading
+from .actuator import ActuatorDriver, get_driver
 
 RELAY_PIN = 12
 
-class RelayThread(threading.Thread):
-    def __init__(self):
-        super().__init__(daemon=True)
-        if GPIO.getmode() is None:
-            GPIO.setmode(GPIO.BCM)
-            GPIO.setwarnings(False)
-        self.cmd_queue = queue.Queue()
-        self.running = True
-        GPIO.setup(RELAY_PIN, GPIO.OUT, initial=GPIO.HIGH)  # HIGH = off (active-low relay)
+class Relay:
+    '''Light bulb relay on RELAY_PIN (or ``pin``), driven by the shared ActuatorDriver'''
+    def __init__(self, driver: ActuatorDriver | None = None, pin: int = RELAY_PIN):
+        self.driver = driver or get_driver()
+        self.pin = pin
+        self.driver.register(pin, active_low=True)  # HIGH = off (active-low relay)
 
-    def run(self):
-        while self.running:
-            try:
-                cmd = self.cmd_queue.get(timeout=0.5)
-                if cmd == "on":
-                    GPIO.output(RELAY_PIN, GPIO.LOW)
-                elif cmd == "off":
-                    GPIO.output(RELAY_PIN, GPIO.HIGH)
-                elif cmd == "exit":
-                    GPIO.output(RELAY_PIN, GPIO.HIGH)
-                    break
-            except queue.Empty:
-                continue
-
-        # Cleanup on exit
-        GPIO.output(RELAY_PIN, GPIO.HIGH)
+    def start(self):
+        self.driver.ensure_started()
 
     def turn_on(self):
-        self.cmd_queue.put("on")
+        self.driver.request(self.pin, True)
 
     def turn_off(self):
-        self.cmd_queue.put("off")
+        self.driver.request(self.pin, False)
 
     def stop(self):
-        self.cmd_queue.put("exit")
-        self.running = False
+        # The driver is shared with other actuators; only leave this one off
+        self.turn_off()
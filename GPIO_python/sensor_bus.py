@@ -0,0 +1,102 @@
+'''
+Change notification between sensor samplers and whoever uses their values.
+
+Samplers call SensorBus.publish() as soon as they have read a value. The bus
+keeps the latest value of every field and wakes a single delivery thread,
+which calls each subscriber whose fields changed with the new snapshot. Nothing
+polls: a subscriber (control rules, a publisher, a logger) reacts as soon as
+the read that changed its input has finished.
+
+Values that did not change are not delivered again, and if several publishes
+arrive while subscribers are busy they are merged into one delivery, so slow
+subscribers never hold up the samplers.
+'''
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Iterable
+
+Snapshot = dict[str, Any]
+Subscriber = Callable[[Snapshot, frozenset[str]], None]
+
+
+class SensorBus(threading.Thread):
+    def __init__(self, history_size: int = 1000) -> None:
+        super().__init__(daemon=True, name="sensor-bus")
+        self._cond: threading.Condition = threading.Condition()
+        self._values: Snapshot = {}
+        self._changed: set[str] = set()
+        # time.monotonic_ns() of the oldest undelivered change
+        self._pending_since: int | None = None
+        self._stopping: bool = False
+        self._subscribers: list[tuple[Subscriber, frozenset[str] | None]] = []
+        self.deliveries: int = 0
+        # Publish-to-delivery latency of recent deliveries, in nanoseconds
+        self.latencies_ns: deque[int] = deque(maxlen=history_size)
+
+    def subscribe(self, subscriber: Subscriber, fields: Iterable[str] | None = None) -> None:
+        '''Call `subscriber(snapshot, changed)` whenever any of `fields` (default: any field) changes'''
+        with self._cond:
+            self._subscribers.append((subscriber, None if fields is None else frozenset(fields)))
+        self.ensure_started()
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._cond:
+            self._subscribers = [entry for entry in self._subscribers if entry[0] is not subscriber]
+
+    def publish(self, **values: Any) -> None:
+        '''Record new sensor values; only fields whose value changed are delivered'''
+        with self._cond:
+            changed = False
+            for field, value in values.items():
+                if field not in self._values or self._values[field] != value:
+                    self._values[field] = value
+                    self._changed.add(field)
+                    changed = True
+            if changed:
+                if self._pending_since is None:
+                    self._pending_since = time.monotonic_ns()
+                self._cond.notify()
+
+    def snapshot(self) -> Snapshot:
+        with self._cond:
+            return dict(self._values)
+
+    def ensure_started(self) -> None:
+        if not self.is_alive() and not self._stopping:
+            try:
+                self.start()
+            except RuntimeError:
+                # Started concurrently by another caller
+                pass
+
+    def run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._changed and not self._stopping:
+                    _ = self._cond.wait()
+                if self._stopping:
+                    return
+                changed = frozenset(self._changed)
+                self._changed = set()
+                snapshot = dict(self._values)
+                pending_since = self._pending_since
+                self._pending_since = None
+                subscribers = list(self._subscribers)
+            if pending_since is not None:
+                self.latencies_ns.append(time.monotonic_ns() - pending_since)
+            for subscriber, fields in subscribers:
+                if fields is not None and fields.isdisjoint(changed):
+                    continue
+                try:
+                    subscriber(snapshot, changed)
+                except Exception as e:
+                    print(f"[ERROR] Sensor bus subscriber failed: {e}")
+            self.deliveries += 1
+
+    def stop(self, timeout: float | None = 1.0) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
@@ -0,0 +1,236 @@
+'''
+Simulated hardware backend for running the device code off the Raspberry Pi.
+
+- Virtual pins: every setup/output is recorded, with a timestamped history of
+  actuator output transitions that can be inspected afterwards.
+- ADC: answers MCP3008 SPI transfers from scripted per-channel signals.
+- Ultrasonic echo model: a falling edge on the trigger pin opens an echo window
+  whose length matches the scripted water distance. The pins are taken from
+  `ultrasonic_pins`, or else from setup: get_distance() sets up TRIG as an
+  output and then ECHO as the only input, so the input pin is the echo and the
+  output set up right before it is the trigger.
+- IIO file tree: a temporary directory laid out like the DHT11 IIO device whose
+  files are rewritten from scripted signals before each read.
+
+Signals are plain callables mapping seconds since the backend was created to a
+value, so they can be anything from a constant to a recorded trace. Time comes
+from `time_source`/`sleep`, which default to real time; pass the functions of a
+virtual clock to replay long periods quickly.
+'''
+import math
+import os
+import random
+import tempfile
+import time
+from collections import deque
+from typing import Callable
+
+from .backend import HardwareBackend
+from .analog_inputs import Channel
+
+Signal = Callable[[float], float | None]
+
+DAY = 24 * 3600.0
+# Ultrasonic pins until setup shows others
+TRIG_PIN = 23
+ECHO_PIN = 24
+# HC-SR04 delay between the trigger pulse and the start of the echo
+ECHO_DELAY = 0.0005
+# Simulated cost of one busy-wait poll of the echo pin
+ECHO_POLL_STEP = 0.00001
+
+
+def constant(value: float) -> Signal:
+    return lambda _: value
+
+
+def sine(mean: float, amplitude: float, period: float = DAY, phase: float = 0.0) -> Signal:
+    return lambda t: mean + amplitude * math.sin(2 * math.pi * (t + phase) / period)
+
+
+def sawtooth(start: float, end: float, period: float) -> Signal:
+    '''Linear drift from start to end, then reset, e.g. soil drying between waterings'''
+    return lambda t: start + (end - start) * ((t % period) / period)
+
+
+def clamp(signal: Signal, low: float, high: float) -> Signal:
+    def clamped(t: float) -> float | None:
+        value = signal(t)
+        return None if value is None else min(high, max(low, value))
+    return clamped
+
+
+def noisy(signal: Signal, sigma: float, seed: int = 0) -> Signal:
+    rng = random.Random(seed)
+    def with_noise(t: float) -> float | None:
+        value = signal(t)
+        return None if value is None else value + rng.gauss(0.0, sigma)
+    return with_noise
+
+
+def default_signals() -> dict[str, Signal]:
+    '''A plausible day: diurnal light and temperature, slowly drying soil, steady tank'''
+    return {
+        "soil_moisture": clamp(noisy(sawtooth(400, 900, 3 * DAY), 5, seed=1), 0, 1023),
+        "air_quality": clamp(noisy(constant(300), 10, seed=2), 0, 1023),
+        "light": clamp(sine(500, 450, DAY, phase=-DAY / 4), 0, 1023),
+        "temperature": sine(21, 3, DAY, phase=-DAY / 4),
+        "humidity": sine(50, 10, DAY),
+        "water_distance": clamp(noisy(constant(12), 0.3, seed=3), 0, 30),
+    }
+
+
+class SimulatedBackend(HardwareBackend):
+    def __init__(
+        self,
+        signals: dict[str, Signal] | None = None,
+        time_source: Callable[[], float] | None = None,
+        sleep: Callable[[float], None] | None = None,
+        history_size: int = 10000,
+        ultrasonic_pins: tuple[int, int] | None = None,
+    ) -> None:
+        self._time: Callable[[], float] = time_source or time.monotonic
+        self._sleep: Callable[[float], None] = sleep or time.sleep
+        self._t0: float = self._time()
+        self.signals: dict[str, Signal] = default_signals()
+        if signals:
+            self.signals.update(signals)
+
+        self.mode: int | None = None
+        self.pin_modes: dict[int, int] = {}
+        self.pin_values: dict[int, int] = {}
+        # (time, pin, value) for every output that changed a pin, except the ultrasonic trigger
+        self.history: deque[tuple[float, int, int]] = deque(maxlen=history_size)
+
+        # (trigger, echo); learned from setup() unless given
+        self.trigger_pin, self.echo_pin = ultrasonic_pins or (TRIG_PIN, ECHO_PIN)
+        self._learn_ultrasonic_pins: bool = ultrasonic_pins is None
+        self._last_output_setup: int | None = None
+        self._echo_window: tuple[float, float] | None = None
+        self._echo_highs: int = 0
+        self._iio_dir: tempfile.TemporaryDirectory[str] = tempfile.TemporaryDirectory(prefix="sim-iio-")
+        self._iio_written: dict[str, str] = {}
+
+    def elapsed(self) -> float:
+        '''Seconds since the backend was created, the argument passed to signals'''
+        return self._time() - self._t0
+
+    def _signal(self, name: str) -> float | None:
+        return self.signals[name](self.elapsed())
+
+    # GPIO
+
+    def setmode(self, mode: int) -> None:
+        self.mode = mode
+
+    def getmode(self) -> int | None:
+        return self.mode
+
+    def setwarnings(self, enabled: bool) -> None:
+        pass
+
+    def setup(self, pin: int, mode: int, initial: int | None = None) -> None:
+        self.pin_modes[pin] = mode
+        if mode == self.IN and self._learn_ultrasonic_pins and self._last_output_setup is not None:
+            if self._last_output_setup != self.trigger_pin:
+                self.trigger_pin = self._last_output_setup
+                # Its setup was recorded before it was known to be the trigger
+                self.history = deque((entry for entry in self.history if entry[1] != self.trigger_pin), maxlen=self.history.maxlen)
+            self.echo_pin = pin
+        if mode == self.OUT:
+            self._last_output_setup = pin
+            self._set_pin(pin, self.LOW if initial is None else int(initial))
+
+    def output(self, pin: int, value: int | bool) -> None:
+        if self.pin_modes.get(pin) != self.OUT:
+            raise RuntimeError(f"The GPIO channel {pin} has not been set up as an OUTPUT")
+        value = int(bool(value))
+        if pin == self.trigger_pin and self.pin_values.get(pin) == self.HIGH and value == self.LOW:
+            self._start_echo()
+        self._set_pin(pin, value)
+
+    def _set_pin(self, pin: int, value: int) -> None:
+        if self.pin_values.get(pin) != value and pin != self.trigger_pin:
+            self.history.append((self.elapsed(), pin, value))
+        self.pin_values[pin] = value
+
+    def input(self, pin: int) -> int:
+        if pin != self.echo_pin:
+            return self.pin_values.get(pin, self.LOW)
+        # The real sensor is read in a busy loop. Sample the pin, then move time forward
+        # as the loop would, jumping straight to the next edge instead of spinning to it.
+        now = self._time()
+        if self._echo_window is None:
+            self._sleep(ECHO_POLL_STEP)
+            return self.LOW
+        start, end = self._echo_window
+        if now < start:
+            self._sleep(start - now)
+            return self.LOW
+        if self._echo_highs < 2:
+            # The poll that sees the rising edge, and the first one of the loop waiting
+            # for the falling edge, always see the pin high, as they would on the Pi. A
+            # real-time sleep can overshoot a short pulse and skip it otherwise.
+            self._echo_highs += 1
+            if self._echo_highs == 2 and now < end - ECHO_POLL_STEP:
+                self._sleep(end - ECHO_POLL_STEP - now)
+            return self.HIGH
+        if now < end:
+            # Land one poll before the falling edge so the loop records an accurate pulse_end
+            self._sleep(end - ECHO_POLL_STEP - now if now < end - ECHO_POLL_STEP else end - now)
+            return self.HIGH
+        self._echo_window = None
+        self._sleep(ECHO_POLL_STEP)
+        return self.LOW
+
+    def _start_echo(self) -> None:
+        distance = self._signal("water_distance")
+        if distance is None:
+            # No echo at all: leave the pin low, like a disconnected sensor
+            return
+        start = self._time() + ECHO_DELAY
+        self._echo_highs = 0
+        self._echo_window = (start, start + distance / 17150)
+
+    def cleanup(self) -> None:
+        self.pin_modes.clear()
+        self.pin_values.clear()
+        self.mode = None
+
+    # ADC
+
+    def spi_xfer2(self, data: list[int]) -> list[int]:
+        # MCP3008 request: [start bit, (single-ended | channel) << 4, don't care]
+        channel = (data[1] >> 4) - 8
+        names: dict[int, str] = {
+            Channel.SOIL_MOISTURE_SENSOR: "soil_moisture",
+            Channel.GAS_QUALITY_SENSOR: "air_quality",
+            Channel.LIGHT_SENSOR: "light",
+        }
+        name = names.get(channel)
+        value = self._signal(name) if name else 0
+        counts = 0 if value is None else max(0, min(1023, int(value)))
+        return [0, (counts >> 8) & 3, counts & 0xFF]
+
+    # IIO
+
+    def iio_device(self) -> str:
+        path = self._iio_dir.name
+        for filename, name in (("in_temp_input", "temperature"), ("in_humidityrelative_input", "humidity")):
+            value = self._signal(name)
+            # The DHT11 has whole-unit resolution and the driver reports milli-units;
+            # an unreadable file mimics a failed read
+            content = "" if value is None else f"{int(value) * 1000}\n"
+            if self._iio_written.get(filename) != content:
+                with open(os.path.join(path, filename), "w") as f:
+                    _ = f.write(content)
+                self._iio_written[filename] = content
+        return path
+
+    # Time
+
+    def time(self) -> float:
+        return self._time()
+
+    def sleep(self, seconds: float) -> None:
+        self._sleep(seconds)
@@ -1,61 +1,302 @@
-from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
-import subprocess, json, time, os
-
-app = FastAPI()
-templates = Jinja2Templates(directory="templates")
-STATUS_FILE = "/home/pi/captive_portal/status.json"
-
-@app.get("/", response_class=HTMLResponse)
-async def index(request: Request, error: str = None):
-    """Strona główna Captive Portalu — formularz konfiguracji Wi-Fi."""
-    return templates.TemplateResponse("index.html", {"request": request, "error": error})
-
-@app.post("/connect")
-async def connect_wifi(
-    ssid: str = Form(...),
-    password: str = Form(...),
-    token: str = Form(None)
-):
-    script_path = "/home/pi/captive_portal/switch_to_client.sh"
-    status_file = "/home/pi/captive_portal/wifi_status.json"
-
-    # usuń stary plik statusu (jeśli istnieje)
-    if os.path.exists(status_file):
-        os.remove(status_file)
-
-    # uruchom skrypt i CZEKAJ na zakończenie
-    result = subprocess.run(
-        ["sudo", "bash", script_path, ssid, password],
-        capture_output=True,
-        text=True
-    )
-
-    # spróbuj odczytać wynik z pliku JSON, który zapisze skrypt
-    if os.path.exists(status_file):
-        try:
-            with open(status_file) as f:
-                status = json.load(f)
-            if status.get("success"):
-                return RedirectResponse(url="/success", status_code=303)
-            elif status.get("message") == "Connection failed":
-                return RedirectResponse(url="/?error=wrongwifi", status_code=303)
-        except Exception as e:
-            print(f"[ERROR] Nie można odczytać statusu Wi-Fi: {e}")
-            return RedirectResponse(url="/?error=internal", status_code=303)
-
-    # jeśli nie ma pliku — coś poszło nie tak
-    print("[ERROR] Skrypt nie utworzył pliku statusowego.")
-    print(result.stdout)
-    print(result.stderr)
-    return RedirectResponse(url="/?error=timeout", status_code=303)
-
-@app.get("/success", response_class=HTMLResponse)
-async def success(request: Request):
-    """Prosta strona z informacją, że dane zostały zapisane."""
-    return templates.TemplateResponse("success.html", {"request": request})
-
-@app.get("/{path:path}", response_class=HTMLResponse)
-async def catch_all(path: str):
-    return RedirectResponse(url="/")
+from fastapi import FastAPI, Request, Form, HTTPException
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
+from fastapi.templating import Jinja2Templates
+from contextlib import asynccontextmanager
+from typing import Any
+import asyncio, subprocess, json, time, os, uuid
+
+STATUS_FILE = "/home/pi/captive_portal/status.json"
+SCRIPT_PATH = "/home/pi/captive_portal/switch_to_client.sh"
+WIFI_STATUS_FILE = "/home/pi/captive_portal/wifi_status.json"
+PROVISIONING_TIMEOUT = 90  # sekundy; nmcli sam poddaje się wcześniej
+SSE_KEEPALIVE = 15  # sekundy między komentarzami podtrzymującymi strumień SSE
+MAX_JOBS = 20  # ile zakończonych prób pamiętamy
+SCAN_INTERVAL = 30  # sekundy między skanami sieci w tle
+SCAN_TTL = 120  # sekundy, po których wynik skanu uznajemy za nieaktualny
+SCAN_TIMEOUT = 20  # sekundy na jeden skan nmcli
+
+
+class ProvisioningJob:
+    """
+    Jedna próba połączenia z Wi-Fi (switch_to_client.sh) uruchomiona w tle.
+    Stan: running, a po zakończeniu success, wrongwifi, timeout albo internal
+    (te same kody co ?error= na stronie głównej).
+    """
+    def __init__(self, ssid: str):
+        self.id = uuid.uuid4().hex
+        self.ssid = ssid
+        self.state = "running"
+        self.started_at = time.time()
+        self.finished_at = None
+        self.done = asyncio.Event()
+        self.task: asyncio.Task[None] | None = None
+
+    @property
+    def redirect(self) -> str:
+        if self.state == "running":
+            return f"/connecting/{self.id}"
+        if self.state == "success":
+            return "/success"
+        return f"/?error={self.state}"
+
+    def finish(self, state: str) -> None:
+        self.state = state
+        self.finished_at = time.time()
+        self.done.set()
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "ssid": self.ssid,
+            "state": self.state,
+            "redirect": self.redirect,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+jobs: dict[str, ProvisioningJob] = {}
+active_job: ProvisioningJob | None = None
+
+
+def read_wifi_status(stdout: str, stderr: str) -> str:
+    """Wynik próby z pliku JSON, który zapisuje switch_to_client.sh."""
+    if os.path.exists(WIFI_STATUS_FILE):
+        try:
+            with open(WIFI_STATUS_FILE) as f:
+                status = json.load(f)
+            if status.get("success"):
+                return "success"
+            elif status.get("message") == "Connection failed":
+                return "wrongwifi"
+        except Exception as e:
+            print(f"[ERROR] Nie można odczytać statusu Wi-Fi: {e}")
+            return "internal"
+
+    # jeśli nie ma pliku — coś poszło nie tak
+    print("[ERROR] Skrypt nie utworzył pliku statusowego.")
+    print(stdout)
+    print(stderr)
+    return "timeout"
+
+
+async def run_provisioning(job: ProvisioningJob, password: str) -> None:
+    """Uruchamia skrypt bez blokowania serwera; portal w tym czasie dalej odpowiada."""
+    try:
+        # usuń stary plik statusu (jeśli istnieje)
+        if os.path.exists(WIFI_STATUS_FILE):
+            os.remove(WIFI_STATUS_FILE)
+
+        process = await asyncio.create_subprocess_exec(
+            "sudo", "bash", SCRIPT_PATH, job.ssid, password,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), PROVISIONING_TIMEOUT)
+        except asyncio.TimeoutError:
+            # SIGTERM sudo przekaże dalej do skryptu, SIGKILL już nie
+            process.terminate()
+            try:
+                await asyncio.wait_for(process.wait(), 5)
+            except asyncio.TimeoutError:
+                process.kill()
+            print("[ERROR] Skrypt przełączania Wi-Fi nie zakończył się w czasie.")
+            job.finish("timeout")
+            return
+        job.finish(read_wifi_status(stdout.decode(errors="replace"), stderr.decode(errors="replace")))
+    except Exception as e:
+        print(f"[ERROR] Nie można uruchomić skryptu Wi-Fi: {e}")
+        job.finish("internal")
+
+
+def forget_old_jobs() -> None:
+    finished = [job_id for job_id, job in jobs.items() if job.done.is_set()]
+    for job_id in finished[:max(0, len(jobs) - MAX_JOBS)]:
+        del jobs[job_id]
+
+
+def get_job(job_id: str) -> ProvisioningJob:
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Nie ma takiej próby połączenia")
+    return job
+
+
+def split_nmcli_fields(line: str) -> list[str]:
+    """
+    Pola linii `nmcli -t`: w trybie -t dwukropki i ukośniki w wartościach są
+    poprzedzone \\, więc czytamy od lewej ("\\\\:" to ukośnik i koniec pola).
+    """
+    fields = [""]
+    escaped = False
+    for char in line:
+        if escaped:
+            fields[-1] += char
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == ":":
+            fields.append("")
+        else:
+            fields[-1] += char
+    return fields
+
+
+def parse_nmcli_networks(output: str) -> list[dict[str, Any]]:
+    """
+    Sieci z `nmcli -t -f SSID,SIGNAL,SECURITY dev wifi list`, najsilniejsze
+    pierwsze; każdy SSID raz (z najsilniejszego punktu dostępowego), bez ukrytych.
+    """
+    best: dict[str, dict[str, Any]] = {}
+    for line in output.splitlines():
+        fields = split_nmcli_fields(line)
+        if len(fields) < 3 or not fields[0]:
+            continue
+        ssid, signal, security = fields[0], fields[1], fields[2]
+        strength = int(signal) if signal.isdigit() else 0
+        if ssid not in best or best[ssid]["signal"] < strength:
+            best[ssid] = {"ssid": ssid, "signal": strength, "secured": security not in ("", "--")}
+    return sorted(best.values(), key=lambda network: -network["signal"])
+
+
+class WifiScanner:
+    """
+    Skanuje sieci Wi-Fi w tle co SCAN_INTERVAL sekund i trzyma ostatni wynik,
+    więc strona i /networks odpowiadają od razu, bez czekania na skan.
+    Wynik starszy niż SCAN_TTL jest oznaczany jako nieaktualny, a zapytanie o
+    niego budzi skaner wcześniej. Podczas próby połączenia skaner czeka, żeby
+    nie zajmować radia.
+    """
+    def __init__(self, interval: float = SCAN_INTERVAL, ttl: float = SCAN_TTL):
+        self.interval = interval
+        self.ttl = ttl
+        self.networks: list[dict[str, Any]] = []
+        self.scanned_at = None
+        self.task: asyncio.Task[None] | None = None
+        self._wake = asyncio.Event()
+
+    def fresh(self) -> bool:
+        return self.scanned_at is not None and time.time() - self.scanned_at < self.ttl
+
+    def request_scan(self) -> None:
+        self._wake.set()
+
+    def snapshot(self) -> dict[str, Any]:
+        if not self.fresh():
+            self.request_scan()
+        return {"networks": self.networks, "scanned_at": self.scanned_at, "fresh": self.fresh()}
+
+    async def scan(self) -> list[dict[str, Any]]:
+        process = await asyncio.create_subprocess_exec(
+            "sudo", "nmcli", "-t", "-f", "SSID,SIGNAL,SECURITY", "dev", "wifi", "list", "ifname", "wlan0", "--rescan", "yes",
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), SCAN_TIMEOUT)
+        except asyncio.TimeoutError:
+            process.terminate()
+            await process.wait()
+            raise RuntimeError("nmcli nie zakończył skanu w czasie")
+        if process.returncode != 0:
+            raise RuntimeError(stderr.decode(errors="replace").strip())
+        return parse_nmcli_networks(stdout.decode(errors="replace"))
+
+    async def run(self) -> None:
+        while True:
+            if active_job is None or active_job.done.is_set():
+                try:
+                    self.networks = await self.scan()
+                    self.scanned_at = time.time()
+                except Exception as e:
+                    print(f"[ERROR] Skanowanie sieci Wi-Fi nie powiodło się: {e}")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+scanner = WifiScanner()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    task = scanner.task = asyncio.create_task(scanner.run())
+    yield
+    task.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
+templates = Jinja2Templates(directory="templates")
+
+@app.get("/", response_class=HTMLResponse)
+async def index(request: Request, error: str = None):
+    """Strona główna Captive Portalu — formularz konfiguracji Wi-Fi."""
+    return templates.TemplateResponse(request, "index.html", {"error": error, "networks": scanner.networks})
+
+@app.get("/networks")
+async def networks():
+    """Ostatnio zeskanowane sieci Wi-Fi (z pamięci, bez czekania na skan)."""
+    return scanner.snapshot()
+
+@app.post("/connect")
+async def connect_wifi(
+    ssid: str = Form(...),
+    password: str = Form(...),
+    token: str = Form(None)
+):
+    """Startuje próbę połączenia w tle i od razu przekierowuje na stronę jej postępu."""
+    global active_job
+    # jedna próba naraz: kolejne zgłoszenie trafia na stronę trwającej próby
+    if active_job is not None and not active_job.done.is_set():
+        return RedirectResponse(url=f"/connecting/{active_job.id}?busy=1", status_code=303)
+
+    job = ProvisioningJob(ssid)
+    jobs[job.id] = job
+    active_job = job
+    forget_old_jobs()
+    job.task = asyncio.create_task(run_provisioning(job, password))
+    return RedirectResponse(url=job.redirect, status_code=303)
+
+@app.get("/connecting/{job_id}", response_class=HTMLResponse)
+async def connecting(request: Request, job_id: str, busy: bool = False):
+    """Strona oczekiwania: śledzi próbę przez SSE (albo odpytywanie) i przekierowuje po jej zakończeniu."""
+    job = jobs.get(job_id)
+    if job is None:
+        return RedirectResponse(url="/", status_code=303)
+    if job.done.is_set():
+        return RedirectResponse(url=job.redirect, status_code=303)
+    return templates.TemplateResponse(request, "connecting.html", {"job": job, "busy": busy})
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Stan próby połączenia (JSON) do odpytywania."""
+    return get_job(job_id).to_dict()
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Stan próby połączenia jako server-sent events: bieżący od razu, końcowy gdy się pojawi."""
+    job = get_job(job_id)
+
+    async def events():
+        yield f"data: {json.dumps(job.to_dict())}\n\n"
+        while not job.done.is_set():
+            try:
+                await asyncio.wait_for(job.done.wait(), SSE_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield f"data: {json.dumps(job.to_dict())}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/success", response_class=HTMLResponse)
+async def success(request: Request):
+    """Prosta strona z informacją, że dane zostały zapisane."""
+    return templates.TemplateResponse(request, "success.html")
+
+@app.get("/{path:path}", response_class=HTMLResponse)
+async def catch_all(path: str):
+    return RedirectResponse(url="/")
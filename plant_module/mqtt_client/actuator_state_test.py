@@ -0,0 +1,84 @@
+import asyncio
+import json
+from datetime import timedelta
+
+import aiomqtt
+
+from plant_module.mqtt_client.control_manager import ControlManager, actuator_state_topic
+from plant_module.mqtt_client.device_config import DeviceConfig
+from plant_module.mqtt_client.pot_config import PotConfig
+from plant_module.mqtt_client.sampling import AdaptiveSamplingSpec
+from plant_module.mqtt_client.sensor_publisher import SensorPublisher
+from plant_module.mqtt_client.sensors_translation import SensorsController
+from plant_module.mqtt_client.telemetry import TelemetryConfig
+
+# Needs a broker, like mqtt_tests/; run with PLANT_HARDWARE_BACKEND=sim off the Pi
+HOSTNAME = "localhost"
+PORT = 1883
+
+
+async def wait_for(condition, timeout: float = 5.0) -> bool:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        if loop.time() > deadline:
+            return False
+        await asyncio.sleep(0.05)
+    return True
+
+
+async def water_request_reaches_the_publisher() -> None:
+    # The dispatcher and the publisher each have their own SensorsController, as
+    # they do in their own processes; only MQTT connects them
+    pot_config = PotConfig(
+        device=DeviceConfig(water_pulse_duration=timedelta(seconds=0.5)),
+        telemetry=TelemetryConfig(adaptive={
+            "water_level_sensor": AdaptiveSamplingSpec(
+                fast_period=timedelta(seconds=1), slow_period=timedelta(minutes=10), active_change=0.5, actuators=["water_pump"]
+            ),
+        }),
+    )
+    async with aiomqtt.Client(HOSTNAME, PORT) as dispatcher_client, aiomqtt.Client(HOSTNAME, PORT) as publisher_client:
+        manager = ControlManager(pot_config, dispatcher_client)
+        publisher = SensorPublisher(publisher_client, timedelta(seconds=2), pot_config, SensorsController())
+        assert publisher.sensors_controller is not manager.controller
+        follow = asyncio.create_task(publisher.follow_actuators())
+        await manager.publish_actuator_state()
+        await asyncio.sleep(0.5)
+        assert publisher.sampling_periods["water_level_sensor"] == 2.0, "starts at the publish interval"
+
+        await manager.handle_message(manager.control_topic, b'{"actuator":"water_pump","command":"on"}')
+        assert await wait_for(lambda: publisher.sampling_periods["water_level_sensor"] == 1.0), "pump on speeds up the tank"
+        assert await wait_for(lambda: not manager.actuator_state["water_pump"]), "pulse ends"
+        # Let the "off" message out before disconnecting
+        await asyncio.sleep(0.5)
+        follow.cancel()
+
+    # A publisher connecting later gets the current state from the retained message
+    async with aiomqtt.Client(HOSTNAME, PORT) as late:
+        await late.subscribe(actuator_state_topic(pot_config.pot_id), qos=1)
+        retained: dict[str, bool] = {}
+        async def collect() -> None:
+            async for message in late.messages:
+                state = json.loads(message.payload)
+                retained[state["actuator"]] = state["on"]
+                if len(retained) == 2:
+                    return
+        await asyncio.wait_for(collect(), 5.0)
+        assert retained == {"light_bulb": False, "water_pump": False}, f"retained states are off: {retained}"
+        for actuator in manager.actuator_state:
+            await late.publish(actuator_state_topic(pot_config.pot_id, actuator), b"", retain=True)
+    manager.scheduler_task.cancel()
+
+
+def test_water_request_reaches_the_publisher():
+    asyncio.run(water_request_reaches_the_publisher())
+
+
+if __name__ == "__main__":
+    try:
+        test_water_request_reaches_the_publisher()
+    except AssertionError as e:
+        print(f"Fail: {e}")
+    else:
+        print("Pass")
@@ -0,0 +1,109 @@
+'''
+Scheduler-to-pin latency of the shared actuator driver.
+
+Runs on the simulated hardware backend in real time:
+    - handoff: a Scheduler fires alternating on/off actions for the relay; for every
+      GPIO write the time from the action's request to the pin write is reported
+      (Transition.latency_ns), next to the scheduler's own firing lateness
+    - burst: many requests issued back to back, reporting how many GPIO writes
+      were actually needed after coalescing
+
+Exits with status 1 if the p99 hand-off latency is over --budget-ms (default 1 ms).
+
+Run from the repository root:
+    python -m plant_module.mqtt_client.benchmarks.actuator_benchmark --output actuator.json
+'''
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any
+
+from GPIO_python.actuator import ActuatorDriver
+from GPIO_python.relay import RELAY_PIN, Relay
+from GPIO_python.simulated import SimulatedBackend
+
+from plant_module.mqtt_client.schedule import Scheduler, ScheduledEvent
+from plant_module.mqtt_client.benchmarks.schedule_benchmark import _percentiles
+
+
+async def bench_handoff(events: int, spacing: timedelta) -> dict[str, Any]:
+    driver = ActuatorDriver(SimulatedBackend())
+    relay = Relay(driver)
+    relay.start()
+    scheduler = Scheduler()
+    lateness_ms: list[float] = []
+
+    def make_action(on: bool, due: datetime):
+        def action() -> None:
+            lateness_ms.append((datetime.now() - due).total_seconds() * 1000)
+            relay.turn_on() if on else relay.turn_off()
+        return action
+
+    start = datetime.now() + timedelta(milliseconds=50)
+    for index in range(events):
+        due = start + index * spacing
+        await scheduler.add_event(ScheduledEvent(due, make_action(index % 2 == 0, due)))
+    scheduler.start()
+    await asyncio.sleep((start - datetime.now()).total_seconds() + events * spacing.total_seconds() + 0.1)
+    await scheduler.stop()
+    driver.stop()
+
+    transitions = [t for t in driver.transitions if t.pin == RELAY_PIN]
+    return {
+        "events": events,
+        "spacing_ms": spacing.total_seconds() * 1000,
+        "writes": len(transitions),
+        "scheduler_lateness_ms": _percentiles(lateness_ms),
+        "handoff_ms": _percentiles([t.latency_ns / 1e6 for t in transitions]),
+    }
+
+
+def bench_burst(requests: int) -> dict[str, Any]:
+    driver = ActuatorDriver(SimulatedBackend())
+    relay = Relay(driver)
+    relay.start()
+    started = time.perf_counter()
+    for index in range(requests):
+        relay.turn_on() if index % 2 == 0 else relay.turn_off()
+    elapsed = time.perf_counter() - started
+    driver.stop()
+    return {
+        "requests": requests,
+        "writes": len(driver.transitions),
+        "coalesced": driver.coalesced,
+        "request_us": elapsed / requests * 1e6,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Actuator driver latency benchmark")
+    _ = parser.add_argument("--events", type=int, default=500, help="Scheduled on/off events")
+    _ = parser.add_argument("--spacing-ms", type=float, default=5.0, help="Time between scheduled events")
+    _ = parser.add_argument("--burst", type=int, default=100000, help="Requests in the coalescing burst")
+    _ = parser.add_argument("--budget-ms", type=float, default=1.0, help="Maximum allowed p99 hand-off latency")
+    _ = parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    results: dict[str, Any] = {
+        "benchmark": "actuator",
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "handoff": asyncio.run(bench_handoff(args.events, timedelta(milliseconds=args.spacing_ms))),
+        "burst": bench_burst(args.burst),
+    }
+    p99 = results["handoff"]["handoff_ms"].get("p99", 0.0)
+    results["within_budget"] = p99 <= args.budget_ms
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    if not results["within_budget"]:
+        print(f"[BUDGET] p99 hand-off latency {p99:.3f} ms > {args.budget_ms} ms", file=sys.stderr)
+    sys.exit(0 if results["within_budget"] else 1)
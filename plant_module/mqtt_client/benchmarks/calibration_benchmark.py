@@ -0,0 +1,99 @@
+'''
+Cost of converting raw readings with the calibration stage.
+
+Measures, with DEFAULT_CALIBRATION:
+    - convert: per-call latency of Calibrator.convert() on one full reading, as
+      SensorPublisher does every tick
+    - batch: per-value cost of Calibrator.convert_batch() on buffered columns of
+      every size in --sizes, with numpy (if installed) and with the plain Python
+      fallback
+
+Run from the repository root:
+    python -m plant_module.mqtt_client.benchmarks.calibration_benchmark --output calibration.json
+'''
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Any
+
+from plant_module.mqtt_client import calibration
+from plant_module.mqtt_client.calibration import DEFAULT_CALIBRATION, Calibrator
+from plant_module.mqtt_client.benchmarks.schedule_benchmark import _percentiles
+
+
+def _reading(rng: random.Random) -> dict[str, int | float | None]:
+    return {
+        "air_quality_sensor": rng.randint(0, 1023),
+        "light_sensor": rng.randint(0, 1023),
+        "temperature_sensor": rng.randint(0, 50),
+        "air_humidity_sensor": rng.randint(0, 100),
+        "soil_moisture_sensor": rng.randint(0, 1023),
+        "water_level_sensor": rng.uniform(0, 30),
+    }
+
+
+def bench_convert(ops: int, rng: random.Random) -> dict[str, Any]:
+    calibrator = Calibrator(DEFAULT_CALIBRATION)
+    readings = [_reading(rng) for _ in range(ops)]
+    latencies: list[float] = []
+    for reading in readings:
+        started = time.perf_counter_ns()
+        _ = calibrator.convert(reading)
+        latencies.append((time.perf_counter_ns() - started) / 1000)
+    return {"ops": ops, "latency_us": _percentiles(latencies)}
+
+
+def bench_batch(size: int, rng: random.Random) -> dict[str, Any]:
+    column = [rng.uniform(0, 1023) for _ in range(size)]
+    result: dict[str, Any] = {"size": size}
+    numpy = calibration._numpy()
+    for mode in ("numpy", "python"):
+        if mode == "numpy" and numpy is None:
+            continue
+        calibrator = Calibrator(DEFAULT_CALIBRATION)
+        if mode == "python":
+            # Force the fallback by hiding numpy from the module
+            calibration._numpy.cache_clear()
+            sys.modules["numpy"] = None  # pyright: ignore[reportArgumentType]
+        try:
+            raws = numpy.asarray(column) if mode == "numpy" and numpy is not None else column
+            _ = calibrator.convert_batch("light_sensor", raws[:1])
+            started = time.perf_counter()
+            _ = calibrator.convert_batch("light_sensor", raws)
+            elapsed = time.perf_counter() - started
+        finally:
+            if mode == "python" and numpy is not None:
+                sys.modules["numpy"] = numpy
+            calibration._numpy.cache_clear()
+        result[mode] = {"ms": elapsed * 1000, "ns_per_value": elapsed / size * 1e9}
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibration stage benchmark")
+    _ = parser.add_argument("--ops", type=int, default=10000, help="Single readings converted")
+    _ = parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 1_000_000], help="Batch sizes to measure")
+    _ = parser.add_argument("--seed", type=int, default=0)
+    _ = parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results: dict[str, Any] = {
+        "benchmark": "calibration",
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "numpy": calibration._numpy() is not None,
+        "convert": bench_convert(args.ops, rng),
+        "batch": [bench_batch(size, rng) for size in args.sizes],
+    }
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
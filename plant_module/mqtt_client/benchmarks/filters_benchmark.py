@@ -0,0 +1,84 @@
+'''
+Cost and effect of the streaming sensor filters.
+
+For a noisy step signal (a level that jumps every 300 samples, plus gaussian
+noise and occasional ultrasonic-style outliers) and each filter kind, reports:
+    - update_us: per-sample cost of update()
+    - batch: per-sample cost of batch() over --samples values (vectorized with
+      numpy when it is installed, update() in a loop otherwise)
+    - residual_std: standard deviation of the filtered signal around the clean
+      one, next to that of the raw signal
+
+Run from the repository root:
+    python -m plant_module.mqtt_client.benchmarks.filters_benchmark --output filters.json
+'''
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable
+
+from plant_module.mqtt_client import filters
+from plant_module.mqtt_client.filters import Ewma, Kalman1D, RollingMedian, StreamFilter
+
+FILTERS: dict[str, Callable[[], StreamFilter]] = {
+    "median": lambda: RollingMedian(5),
+    "ewma": lambda: Ewma(0.3),
+    "kalman": lambda: Kalman1D(1.0, 25.0),
+}
+
+
+def _signal(samples: int, rng: random.Random) -> tuple[list[float], list[float]]:
+    clean = [500.0 + 100.0 * ((index // 300) % 2) for index in range(samples)]
+    noisy = [
+        value + (rng.choice((-1, 1)) * 300.0 if rng.random() < 0.01 else rng.gauss(0, 20))
+        for value in clean
+    ]
+    return clean, noisy
+
+
+def bench_filter(make: Callable[[], StreamFilter], clean: list[float], noisy: list[float]) -> dict[str, Any]:
+    stream_filter = make()
+    started = time.perf_counter()
+    streamed = [stream_filter.update(value) for value in noisy]
+    update_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    _ = make().batch(noisy)
+    batch_s = time.perf_counter() - started
+    return {
+        "update_us": update_s / len(noisy) * 1e6,
+        "batch_ns": batch_s / len(noisy) * 1e9,
+        "residual_std": statistics.pstdev(filtered - value for filtered, value in zip(streamed, clean)),
+        "state": stream_filter.state(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming filter benchmark")
+    _ = parser.add_argument("--samples", type=int, default=100_000, help="Length of the test signal")
+    _ = parser.add_argument("--seed", type=int, default=0)
+    _ = parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    clean, noisy = _signal(args.samples, random.Random(args.seed))
+    results: dict[str, Any] = {
+        "benchmark": "filters",
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "numpy": filters._numpy() is not None,
+        "samples": args.samples,
+        "raw_residual_std": statistics.pstdev(value - reference for value, reference in zip(noisy, clean)),
+        "filters": {name: bench_filter(make, clean, noisy) for name, make in FILTERS.items()},
+    }
+
+    text = json.dumps(results, indent=2, default=float)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
@@ -0,0 +1,212 @@
+'''
+Throughput of the fleet telemetry ingest (ingest.py).
+
+Payloads are full readings of --pots simulated pots, encoded the way
+SensorPublisher sends them. Offline (always):
+    - decode: messages/s of decode_batch() on --batch-size payloads (one pydantic
+      call per batch) against SensorReading.model_validate_json() per message
+    - store: rows/s of writing decoded batches with every available store
+      (sqlite; parquet when pyarrow is installed), day partitions
+    - worker: messages/s through IngestWorker.add() and flush(), decode and
+      store included, without a broker
+
+With --hostname, also end to end against that broker (it must support MQTT 5
+shared subscriptions, e.g. Mosquitto 2): --workers ingest worker processes
+share the subscription while --connections client connections publish
+--messages readings of the simulated pots as fast as they can (QoS 0). Reports
+publish and ingest rates and how many readings were stored before --timeout.
+
+Run from the repository root:
+    python -m plant_module.mqtt_client.benchmarks.ingest_benchmark --output ingest.json
+    python -m plant_module.mqtt_client.benchmarks.ingest_benchmark --hostname localhost --workers 4
+'''
+import argparse
+import asyncio
+import json
+import multiprocessing
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any
+from uuid import UUID
+
+from plant_module.mqtt_client import ingest
+from plant_module.mqtt_client.ingest import IngestWorker, decode_batch, open_store, pot_id_of, to_partitions
+from plant_module.mqtt_client.metrics import MetricsRegistry
+from plant_module.mqtt_client.sensor_reading import SensorReading
+from plant_module.mqtt_client.telemetry import TelemetryEncoder, encode_timestamp
+from plant_module.mqtt_client.benchmarks.calibration_benchmark import _reading
+
+
+def make_messages(pots: int, messages: int, seed: int) -> list[tuple[str, bytes]]:
+    rng = random.Random(seed)
+    encoders = [TelemetryEncoder(UUID(int=rng.getrandbits(128), version=4)) for _ in range(pots)]
+    start = datetime(2026, 1, 1)
+    result: list[tuple[str, bytes]] = []
+    for index in range(messages):
+        encoder = encoders[index % pots]
+        # Every pot publishes every 2 s
+        timestamp = encode_timestamp(start + timedelta(seconds=2 * (index // pots)))
+        reading = _reading(rng)
+        reading["water_level_sensor"] = round(float(reading["water_level_sensor"] or 0), 2)
+        result.append((encoder.full_topic, encoder.full(timestamp, reading).encode()))
+    return result
+
+
+def bench_decode(payloads: list[bytes], batch_size: int) -> dict[str, Any]:
+    # Build both validators (deferred at startup) before timing
+    _ = decode_batch(payloads[:2])
+    _ = SensorReading.model_validate_json(payloads[0])
+    started = time.perf_counter()
+    for index in range(0, len(payloads), batch_size):
+        _ = decode_batch(payloads[index:index + batch_size])
+    bulk = time.perf_counter() - started
+    started = time.perf_counter()
+    for index in range(0, len(payloads), batch_size):
+        # Kept per batch like decode_batch() keeps them, for the same GC load
+        _ = [SensorReading.model_validate_json(payload) for payload in payloads[index:index + batch_size]]
+    single = time.perf_counter() - started
+    return {"bulk_per_s": len(payloads) / bulk, "single_per_s": len(payloads) / single, "speedup": single / bulk}
+
+
+def bench_store(kind: str, messages: list[tuple[str, bytes]], batch_size: int) -> dict[str, Any]:
+    batches = []
+    for index in range(0, len(messages), batch_size):
+        chunk = messages[index:index + batch_size]
+        readings = decode_batch([payload for _, payload in chunk])
+        batches.append(to_partitions([pot_id_of(topic) for topic, _ in chunk], readings, "day"))
+    with tempfile.TemporaryDirectory(prefix="ingest-") as directory:
+        store = open_store(kind, directory, "bench")  # pyright: ignore[reportArgumentType]
+        started = time.perf_counter()
+        written = sum(store.write(partitions) for partitions in batches)
+        elapsed = time.perf_counter() - started
+        store.close()
+    return {"rows": written, "rows_per_s": written / elapsed}
+
+
+async def bench_worker(messages: list[tuple[str, bytes]], batch_size: int) -> dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix="ingest-") as directory:
+        worker = IngestWorker(open_store("sqlite", directory, "bench"), batch_size=batch_size, metrics=MetricsRegistry())
+        started = time.perf_counter()
+        for topic, payload in messages:
+            worker.add(topic, payload)
+            if worker._flushing is not None and not worker._flushing.done():
+                # Let the flush thread start, as the receive loop of a real worker would
+                await asyncio.sleep(0)
+        await worker.flush()
+        elapsed = time.perf_counter() - started
+        worker.store.close()
+    return {"rows": worker.rows_written, "messages_per_s": len(messages) / elapsed}
+
+
+def _broker_worker(index: int, hostname: str, port: int, group: str, batch_size: int, directory: str, rows: Any) -> None:
+    worker = IngestWorker(open_store("sqlite", directory, f"w{index}"), batch_size=batch_size, flush_interval=0.5)
+
+    async def report() -> None:
+        while True:
+            await asyncio.sleep(0.1)
+            rows[index] = worker.rows_written
+
+    async def main() -> None:
+        reporter = asyncio.create_task(report())
+        try:
+            await worker.run(hostname, port, group, f"ingest-bench-{index}")
+        finally:
+            _ = reporter.cancel()
+            rows[index] = worker.rows_written
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+
+async def _publish_all(hostname: str, port: int, connections: int, messages: list[tuple[str, bytes]]) -> float:
+    from aiomqtt import Client, ProtocolVersion
+
+    async def publish(part: list[tuple[str, bytes]], index: int) -> None:
+        async with Client(hostname=hostname, port=port, identifier=f"pots-bench-{index}", protocol=ProtocolVersion.V5) as client:
+            for topic, payload in part:
+                await client.publish(topic, payload)
+
+    started = time.perf_counter()
+    _ = await asyncio.gather(*(publish(messages[index::connections], index) for index in range(connections)))
+    return time.perf_counter() - started
+
+
+def bench_broker(args: argparse.Namespace, messages: list[tuple[str, bytes]]) -> dict[str, Any]:
+    group = f"bench{random.getrandbits(32)}"
+    rows = multiprocessing.Array("l", args.workers)
+    with tempfile.TemporaryDirectory(prefix="ingest-") as directory:
+        workers = [
+            multiprocessing.Process(target=_broker_worker, args=(index, args.hostname, args.port, group, args.batch_size, directory, rows))
+            for index in range(args.workers)
+        ]
+        for process in workers:
+            process.start()
+        # Give the workers time to subscribe before the first message
+        time.sleep(args.warmup)
+        started = time.perf_counter()
+        publish_s = asyncio.run(_publish_all(args.hostname, args.port, args.connections, messages))
+        while sum(rows[:]) < len(messages) and time.perf_counter() - started < args.timeout:
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - started
+        stored = sum(rows[:])
+        for process in workers:
+            process.terminate()
+            process.join()
+    return {
+        "workers": args.workers,
+        "connections": args.connections,
+        "messages": len(messages),
+        "publish_per_s": len(messages) / publish_s,
+        "stored": stored,
+        "ingest_per_s": stored / elapsed,
+        "rows_per_worker": rows[:],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fleet telemetry ingest benchmark")
+    _ = parser.add_argument("--pots", type=int, default=1000, help="Simulated pots")
+    _ = parser.add_argument("--messages", type=int, default=100_000, help="Readings to ingest")
+    _ = parser.add_argument("--batch-size", type=int, default=ingest.DEFAULT_BATCH_SIZE)
+    _ = parser.add_argument("--hostname", help="Also measure end to end through this MQTT 5 broker")
+    _ = parser.add_argument("--port", type=int, default=1883)
+    _ = parser.add_argument("--workers", type=int, default=2, help="Ingest worker processes (broker run)")
+    _ = parser.add_argument("--connections", type=int, default=4, help="Publishing connections (broker run)")
+    _ = parser.add_argument("--warmup", type=float, default=1.0, help="Seconds for the workers to subscribe (broker run)")
+    _ = parser.add_argument("--timeout", type=float, default=60.0, help="Give up waiting for the workers after this long (broker run)")
+    _ = parser.add_argument("--seed", type=int, default=0)
+    _ = parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    messages = make_messages(args.pots, args.messages, args.seed)
+    results: dict[str, Any] = {
+        "benchmark": "ingest",
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "pots": args.pots,
+        "messages": args.messages,
+        "batch_size": args.batch_size,
+        "payload_bytes": sum(len(payload) for _, payload in messages) / len(messages),
+        "decode": bench_decode([payload for _, payload in messages], args.batch_size),
+        "store": {
+            kind: bench_store(kind, messages, args.batch_size)
+            for kind in ("sqlite", "parquet")
+            if kind == "sqlite" or ingest._pyarrow() is not None
+        },
+        "worker": asyncio.run(bench_worker(messages, args.batch_size)),
+    }
+    if args.hostname:
+        results["broker"] = bench_broker(args, messages)
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
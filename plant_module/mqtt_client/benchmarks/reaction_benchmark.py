@@ -0,0 +1,129 @@
+'''
+Threshold-crossing-to-actuator reaction time of the sensor bus pipeline.
+
+Runs the GPIO_python/main.py wiring on the simulated hardware backend in real
+time: a sampler thread reads the soil moisture channel every --read-interval
+seconds and publishes it to a SensorBus, the control rules subscribe to the bus
+and drive the motor through the actuator driver. The soil signal repeatedly
+steps across the DEFAULT_RULES threshold, and for every step this reports
+    - sample_to_pin: from the end of the read that saw the step to the GPIO write
+    - step_to_pin: from the step itself to the GPIO write, which can be at most
+      one read interval plus the read time
+
+Exits with status 1 if the p99 sample-to-pin time is over --budget-ms.
+
+Run from the repository root:
+    python -m plant_module.mqtt_client.benchmarks.reaction_benchmark --output reaction.json
+'''
+import argparse
+import json
+import platform
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any
+
+from GPIO_python.actuator import ActuatorDriver
+from GPIO_python.analog_inputs import Channel, read_channel
+from GPIO_python.backend import set_backend
+from GPIO_python.motor import PWM_PIN, Motor
+from GPIO_python.sensor_bus import SensorBus
+from GPIO_python.simulated import SimulatedBackend
+
+from plant_module.mqtt_client.control_rules import DEFAULT_RULES, RuleEngine
+from plant_module.mqtt_client.benchmarks.schedule_benchmark import _percentiles
+
+
+def bench_reaction(steps: int, step_period: float, read_interval: float) -> dict[str, Any]:
+    # Soil flips between dry (900) and wet (500) every step_period seconds
+    backend = SimulatedBackend({"soil_moisture": lambda t: 900 if int(t / step_period) % 2 == 0 else 500})
+    set_backend(backend)
+    driver = ActuatorDriver(backend)
+    motor = Motor(driver)
+    motor.start()
+    engine = RuleEngine(DEFAULT_RULES)
+    bus = SensorBus()
+    # (monotonic_ns at the end of the read, value) for every read that saw a new value
+    changes: list[tuple[int, int]] = []
+
+    def control(snapshot: dict[str, Any], changed: frozenset[str]) -> None:
+        for _, on in engine.evaluate(snapshot, datetime.now()):
+            motor.turn_on() if on else motor.turn_off()
+
+    bus.subscribe(control, fields={"soil_moisture_sensor"})
+    running = True
+
+    def sampler() -> None:
+        last = None
+        while running:
+            value = read_channel(Channel.SOIL_MOISTURE_SENSOR)
+            if value != last:
+                changes.append((time.monotonic_ns(), value))
+                last = value
+            bus.publish(soil_moisture_sensor=value)
+            time.sleep(read_interval)
+
+    started = backend.time()
+    thread = threading.Thread(target=sampler, daemon=True)
+    thread.start()
+    time.sleep(steps * step_period + read_interval * 2)
+    running = False
+    thread.join()
+    bus.stop()
+    driver.stop()
+    set_backend(None)
+
+    sample_to_pin_ms: list[float] = []
+    step_to_pin_ms: list[float] = []
+    for transition in driver.transitions:
+        if transition.pin != PWM_PIN or transition.at - started > steps * step_period:
+            continue
+        step_at = started + int((transition.at - started) / step_period) * step_period
+        step_to_pin_ms.append((transition.at - step_at) * 1000)
+        # The last read before the write that saw the value which caused it
+        read_ns = max(
+            (ns for ns, value in changes if ns <= transition.applied_ns and (value > 800) == transition.on),
+            default=None,
+        )
+        if read_ns is not None:
+            sample_to_pin_ms.append((transition.applied_ns - read_ns) / 1e6)
+    return {
+        "steps": steps,
+        "step_period_s": step_period,
+        "read_interval_s": read_interval,
+        "transitions": len(step_to_pin_ms),
+        "bus_deliveries": bus.deliveries,
+        "bus_latency_ms": _percentiles([ns / 1e6 for ns in bus.latencies_ns]),
+        "sample_to_pin_ms": _percentiles(sample_to_pin_ms),
+        "step_to_pin_ms": _percentiles(step_to_pin_ms),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sensor bus reaction time benchmark")
+    _ = parser.add_argument("--steps", type=int, default=40, help="Threshold crossings to measure")
+    _ = parser.add_argument("--step-period", type=float, default=0.25, help="Seconds between crossings")
+    _ = parser.add_argument("--read-interval", type=float, default=0.05, help="Seconds between soil reads")
+    _ = parser.add_argument("--budget-ms", type=float, default=2.0, help="Maximum allowed p99 sample-to-pin time")
+    _ = parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    results: dict[str, Any] = {
+        "benchmark": "reaction",
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "reaction": bench_reaction(args.steps, args.step_period, args.read_interval),
+    }
+    p99 = results["reaction"]["sample_to_pin_ms"].get("p99", 0.0)
+    results["within_budget"] = p99 <= args.budget_ms
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    if not results["within_budget"]:
+        print(f"[BUDGET] p99 sample-to-pin time {p99:.3f} ms > {args.budget_ms} ms", file=sys.stderr)
+    sys.exit(0 if results["within_budget"] else 1)
@@ -0,0 +1,101 @@
+'''
+Evaluation cost of the compiled control-rule engine.
+
+For each rule count, builds that many random rules (both directions, some with
+hysteresis, minimum on/off times and time windows) over the six sensor fields
+and evaluates them against a stream of random sensor snapshots one second apart,
+reporting the time per evaluation and how many commands were issued.
+
+Exits with status 1 if evaluating the largest rule set takes longer than
+--budget-us per snapshot on average.
+
+Run from the repository root:
+    python -m plant_module.mqtt_client.benchmarks.rules_benchmark --output rules.json
+'''
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from datetime import datetime, time as time_of_day, timedelta
+from typing import Any, get_args
+
+from plant_module.mqtt_client.control_rules import ControlRule, RuleEngine, SensorField
+from plant_module.mqtt_client.benchmarks.schedule_benchmark import _percentiles
+
+SENSORS: tuple[str, ...] = get_args(SensorField)
+
+
+def random_rules(count: int, rng: random.Random) -> list[ControlRule]:
+    rules: list[ControlRule] = []
+    for index in range(count):
+        window = rng.random() < 0.3
+        rules.append(ControlRule(
+            name=f"rule_{index}",
+            actuator=rng.choice(["water_pump", "light_bulb"]),
+            sensor=rng.choice(SENSORS),  # pyright: ignore[reportArgumentType]
+            when=rng.choice(["above", "below"]),
+            threshold=rng.uniform(0, 1023),
+            hysteresis=rng.choice([0.0, 10.0, 50.0]),
+            min_on=timedelta(seconds=rng.choice([0, 5, 30])),
+            min_off=timedelta(seconds=rng.choice([0, 5, 30])),
+            active_from=time_of_day(rng.randrange(24)) if window else None,
+            active_until=time_of_day(rng.randrange(24)) if window else None,
+        ))
+    return rules
+
+
+def bench_rules(count: int, ticks: int, seed: int) -> dict[str, Any]:
+    rng = random.Random(seed)
+    compile_started = time.perf_counter()
+    engine = RuleEngine(random_rules(count, rng))
+    compile_ms = (time.perf_counter() - compile_started) * 1000
+
+    start = datetime(2025, 1, 1)
+    snapshots = [
+        ({sensor: rng.uniform(0, 1023) for sensor in SENSORS}, start + timedelta(seconds=tick))
+        for tick in range(ticks)
+    ]
+    samples_us: list[float] = []
+    commands = 0
+    for snapshot, now in snapshots:
+        started = time.perf_counter_ns()
+        commands += len(engine.evaluate(snapshot, now))
+        samples_us.append((time.perf_counter_ns() - started) / 1000)
+    return {
+        "rules": count,
+        "ticks": ticks,
+        "compile_ms": compile_ms,
+        "commands": commands,
+        "evaluate_us": _percentiles(samples_us),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Control rule engine benchmark")
+    _ = parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500, 1000], help="Rule counts to measure")
+    _ = parser.add_argument("--ticks", type=int, default=10000, help="Snapshots evaluated per rule count")
+    _ = parser.add_argument("--budget-us", type=float, default=500.0, help="Maximum mean evaluation time for the largest rule set")
+    _ = parser.add_argument("--seed", type=int, default=0)
+    _ = parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    results: dict[str, Any] = {
+        "benchmark": "rules",
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "sizes": [bench_rules(size, args.ticks, args.seed) for size in sorted(args.sizes)],
+    }
+    mean = results["sizes"][-1]["evaluate_us"].get("mean", 0.0)
+    results["within_budget"] = mean <= args.budget_us
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    if not results["within_budget"]:
+        print(f"[BUDGET] mean evaluation time {mean:.1f} us > {args.budget_us} us", file=sys.stderr)
+    sys.exit(0 if results["within_budget"] else 1)
@@ -0,0 +1,312 @@
+'''
+Micro-benchmarks for plant_module.mqtt_client.schedule.
+
+Measures, for every queue size in --sizes:
+    - add_event: per-call latency of inserting into a queue already holding N events
+    - remove_event: per-call latency of removing a random event from a queue of N events
+    - remove_tagged: per-call latency of cancelling a tagged group of --group-size
+      events (one schedule) from a queue of N events
+    - firing: throughput of the run() loop draining events that are already due
+    - lateness: distribution of firing lateness for repeating events while N other
+      events are pending
+
+plus, once, the cost of re-arming cron recurrences (CronSchedule.next_after
+from the previous fire time) for a few typical expressions, and for each misfire
+policy how many times a repeating event that is --missed intervals overdue fires
+while the scheduler catches up, and how long that takes, and the lateness of a
+fast repeating event while a slow (--slow-ms, blocking) action fires every
+100 ms, with that action run inline and offloaded to the executor.
+
+Each add/remove phase stops early once --budget seconds have passed, so the
+reported "ops" may be lower than --ops for large queues.
+
+Results are printed (and optionally written with --output) as JSON so runs can be
+diffed between commits.
+
+Run from the repository root:
+    python -m plant_module.mqtt_client.benchmarks.schedule_benchmark --output bench.json
+'''
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any
+
+from plant_module.mqtt_client.recurrence import CronSchedule
+from plant_module.mqtt_client.schedule import MisfirePolicy, Scheduler, ScheduledEvent
+
+DEFAULT_SIZES = [10**3, 10**4, 10**5, 10**6]
+
+
+def _noop() -> None:
+    pass
+
+
+def _percentiles(samples: list[float]) -> dict[str, float]:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "count": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+        "p99": pick(0.99),
+        "max": ordered[-1],
+    }
+
+
+async def _prefilled_scheduler(size: int, base: datetime, rng: random.Random) -> Scheduler:
+    '''Build a scheduler holding `size` far-future events without paying for `size` inserts'''
+    scheduler = Scheduler()
+    await scheduler.add_events(
+        ScheduledEvent(base + timedelta(seconds=rng.uniform(3600, 7 * 24 * 3600)), _noop)
+        for _ in range(size)
+    )
+    return scheduler
+
+
+async def bench_add_event(size: int, ops: int, budget: float, rng: random.Random) -> dict[str, Any]:
+    base = datetime.now()
+    scheduler = await _prefilled_scheduler(size, base, rng)
+    new_events = [
+        ScheduledEvent(base + timedelta(seconds=rng.uniform(3600, 7 * 24 * 3600)), _noop)
+        for _ in range(ops)
+    ]
+    latencies: list[float] = []
+    deadline = time.perf_counter() + budget
+    for event in new_events:
+        start = time.perf_counter()
+        await scheduler.add_event(event)
+        latencies.append((time.perf_counter() - start) * 1e6)
+        if start > deadline:
+            break
+    return {"ops": len(latencies), "latency_us": _percentiles(latencies)}
+
+
+async def bench_remove_event(size: int, ops: int, budget: float, rng: random.Random) -> dict[str, Any]:
+    scheduler = await _prefilled_scheduler(size, datetime.now(), rng)
+    victims = [event.id for event in rng.sample(scheduler.events, min(ops, size))]
+    latencies: list[float] = []
+    deadline = time.perf_counter() + budget
+    for event_id in victims:
+        start = time.perf_counter()
+        await scheduler.remove_event(event_id)
+        latencies.append((time.perf_counter() - start) * 1e6)
+        if start > deadline:
+            break
+    return {"ops": len(latencies), "latency_us": _percentiles(latencies)}
+
+
+async def bench_remove_tagged(size: int, ops: int, group_size: int, budget: float, rng: random.Random) -> dict[str, Any]:
+    base = datetime.now()
+    scheduler = await _prefilled_scheduler(size, base, rng)
+    groups = min(ops, max(1, size // group_size))
+    await scheduler.add_events(
+        ScheduledEvent(base + timedelta(seconds=rng.uniform(3600, 7 * 24 * 3600)), _noop, tags=(f"schedule:{group}",))
+        for group in range(groups)
+        for _ in range(group_size)
+    )
+    latencies: list[float] = []
+    deadline = time.perf_counter() + budget
+    for group in range(groups):
+        start = time.perf_counter()
+        _ = await scheduler.remove_tagged(f"schedule:{group}")
+        latencies.append((time.perf_counter() - start) * 1e6)
+        if start > deadline:
+            break
+    return {"ops": len(latencies), "group_size": group_size, "latency_us": _percentiles(latencies)}
+
+
+async def bench_firing(size: int, ops: int, rng: random.Random) -> dict[str, Any]:
+    '''Fill the queue with `size` overdue events and time how fast run() fires `ops` of them'''
+    target = min(ops, size)
+    fired = 0
+    done = asyncio.Event()
+
+    def count() -> None:
+        nonlocal fired
+        fired += 1
+        if fired >= target:
+            done.set()
+
+    base = datetime.now() - timedelta(hours=1)
+    scheduler = Scheduler()
+    await scheduler.add_events(
+        ScheduledEvent(base + timedelta(seconds=rng.uniform(0, 600)), count)
+        for _ in range(size)
+    )
+    start = time.perf_counter()
+    scheduler.start()
+    _ = await done.wait()
+    elapsed = time.perf_counter() - start
+    await scheduler.stop()
+    return {"ops": target, "seconds": elapsed, "events_per_second": target / elapsed if elapsed else 0.0}
+
+
+async def bench_lateness(
+    size: int,
+    repeating: int,
+    interval: timedelta,
+    duration: float,
+    rng: random.Random,
+) -> dict[str, Any]:
+    '''Run `repeating` events every `interval` for `duration` seconds with `size` events pending'''
+    scheduler = await _prefilled_scheduler(size, datetime.now(), rng)
+    lateness_ms: list[float] = []
+
+    def make_action(event_box: list[ScheduledEvent]):
+        def action() -> None:
+            # execution_time is advanced only after the action returns
+            late = datetime.now() - event_box[0].execution_time
+            lateness_ms.append(late.total_seconds() * 1000)
+        return action
+
+    # Seed the repeating events in one sort so setup cost does not show up as lateness
+    boxes: list[list[ScheduledEvent]] = [[] for _ in range(repeating)]
+    for box in boxes:
+        box.append(ScheduledEvent(datetime.max, make_action(box), interval))
+    start = datetime.now() + interval
+    for box in boxes:
+        box[0].execution_time = start + timedelta(seconds=rng.uniform(0, interval.total_seconds()))
+    await scheduler.add_events(box[0] for box in boxes)
+
+    scheduler.start()
+    await asyncio.sleep(duration)
+    await scheduler.stop()
+    expected = int(repeating * duration / interval.total_seconds())
+    return {
+        "repeating_events": repeating,
+        "interval_ms": interval.total_seconds() * 1000,
+        "duration_s": duration,
+        "expected_firings": expected,
+        "firings": len(lateness_ms),
+        "lateness_ms": _percentiles(lateness_ms),
+    }
+
+
+CRON_EXPRESSIONS = ["* * * * *", "0 8-20/2 * * *", "0 6 * * MON-FRI", "0 0 1 * *"]
+
+
+def bench_cron_rearm(ops: int) -> dict[str, Any]:
+    '''Mean cost of stepping each expression through `ops` consecutive fire times'''
+    results: dict[str, Any] = {}
+    for expression in CRON_EXPRESSIONS:
+        schedule = CronSchedule(expression)
+        fire = schedule.next_after(datetime(2025, 1, 1))
+        start = time.perf_counter()
+        for _ in range(ops):
+            assert fire is not None
+            fire = schedule.next_after(fire)
+        elapsed = time.perf_counter() - start
+        results[expression] = {"ops": ops, "rearm_us": elapsed / ops * 1e6}
+    return results
+
+
+async def bench_misfire(missed: int, policy: MisfirePolicy) -> dict[str, Any]:
+    '''Start the scheduler with a repeating event `missed` intervals overdue and count its firings'''
+    interval = timedelta(seconds=1)
+    firings = 0
+
+    def action() -> None:
+        nonlocal firings
+        firings += 1
+
+    event = ScheduledEvent(datetime.now() - missed * interval, action, interval, misfire=policy)
+    scheduler = Scheduler()
+    await scheduler.add_event(event)
+    start = time.perf_counter()
+    scheduler.start()
+    # Caught up once the event has been moved past now
+    while event.execution_time <= datetime.now():
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    await scheduler.stop()
+    return {"missed": missed, "firings": firings, "catch_up_ms": elapsed * 1000}
+
+
+async def bench_slow_action(slow_ms: float, duration: float, offload: bool) -> dict[str, Any]:
+    '''Lateness of a 10 ms repeating event while a blocking action fires every 100 ms'''
+    lateness_ms: list[float] = []
+
+    def record() -> None:
+        lateness_ms.append((datetime.now() - fast.execution_time).total_seconds() * 1000)
+
+    now = datetime.now()
+    fast = ScheduledEvent(now, record, timedelta(milliseconds=10))
+    slow = ScheduledEvent(now, lambda: time.sleep(slow_ms / 1000), timedelta(milliseconds=100), offload=offload, lane="slow")
+    scheduler = Scheduler()
+    await scheduler.add_events([fast, slow])
+    scheduler.start()
+    await asyncio.sleep(duration)
+    _ = await scheduler.remove_event(slow.id)
+    await scheduler.stop()
+    return {"slow_ms": slow_ms, "offload": offload, "fast_lateness_ms": _percentiles(lateness_ms)}
+
+
+async def run_benchmarks(args: argparse.Namespace) -> dict[str, Any]:
+    rng = random.Random(args.seed)
+    results: dict[str, Any] = {
+        "benchmark": "schedule",
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "sizes": {},
+        "cron_rearm": bench_cron_rearm(args.ops),
+        "misfire": {policy: await bench_misfire(args.missed, policy) for policy in ("skip", "all", "drop")},
+        "slow_action": {
+            "inline": await bench_slow_action(args.slow_ms, args.duration, offload=False),
+            "offloaded": await bench_slow_action(args.slow_ms, args.duration, offload=True),
+        },
+    }
+    for size in args.sizes:
+        print(f"[BENCH] size={size}", file=sys.stderr)
+        entry: dict[str, Any] = {
+            "add_event": await bench_add_event(size, args.ops, args.budget, rng),
+            "remove_event": await bench_remove_event(size, args.ops, args.budget, rng),
+            "remove_tagged": await bench_remove_tagged(size, args.ops, args.group_size, args.budget, rng),
+            "firing": await bench_firing(size, args.fire_ops, rng),
+        }
+        if not args.skip_lateness:
+            entry["lateness"] = await bench_lateness(
+                size,
+                args.repeating,
+                timedelta(milliseconds=args.interval_ms),
+                args.duration,
+                rng,
+            )
+        results["sizes"][str(size)] = entry
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scheduler micro-benchmarks")
+    _ = parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Queue sizes to benchmark")
+    _ = parser.add_argument("--ops", type=int, default=1000, help="add/remove calls measured per size")
+    _ = parser.add_argument("--budget", type=float, default=10.0, help="Stop an add/remove phase after this many seconds")
+    _ = parser.add_argument("--group-size", type=int, default=10, help="Events per tagged group in the remove_tagged phase")
+    _ = parser.add_argument("--fire-ops", type=int, default=10000, help="Maximum events fired per size")
+    _ = parser.add_argument("--repeating", type=int, default=100, help="Repeating events in the lateness run")
+    _ = parser.add_argument("--interval-ms", type=float, default=50.0, help="Repeat interval of those events")
+    _ = parser.add_argument("--duration", type=float, default=2.0, help="Seconds to run the lateness benchmark")
+    _ = parser.add_argument("--missed", type=int, default=1000, help="Intervals a repeating event is overdue in the misfire run")
+    _ = parser.add_argument("--slow-ms", type=float, default=50.0, help="Run time of the blocking action in the slow_action run")
+    _ = parser.add_argument("--skip-lateness", action="store_true", help="Only run the throughput benchmarks")
+    _ = parser.add_argument("--seed", type=int, default=0)
+    _ = parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmarks(args))
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
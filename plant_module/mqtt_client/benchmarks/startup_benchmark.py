@@ -0,0 +1,135 @@
+'''
+Import-time and boot-to-first-publish benchmark, checked against a budget.
+
+Every measurement runs in a fresh interpreter (the repeat median is reported) so
+module caches from earlier runs do not hide import cost:
+    - import_ms: time to import each module in startup_budget.json, minus the
+      cost of starting an empty interpreter
+    - first_publish_ms: time from interpreter start to the first sensor publish of
+      a SensorPublisher on the simulated hardware backend (includes the 50 ms
+      ultrasonic settle delay that the real device also pays)
+    - top_imports: the slowest imports of mqtt_dispatcher according to -X importtime
+
+Exits with status 1 if any measurement is over its budget. Update
+startup_budget.json deliberately when a change is expected to move the numbers.
+
+Run from the repository root:
+    python -m plant_module.mqtt_client.benchmarks.startup_benchmark --output startup.json
+'''
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any
+
+BUDGET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_budget.json")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+FIRST_PUBLISH_SNIPPET = '''
+import time
+start = time.perf_counter()
+import asyncio
+from datetime import timedelta
+from plant_module.mqtt_client.pot_config import PotConfig
+from plant_module.mqtt_client.sensor_publisher import SensorPublisher
+from plant_module.mqtt_client.sensors_translation import SensorsController
+from plant_module.mqtt_client.simulation import RecordingClient
+
+async def main():
+    client = RecordingClient()
+    publisher = SensorPublisher(client, timedelta(seconds=2), PotConfig.load_from_file() or PotConfig(), SensorsController())
+    await publisher._publish_all_readings()
+    assert client.messages > 0
+
+asyncio.run(main())
+print((time.perf_counter() - start) * 1000)
+'''
+
+
+def _env() -> dict[str, str]:
+    env = dict(os.environ)
+    env["PLANT_HARDWARE_BACKEND"] = "sim"
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def _wall_ms(code: str, repeat: int) -> float:
+    samples: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _ = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, env=_env(), check=True, capture_output=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def measure_imports(modules: list[str], repeat: int) -> dict[str, float]:
+    baseline = _wall_ms("pass", repeat)
+    return {module: max(0.0, _wall_ms(f"import {module}", repeat) - baseline) for module in modules}
+
+
+def measure_first_publish(repeat: int) -> float:
+    samples: list[float] = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", FIRST_PUBLISH_SNIPPET], cwd=REPO_ROOT, env=_env(), check=True, capture_output=True, text=True
+        )
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+def top_imports(module: str, count: int = 10) -> list[dict[str, Any]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=REPO_ROOT, env=_env(), check=True, capture_output=True, text=True
+    )
+    rows: list[dict[str, Any]] = []
+    # Lines look like: "import time:  self [us] | cumulative | imported package"
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append({"module": name, "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    rows.sort(key=lambda row: row["self_ms"], reverse=True)
+    return rows[:count]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import and startup time benchmark")
+    _ = parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per measurement (median is used)")
+    _ = parser.add_argument("--budget", default=BUDGET_PATH, help="Budget file (default: startup_budget.json next to this script)")
+    _ = parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    with open(args.budget) as f:
+        budget = json.load(f)
+
+    results: dict[str, Any] = {
+        "benchmark": "startup",
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "import_ms": measure_imports(list(budget["import_ms"]), args.repeat),
+        "first_publish_ms": measure_first_publish(args.repeat),
+        "top_imports": top_imports("plant_module.mqtt_client.mqtt_dispatcher"),
+    }
+
+    over_budget: list[str] = []
+    for module, limit in budget["import_ms"].items():
+        if results["import_ms"][module] > limit:
+            over_budget.append(f"import {module}: {results['import_ms'][module]:.1f} ms > {limit} ms")
+    if results["first_publish_ms"] > budget["first_publish_ms"]:
+        over_budget.append(f"first publish: {results['first_publish_ms']:.1f} ms > {budget['first_publish_ms']} ms")
+    results["over_budget"] = over_budget
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    for line in over_budget:
+        print(f"[BUDGET] {line}", file=sys.stderr)
+    sys.exit(1 if over_budget else 0)
@@ -0,0 +1,146 @@
+'''
+CPU cost of publishing a tick of telemetry, fast encoder vs validated models.
+
+SensorPublisher runs on mock sensors with the default calibration and a client
+that only counts messages, so what is measured is the publisher's own work:
+reading the mock values, calibrating, encoding the full, individual and
+calibrated payloads and calling publish(). For each path ("fast", the
+TelemetryEncoder, and "validated", a SensorReading model per message):
+    - tick_us: latency percentiles of one _publish_all_readings() call
+    - rates: the publisher loop run in real time at every rate in --rates (1 Hz
+      and 50 Hz by default) for --seconds each, with the process CPU time per
+      tick and the share of one core it used
+    - contract: --samples random ticks encoded by both paths; every fast payload
+      must validate to the same model, and the number of byte-identical payloads
+      is reported. Exits with status 1 if any payload breaks the contract.
+
+Run from the repository root:
+    python -m plant_module.mqtt_client.benchmarks.telemetry_benchmark --output telemetry.json
+'''
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any
+from uuid import uuid4
+
+from plant_module.mqtt_client.calibration import DEFAULT_CALIBRATION, Calibrator
+from plant_module.mqtt_client.pot_config import PotConfig
+from plant_module.mqtt_client.sensor_publisher import SensorPublisher
+from plant_module.mqtt_client.sensor_reading import CalibratedReading, SensorReading
+from plant_module.mqtt_client.simulation import RecordingClient
+from plant_module.mqtt_client.telemetry import SENSOR_FIELDS, TelemetryEncoder, encode_timestamp
+from plant_module.mqtt_client.benchmarks.schedule_benchmark import _percentiles
+from plant_module.mqtt_client.benchmarks.calibration_benchmark import _reading
+
+PATHS = {"fast": False, "validated": True}
+
+
+def _publisher(validate: bool, interval: timedelta = timedelta(seconds=1)) -> tuple[SensorPublisher, RecordingClient]:
+    client = RecordingClient()
+    publisher = SensorPublisher(
+        client, interval, PotConfig(pot_id=uuid4()), calibrator=Calibrator(DEFAULT_CALIBRATION), validate=validate  # pyright: ignore[reportArgumentType]
+    )
+    return publisher, client
+
+
+async def bench_tick(validate: bool, ticks: int) -> dict[str, Any]:
+    publisher, client = _publisher(validate)
+    # First tick builds the models / checks the contract; not part of the steady state
+    await publisher._publish_all_readings()
+    latencies: list[float] = []
+    for _ in range(ticks):
+        started = time.perf_counter_ns()
+        await publisher._publish_all_readings()
+        latencies.append((time.perf_counter_ns() - started) / 1000)
+    return {"ticks": ticks, "messages_per_tick": client.messages / (ticks + 1), "tick_us": _percentiles(latencies)}
+
+
+async def bench_rate(validate: bool, rate: float, seconds: float) -> dict[str, Any]:
+    publisher, client = _publisher(validate, timedelta(seconds=1 / rate))
+    await publisher._publish_all_readings()
+    first = client.messages
+    task = asyncio.create_task(publisher.start())
+    cpu_started, wall_started = time.process_time(), time.perf_counter()
+    await asyncio.sleep(seconds)
+    cpu, wall = time.process_time() - cpu_started, time.perf_counter() - wall_started
+    await publisher.stop()
+    _ = task.cancel()
+    ticks = (client.messages - first) / first
+    return {
+        "rate_hz": rate,
+        "ticks": ticks,
+        "cpu_us_per_tick": cpu / ticks * 1e6 if ticks else None,
+        "cpu_percent": cpu / wall * 100,
+    }
+
+
+def check_contract(samples: int, rng: random.Random) -> dict[str, Any]:
+    encoder = TelemetryEncoder(uuid4())
+    calibrator = Calibrator(DEFAULT_CALIBRATION)
+    payloads = identical = 0
+    for index in range(samples):
+        timestamp = datetime.now(timezone.utc) if index % 2 else datetime.now()
+        readings: dict[str, int | float | None] = {
+            field: value for field, value in _reading(rng).items() if rng.random() > 0.1
+        }
+        readings["water_level_sensor"] = round(rng.uniform(0, 30), 2)
+        stale = {field: round(rng.uniform(0, 300), 3) for field in SENSOR_FIELDS if field in readings and rng.random() < 0.2}
+        calibrated = calibrator.convert(readings)
+        encoder.check_contract(timestamp, readings, stale, calibrated)
+
+        text = encode_timestamp(timestamp)
+        reference = SensorReading.model_validate({"timestamp": timestamp, "stale": stale or None, **readings})
+        pairs = [(encoder.full(text, readings, stale), reference.model_dump_json())]
+        for field, value in readings.items():
+            age = stale.get(field)
+            reference = SensorReading.model_validate({"timestamp": timestamp, "stale": {field: age} if age is not None else None, field: value})
+            pairs.append((encoder.single(text, field, value, age), reference.model_dump_json(exclude_none=True)))
+        pairs.append((encoder.calibrated(text, calibrated), CalibratedReading(timestamp=timestamp, values=calibrated).model_dump_json()))
+        payloads += len(pairs)
+        identical += sum(fast == reference for fast, reference in pairs)
+    return {"samples": samples, "payloads": payloads, "byte_identical": identical}
+
+
+async def main(args: argparse.Namespace) -> dict[str, Any]:
+    results: dict[str, Any] = {
+        "benchmark": "telemetry",
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "contract": check_contract(args.samples, random.Random(args.seed)),
+    }
+    for name, validate in PATHS.items():
+        results[name] = {
+            **await bench_tick(validate, args.ticks),
+            "rates": [await bench_rate(validate, rate, args.seconds) for rate in args.rates],
+        }
+    results["speedup"] = results["validated"]["tick_us"]["p50"] / results["fast"]["tick_us"]["p50"]
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Telemetry encoding benchmark")
+    _ = parser.add_argument("--ticks", type=int, default=5000, help="Ticks timed back to back per path")
+    _ = parser.add_argument("--rates", type=float, nargs="+", default=[1.0, 50.0], help="Publish rates in Hz")
+    _ = parser.add_argument("--seconds", type=float, default=10.0, help="How long to run the publisher at each rate")
+    _ = parser.add_argument("--samples", type=int, default=1000, help="Random ticks checked against the pydantic models")
+    _ = parser.add_argument("--seed", type=int, default=0)
+    _ = parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    try:
+        results = asyncio.run(main(args))
+    except ValueError as e:
+        print(f"[ERROR] Telemetry contract broken: {e}")
+        sys.exit(1)
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
@@ -0,0 +1,77 @@
+'''
+Query cost of the actuator timeline.
+
+For each window count in --sizes, fills an ActuatorTimeline with that many
+random daily windows (random start within a day, 5 to 30 seconds long) and
+reports the expansion time, how many merged intervals they collapse into, and
+the per-call latency of state_at() and next_transition() at random times
+inside the horizon, queried in time order as the control manager does.
+
+Run from the repository root:
+    python -m plant_module.mqtt_client.benchmarks.timeline_benchmark --output timeline.json
+'''
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any
+
+from plant_module.mqtt_client.timeline import ActuatorTimeline, Window
+from plant_module.mqtt_client.benchmarks.schedule_benchmark import _percentiles
+
+
+def bench_timeline(size: int, queries: int, rng: random.Random) -> dict[str, Any]:
+    base = datetime(2025, 1, 1)
+    timeline = ActuatorTimeline()
+    for index in range(size):
+        start = base + timedelta(seconds=rng.uniform(0, 24 * 3600))
+        timeline.set(f"window_{index}", [Window(start, start + timedelta(seconds=rng.uniform(5, 30)), timedelta(days=1))])
+
+    started = time.perf_counter()
+    intervals = timeline.intervals(base)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    times = sorted(base + timedelta(seconds=rng.uniform(0, 6 * 24 * 3600)) for _ in range(queries))
+    state_us: list[float] = []
+    transition_us: list[float] = []
+    for t in times:
+        started = time.perf_counter_ns()
+        _ = timeline.state_at(t)
+        state_us.append((time.perf_counter_ns() - started) / 1000)
+        started = time.perf_counter_ns()
+        _ = timeline.next_transition(t)
+        transition_us.append((time.perf_counter_ns() - started) / 1000)
+    return {
+        "windows": size,
+        "merged_intervals": len(intervals),
+        "build_ms": build_ms,
+        "state_at_us": _percentiles(state_us),
+        "next_transition_us": _percentiles(transition_us),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Actuator timeline benchmark")
+    _ = parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 5000], help="Window counts to measure")
+    _ = parser.add_argument("--queries", type=int, default=10000, help="Queries per window count")
+    _ = parser.add_argument("--seed", type=int, default=0)
+    _ = parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results: dict[str, Any] = {
+        "benchmark": "timeline",
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "sizes": [bench_timeline(size, args.queries, rng) for size in args.sizes],
+    }
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
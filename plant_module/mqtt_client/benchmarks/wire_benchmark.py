@@ -0,0 +1,129 @@
+'''
+Bytes on the wire per telemetry tick for each topic fan-out and protocol.
+
+SensorPublisher runs on mock sensors with the default calibration, through a
+client that sizes every message as the PUBLISH packet paho-mqtt would send it
+(QoS 0: fixed header, topic, MQTT 5 properties, payload). For every fanout in
+--fanouts and every protocol:
+    - mqtt311: MQTT 3.1.1, the topic in every packet
+    - mqtt5: MQTT 5 without aliases (one more byte per packet for the empty
+      property list)
+    - mqtt5_aliases: MQTT 5 with --aliases topic aliases, the topic sent once
+reports messages and bytes per tick, how many of those bytes are topic names,
+the bytes per day at --interval seconds per tick and the saving against
+"both" over MQTT 3.1.1, which is what the publisher used to send.
+
+Run from the repository root:
+    python -m plant_module.mqtt_client.benchmarks.wire_benchmark --output wire.json
+'''
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+from datetime import datetime, timedelta
+from typing import Any
+from uuid import uuid4
+
+from plant_module.mqtt_client.calibration import Calibrator
+from plant_module.mqtt_client.pot_config import PotConfig
+from plant_module.mqtt_client.sensor_publisher import SensorPublisher
+from plant_module.mqtt_client.telemetry import TelemetryConfig
+
+PROTOCOLS = ("mqtt311", "mqtt5", "mqtt5_aliases")
+BASELINE = ("both", "mqtt311")
+
+
+def _remaining_length_size(length: int) -> int:
+    '''Bytes of the variable-length "remaining length" field'''
+    size = 1
+    while length >= 128:
+        length //= 128
+        size += 1
+    return size
+
+
+class WireClient:
+    """Stands in for aiomqtt.Client and adds up the size of the PUBLISH packets"""
+    def __init__(self, mqtt5: bool) -> None:
+        self.mqtt5: bool = mqtt5
+        self.messages: int = 0
+        self.bytes: int = 0
+        self.topic_bytes: int = 0
+
+    async def publish(self, topic: str, payload: Any = None, qos: int = 0, retain: bool = False, properties: Any = None, **_: Any) -> None:
+        data = payload if isinstance(payload, (bytes, bytearray)) else str(payload).encode()
+        name = topic.encode()
+        remaining = 2 + len(name) + len(data)
+        if self.mqtt5:
+            # Properties come with their own length; an empty list is a single zero byte
+            remaining += len(properties.pack()) if properties is not None else 1
+        self.messages += 1
+        self.topic_bytes += len(name)
+        self.bytes += 1 + _remaining_length_size(remaining) + remaining
+
+
+async def measure(fanout: str, protocol: str, ticks: int, aliases: int, interval: float, seed: int) -> dict[str, Any]:
+    # Same mock readings for every configuration
+    random.seed(seed)
+    pot_config = PotConfig(
+        pot_id=uuid4(),
+        telemetry=TelemetryConfig(fanout=fanout, topic_alias_maximum=aliases if protocol == "mqtt5_aliases" else 0),  # pyright: ignore[reportArgumentType]
+    )
+    client = WireClient(mqtt5=protocol != "mqtt311")
+    publisher = SensorPublisher(
+        client, timedelta(seconds=interval), pot_config, calibrator=Calibrator(pot_config.calibration)  # pyright: ignore[reportArgumentType]
+    )
+    for _ in range(ticks):
+        await publisher._publish_all_readings()
+    bytes_per_tick = client.bytes / ticks
+    return {
+        "fanout": fanout,
+        "protocol": protocol,
+        "messages_per_tick": client.messages / ticks,
+        "bytes_per_tick": bytes_per_tick,
+        "topic_bytes_per_tick": client.topic_bytes / ticks,
+        "bytes_per_day": bytes_per_tick * 86400 / interval,
+    }
+
+
+async def main(args: argparse.Namespace) -> dict[str, Any]:
+    runs = [
+        await measure(fanout, protocol, args.ticks, args.aliases, args.interval, args.seed)
+        for fanout in args.fanouts
+        for protocol in PROTOCOLS
+    ]
+    baseline = await measure(*BASELINE, args.ticks, args.aliases, args.interval, args.seed)
+    for run in runs:
+        run["saving_percent"] = (1 - run["bytes_per_tick"] / baseline["bytes_per_tick"]) * 100
+    return {
+        "benchmark": "wire",
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "ticks": args.ticks,
+        "interval_s": args.interval,
+        "topic_alias_maximum": args.aliases,
+        "baseline": {"fanout": BASELINE[0], "protocol": BASELINE[1], "bytes_per_tick": baseline["bytes_per_tick"]},
+        "runs": runs,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Telemetry bytes-on-wire benchmark")
+    _ = parser.add_argument("--ticks", type=int, default=1000, help="Ticks published per configuration")
+    _ = parser.add_argument("--fanouts", nargs="+", default=["both", "full", "per_sensor"], choices=["both", "full", "per_sensor"])
+    _ = parser.add_argument("--aliases", type=int, default=10, help="Topic Alias Maximum for the mqtt5_aliases runs")
+    _ = parser.add_argument("--interval", type=float, default=2.0, help="Seconds per tick, for bytes_per_day")
+    _ = parser.add_argument("--seed", type=int, default=0)
+    _ = parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args))
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
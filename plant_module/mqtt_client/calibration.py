@@ -0,0 +1,149 @@
+'''
+Per-pot calibration of raw sensor values into physical units.
+
+The ADC channels report raw counts (0-1023) and the ultrasonic sensor the
+distance in cm from the sensor down to the water. A calibration curve maps one
+raw field to a physical quantity by piecewise-linear interpolation between
+measured points, clamped to the first and last point outside them. For example,
+a soil probe read in soil of known volumetric water content:
+
+    "soil_moisture_sensor": {
+        "quantity": "soil_vwc_percent",
+        "points": [[350, 50.0], [500, 35.0], [650, 20.0], [800, 8.0], [900, 0.0]]
+    }
+
+Curves are set per pot (PotConfig.calibration, DEFAULT_CALIBRATION unless the
+config file says otherwise). Calibrator compiles every curve once into the
+slope and intercept of each segment, so converting a value is a bisect and a
+multiply-add. convert_batch() converts a whole buffered column of raw values at
+once, with numpy.interp when numpy is installed and a loop over the compiled
+segments when it is not. numpy is only imported by the first batch, so it
+doesn't slow down startup.
+'''
+from bisect import bisect_right
+from functools import cache
+from typing import Any, Mapping, Sequence
+
+from pydantic import BaseModel, Field, model_validator
+
+from .control_rules import SensorField
+from .startup import LAZY_STARTUP
+
+
+class CalibrationCurve(BaseModel):
+    quantity: str # name of the converted value, unit included, e.g. "soil_vwc_percent"
+    points: list[tuple[float, float]] = Field(min_length=2) # (raw, value), raw strictly increasing
+    model_config = {"defer_build": LAZY_STARTUP}
+
+    @model_validator(mode="after")
+    def _check_points(self):
+        raws = [raw for raw, _ in self.points]
+        if any(current <= previous for previous, current in zip(raws, raws[1:])):
+            raise ValueError("Calibration points must be sorted by strictly increasing raw value")
+        return self
+
+
+# Typical values for the kit's sensors; measure your own for real numbers
+DEFAULT_CALIBRATION: dict[SensorField, CalibrationCurve] = {
+    # Capacitive probe: the drier the soil, the higher the count
+    "soil_moisture_sensor": CalibrationCurve(
+        quantity="soil_vwc_percent",
+        points=[(350, 50.0), (500, 35.0), (650, 20.0), (800, 8.0), (900, 0.0)],
+    ),
+    # Photoresistor divider, roughly logarithmic in lux
+    "light_sensor": CalibrationCurve(
+        quantity="light_lux",
+        points=[(0, 0.0), (200, 10.0), (400, 100.0), (600, 500.0), (800, 2000.0), (1023, 10000.0)],
+    ),
+    # Distance to the water: 3 cm when the tank is full, 25 cm when it is empty
+    "water_level_sensor": CalibrationCurve(
+        quantity="tank_fill_percent",
+        points=[(3, 100.0), (25, 0.0)],
+    ),
+}
+
+
+@cache
+def _numpy() -> Any | None:
+    '''numpy, imported on first use, or None if it isn't installed'''
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class Calibrator:
+    """
+    Converts raw readings with compiled calibration curves.
+
+    Each curve becomes ``(quantity, raws, values, slopes, intercepts)``: between
+    ``raws[i]`` and ``raws[i + 1]`` a raw value maps to ``slopes[i] * raw + intercepts[i]``.
+    """
+    def __init__(self, curves: Mapping[SensorField, CalibrationCurve]) -> None:
+        self.curves: dict[SensorField, CalibrationCurve] = dict(curves)
+        self._compiled: dict[str, tuple[str, list[float], list[float], list[float], list[float]]] = {}
+        # field -> (raws, values) as numpy arrays, built on the first batch
+        self._arrays: dict[str, tuple[Any, Any]] = {}
+        for field, curve in self.curves.items():
+            raws = [float(raw) for raw, _ in curve.points]
+            values = [float(value) for _, value in curve.points]
+            slopes: list[float] = []
+            intercepts: list[float] = []
+            for index in range(len(raws) - 1):
+                slope = (values[index + 1] - values[index]) / (raws[index + 1] - raws[index])
+                slopes.append(slope)
+                intercepts.append(values[index] - slope * raws[index])
+            self._compiled[field] = (curve.quantity, raws, values, slopes, intercepts)
+
+    @property
+    def quantities(self) -> dict[str, str]:
+        """Raw field -> name of the quantity it is converted to"""
+        return {field: compiled[0] for field, compiled in self._compiled.items()}
+
+    def convert_value(self, field: str, raw: float) -> float:
+        """Convert one raw value of ``field``; raises KeyError if it has no curve"""
+        _, raws, values, slopes, intercepts = self._compiled[field]
+        if raw <= raws[0]:
+            return values[0]
+        if raw >= raws[-1]:
+            return values[-1]
+        index = bisect_right(raws, raw) - 1
+        return slopes[index] * raw + intercepts[index]
+
+    def convert(self, readings: Mapping[str, int | float | None]) -> dict[str, float]:
+        """
+        Quantity -> converted value for every calibrated field of ``readings``.
+        Fields without a curve, and missing or None readings, are left out.
+        """
+        converted: dict[str, float] = {}
+        for field, value in readings.items():
+            if value is not None and field in self._compiled:
+                converted[self._compiled[field][0]] = self.convert_value(field, value)
+        return converted
+
+    def convert_batch(self, field: str, raws: Sequence[float] | Any) -> Any:
+        """
+        Convert a column of raw values of ``field`` at once.
+
+        Returns a numpy array when numpy is installed (``raws`` may then be an
+        array too), a list of floats otherwise.
+        """
+        np = _numpy()
+        if np is not None:
+            arrays = self._arrays.get(field)
+            if arrays is None:
+                _, points, values, _, _ = self._compiled[field]
+                arrays = self._arrays[field] = (np.array(points), np.array(values))
+            return np.interp(np.asarray(raws, dtype=float), *arrays)
+        convert = self.convert_value
+        return [convert(field, raw) for raw in raws]
+
+    def convert_columns(self, columns: Mapping[str, Sequence[float] | Any]) -> dict[str, Any]:
+        """convert_batch() for every calibrated column of a buffer, keyed by quantity"""
+        return {
+            self._compiled[field][0]: self.convert_batch(field, raws)
+            for field, raws in columns.items()
+            if field in self._compiled
+        }
+
@@ -0,0 +1,112 @@
+'''
+Time sources for the scheduler and sensor publisher.
+
+:class:`SystemClock` is the real wall clock and the default everywhere.
+:class:`VirtualClock` keeps its own notion of time that only moves when the
+event loop is idle: run code on :meth:`VirtualClock.run` (or a loop from
+:meth:`VirtualClock.new_event_loop`) and every ``asyncio.sleep``/``wait_for``
+timeout completes as soon as nothing else is runnable, with the clock jumped
+forward by the timeout. A week of schedules and 2 s sensor ticks then replays
+in seconds.
+
+Components that need the current date must read it from their clock
+(``clock.now()``) rather than ``datetime.now()`` so they stay consistent with
+the loop's time.
+'''
+import asyncio
+import selectors
+import time
+from datetime import datetime, timedelta
+from typing import Any, Coroutine, TypeVar
+
+T = TypeVar("T")
+
+
+class Clock:
+    def now(self) -> datetime:
+        return datetime.now()
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    async def sleep(self, seconds: float) -> None:
+        await asyncio.sleep(seconds)
+
+
+class SystemClock(Clock):
+    pass
+
+
+SYSTEM_CLOCK = SystemClock()
+
+
+class VirtualClock(Clock):
+    """
+    Virtual time that starts at ``start`` (default: now).
+
+    :param speed: None jumps straight to the next timer whenever the loop is idle.
+        A number instead waits ``timeout / speed`` real seconds, so the loop can
+        still exchange traffic with a real broker at ``speed`` times real time.
+    """
+    def __init__(self, start: datetime | None = None, speed: float | None = None) -> None:
+        self.start: datetime = start or datetime.now()
+        self.speed: float | None = speed
+        self._elapsed: float = 0.0
+
+    def now(self) -> datetime:
+        return self.start + timedelta(seconds=self._elapsed)
+
+    def monotonic(self) -> float:
+        return self._elapsed
+
+    def advance(self, seconds: float) -> None:
+        """Move virtual time forward; also usable as a blocking ``sleep`` replacement"""
+        if seconds > 0:
+            self._elapsed += seconds
+
+    def new_event_loop(self) -> 'VirtualTimeEventLoop':
+        return VirtualTimeEventLoop(self)
+
+    def run(self, coro: Coroutine[Any, Any, T]) -> T:
+        """Like :func:`asyncio.run`, on a loop driven by this clock"""
+        loop = self.new_event_loop()
+        try:
+            asyncio.set_event_loop(loop)
+            return loop.run_until_complete(coro)
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+
+class _VirtualTimeSelector(selectors.DefaultSelector):
+    """Polls real I/O without blocking and turns the loop's timer waits into clock jumps"""
+    def __init__(self, clock: VirtualClock) -> None:
+        super().__init__()
+        self._clock: VirtualClock = clock
+
+    def select(self, timeout: float | None = None) -> list[tuple[selectors.SelectorKey, int]]:
+        events = super().select(0)
+        if events or timeout == 0:
+            return events
+        if timeout is None:
+            # No timers pending: only I/O (e.g. a finished executor job) can wake the loop
+            return super().select(None)
+        if self._clock.speed is None:
+            self._clock.advance(timeout)
+            return events
+        started = time.monotonic()
+        events = super().select(timeout / self._clock.speed)
+        if events:
+            self._clock.advance(min(timeout, (time.monotonic() - started) * self._clock.speed))
+        else:
+            self._clock.advance(timeout)
+        return events
+
+
+class VirtualTimeEventLoop(asyncio.SelectorEventLoop):
+    def __init__(self, clock: VirtualClock) -> None:
+        super().__init__(_VirtualTimeSelector(clock))
+        self.clock: VirtualClock = clock
+
+    def time(self) -> float:
+        return self.clock.monotonic()
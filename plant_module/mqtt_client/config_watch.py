@@ -0,0 +1,184 @@
+'''
+Live reload of the pot config file.
+
+ConfigWatcher reads the file on first use of .config, not at import or
+construction, and watch() then follows it: on Linux with inotify on its
+directory (editors and `cp` replace the file instead of writing it in place,
+so the directory sees the IN_CLOSE_WRITE or IN_MOVED_TO), elsewhere by checking
+its modification time every `poll_interval` seconds. inotify is called through
+ctypes on the libc the interpreter already loaded, so it needs no package, and
+its descriptor is watched by the event loop itself, with no extra thread.
+
+A change is read once the writes have settled for `debounce` seconds. If the
+new file doesn't validate, the running config stays and the error is logged, so
+a half-edited file can't take the device down. Otherwise every listener is
+called with (old, new) in the event loop; they apply what changed (see
+device_config.py for what is live and what needs a restart).
+
+    watcher = ConfigWatcher(path)
+    publisher = SensorPublisher(client, interval, watcher.config, ...)
+    watcher.listeners.append(lambda old, new: publisher.apply_config(new))
+    asyncio.create_task(watcher.watch())
+'''
+import asyncio
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+import sys
+from functools import cache
+from typing import Any, Callable
+
+from .pot_config import DEFAULT_POT_CONFIG_PATH, PotConfig
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+# struct inotify_event without its name: wd, mask, cookie, len
+_EVENT_HEADER = struct.Struct("iIII")
+
+DEFAULT_DEBOUNCE = 0.2
+DEFAULT_POLL_INTERVAL = 2.0
+
+ConfigListener = Callable[[PotConfig, PotConfig], None]
+
+
+@cache
+def _libc() -> Any | None:
+    '''libc with inotify_init1 and inotify_add_watch, or None where there is none'''
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        _ = libc.inotify_init1, libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def _event_names(data: bytes) -> list[bytes]:
+    '''File names of the inotify events in ``data``'''
+    names: list[bytes] = []
+    offset = 0
+    while offset + _EVENT_HEADER.size <= len(data):
+        _, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+        offset += _EVENT_HEADER.size
+        names.append(data[offset:offset + length].rstrip(b"\0"))
+        offset += length
+    return names
+
+
+def restart_required(old: PotConfig, new: PotConfig) -> list[str]:
+    '''Names of the changed settings that only take effect on the next start'''
+    changed: list[str] = []
+    if new.pot_id != old.pot_id:
+        changed.append("pot_id")
+    if new.device.pins != old.device.pins:
+        changed.append("device.pins")
+    return changed
+
+
+class ConfigWatcher:
+    def __init__(
+        self,
+        path: str = DEFAULT_POT_CONFIG_PATH,
+        debounce: float = DEFAULT_DEBOUNCE,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+    ) -> None:
+        self.path: str = os.path.abspath(path)
+        self.debounce: float = debounce
+        self.poll_interval: float = poll_interval
+        # Called with (old, new) after every change that validated
+        self.listeners: list[ConfigListener] = []
+        self._config: PotConfig | None = None
+
+    @property
+    def config(self) -> PotConfig:
+        """The current config; the file is read on first access (defaults if there is none)"""
+        if self._config is None:
+            self._config = PotConfig.load_from_file(self.path) or PotConfig()
+        return self._config
+
+    def reload(self) -> bool:
+        """Read the file again and notify the listeners; returns True if the config changed"""
+        old = self.config
+        new = PotConfig.load_from_file(self.path)
+        if new is None:
+            logging.error(f"Pot config {self.path} is missing or invalid, keeping the running one")
+            return False
+        if new == old:
+            return False
+        self._config = new
+        logging.info(f"Pot config {self.path} changed")
+        for setting in restart_required(old, new):
+            logging.warning(f"{setting} changed in {self.path}; it takes effect on the next start")
+        for listener in self.listeners:
+            try:
+                listener(old, new)
+            except Exception as e:
+                logging.exception(f"Applying the new pot config failed: {e}")
+        return True
+
+    async def watch(self) -> None:
+        """Reload on every change of the file, until cancelled"""
+        _ = self.config
+        fd = self._inotify_fd()
+        if fd is None:
+            await self._poll()
+            return
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+        name = os.path.basename(self.path).encode()
+
+        def on_readable() -> None:
+            try:
+                data = os.read(fd, 65536)
+            except BlockingIOError:
+                return
+            if name in _event_names(data):
+                changed.set()
+
+        loop.add_reader(fd, on_readable)
+        try:
+            while True:
+                _ = await changed.wait()
+                # Writers may take several steps; read once they are done
+                await asyncio.sleep(self.debounce)
+                changed.clear()
+                _ = self.reload()
+        finally:
+            _ = loop.remove_reader(fd)
+            os.close(fd)
+
+    def _inotify_fd(self) -> int | None:
+        libc = _libc()
+        if libc is None:
+            return None
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return None
+        directory = os.path.dirname(self.path)
+        if libc.inotify_add_watch(fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            logging.warning(f"Can't watch {directory} with inotify ({os.strerror(ctypes.get_errno())}), polling instead")
+            os.close(fd)
+            return None
+        return fd
+
+    async def _poll(self) -> None:
+        def stamp() -> tuple[int, int] | None:
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                return None
+            return stat.st_mtime_ns, stat.st_size
+
+        last = stamp()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            current = stamp()
+            if current != last:
+                last = current
+                await asyncio.sleep(self.debounce)
+                _ = self.reload()
@@ -1,18 +1,23 @@
 from asyncio.tasks import Task
-from typing import Any, Callable
+from typing import Any, Callable, Coroutine
 from aiomqtt import Client
 
 from plant_module.mqtt_client.pot_config import PotConfig
 from plant_module.mqtt_client.sensors_translation import SensorsController
 from .control_request import *
 from enum import Enum, StrEnum
-from uuid import UUID
+from uuid import UUID, uuid4
 from plant_module.mqtt_client.mqtt_handler import MQTTHandler
 import asyncio
+import contextvars
+import json
 import time
 
-from .mock_sensors import WATER_PULSE_DURATION, WaterPump, LightBulb
+from .mock_sensors import WaterPump, LightBulb
 from .schedule import Scheduler, ScheduledEvent
+from .timeline import ActuatorTimeline, Window
+from . import tracing
+from .clock import SYSTEM_CLOCK, Clock
 
 
 class Sensor(StrEnum):
@@ -25,39 +30,225 @@ class Sensor(StrEnum):
     
 
 
+def actuator_tag(actuator: str) -> str:
+    return f"actuator:{actuator}"
+
+
+def schedule_tag(schedule_id: str) -> str:
+    return f"schedule:{schedule_id}"
+
+
+def timeline_tag(actuator: str) -> str:
+    return f"timeline:{actuator}"
+
+
+def actuator_state_topic(pot_id: UUID | str, actuator: str = "+") -> str:
+    """Retained topic with the state of an actuator as {"actuator": ..., "on": ...}; "+" for all of them"""
+    return f"/{pot_id}/actuators/{actuator}"
+
+
 class ControlManager(MQTTHandler):
-    def __init__(self, pot_config: PotConfig, client: Client) -> None:
+    def __init__(self, pot_config: PotConfig, client: Client, clock: Clock = SYSTEM_CLOCK) -> None:
         self.pot_id: UUID = pot_config.pot_id
         self.client: Client = client
         self.control_topic: str = f"/{self.pot_id}/control"
+        self.schedules_topic: str = f"/{self.pot_id}/control/schedules"
         self.SENSOR_TOPIC_PREFIX: str = f"{self.pot_id}/sensors"
         self.if_sensors_publishing: bool = False
         self.water_pump: WaterPump = WaterPump()
         self.water_pump.setup()
         self.light_bulb: LightBulb = LightBulb()
         self.light_bulb.setup()
-        self.scheduler: Scheduler = Scheduler()
+        self.clock: Clock = clock
+        device = pot_config.device
+        # How long a "water now" request runs the pump
+        self.water_pulse_duration: timedelta = device.water_pulse_duration
+        self.scheduler: Scheduler = Scheduler(clock=clock, max_concurrent_actions=device.max_concurrent_actions)
         self.scheduler_task: Task[None] = asyncio.create_task(self.scheduler.run())
-        controller = SensorsController()
+        # actuator -> schedule_id -> request that created it; the events themselves
+        # are tagged with actuator_tag() and schedule_tag() in the scheduler
+        self.schedules: dict[str, dict[str, LightControlRequest | WaterPumpControlRequest]] = {
+            "light_bulb": {},
+            "water_pump": {},
+        }
+        # Light "on" schedules are kept as windows on a timeline instead of as on/off
+        # events; a single scheduler event per actuator fires its next real transition
+        self.timelines: dict[str, ActuatorTimeline] = {"light_bulb": ActuatorTimeline()}
+        self._timeline_state: dict[str, bool] = {actuator: False for actuator in self.timelines}
+        controller = SensorsController(
+            deadlines=device.sensor_deadlines, max_stale_age=device.max_stale_age, pins=device.pins.model_dump()
+        )
         controller.setup()
         self.controller = controller
+        # The sensor publisher runs in another process with its own controller, so
+        # switches made here reach its adaptive sampling over actuator_state_topic()
+        self.actuator_state: dict[str, bool] = {"light_bulb": False, "water_pump": False}
+        self._loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        controller.actuator_listeners.append(self._actuator_switched)
+
+    def apply_config(self, pot_config: PotConfig) -> None:
+        """Apply a changed pot config; pulses already running keep their old duration"""
+        device = pot_config.device
+        self.water_pulse_duration = device.water_pulse_duration
+        self.scheduler.set_max_concurrent_actions(device.max_concurrent_actions)
+        self.controller.set_limits(device.sensor_deadlines, device.max_stale_age)
         
+    def _actuator_switched(self, actuator: str, on: bool) -> None:
+        """SensorsController listener; called from the executor threads"""
+        _ = self._loop.call_soon_threadsafe(self._record_actuator, actuator, on)
+
+    def _record_actuator(self, actuator: str, on: bool) -> None:
+        self.actuator_state[actuator] = on
+        _ = asyncio.create_task(self.publish_actuator_state(actuator))
+
+    async def publish_actuator_state(self, actuator: str | None = None) -> None:
+        """Publish the state of one actuator, or of all of them (after connecting)"""
+        for name in [actuator] if actuator is not None else list(self.actuator_state):
+            # The state at the time of publishing, so the last message is always the current one
+            payload = json.dumps({"actuator": name, "on": self.actuator_state[name]})
+            try:
+                await self.client.publish(actuator_state_topic(self.pot_id, name), payload, qos=1, retain=True)
+            except Exception as e:
+                print(f"[ERROR] Failed to publish the state of {name}: {e}")
+
     async def handle_message(self, topic: str, payload: bytes) -> None:
         request = self._decode_payload(payload)
-        if isinstance(request, LightControlRequest):
+        if isinstance(request, ScheduleListRequest):
+            await self._publish_schedules(request)
+        elif isinstance(request, ScheduleCancelRequest):
+            await self._cancel_schedules(request)
+        elif isinstance(request, LightControlRequest):
             self._handle_light_control_request(request)
         else:
             self._handle_water_pump_control_request(request)
             
     
     def _decode_payload(self, payload: bytes) -> ControlRequest:
-        import json
-        payload_str = payload.decode("utf-8")
-        payload_dict = json.loads(payload_str)
-        request: ControlRequest = TypeAdapter(ControlRequest).validate_python(payload_dict);
+        with tracing.span("decode"):
+            request: ControlRequest = control_request_adapter().validate_json(payload)
         return request
+
+    def _create_traced_task(self, coro: Coroutine[Any, Any, None]) -> None:
+        """``asyncio.create_task`` that marks the start of the task hop on the current trace"""
+        trace = tracing.current_trace()
+        if trace is not None:
+            trace.mark("create_task_hop")
+        _ = asyncio.create_task(coro)
+
+    def _end_task_hop(self) -> None:
+        trace = tracing.current_trace()
+        if trace is not None:
+            trace.end("create_task_hop")
+
+    def _schedule_tags(self, request: LightControlRequest | WaterPumpControlRequest) -> tuple[str, str]:
+        """Pick the schedule id for a request and return the tags for its events"""
+        schedule_id = request.schedule_id or uuid4().hex
+        return actuator_tag(request.actuator), schedule_tag(schedule_id)
+
+    async def _set_schedule(
+        self,
+        request: LightControlRequest | WaterPumpControlRequest,
+        tags: tuple[str, str],
+        events: list[ScheduledEvent],
+        windows: list[Window] | None = None,
+    ) -> None:
+        """Install ``events`` and ``windows`` as the schedule, atomically replacing any schedule with the same id"""
+        schedule_id = tags[1].removeprefix("schedule:")
+        _ = await self.scheduler.replace_tagged(tags[1], events)
+        for schedules in self.schedules.values():
+            _ = schedules.pop(schedule_id, None)
+        self.schedules[request.actuator][schedule_id] = request
+        changed = {actuator for actuator, timeline in self.timelines.items() if timeline.remove(schedule_id)}
+        if windows:
+            self.timelines[request.actuator].set(schedule_id, windows)
+            changed.add(request.actuator)
+        for actuator in changed:
+            await self._sync_timeline(actuator)
+
+    def _set_actuator(self, actuator: str, on: bool) -> None:
+        if actuator == "light_bulb":
+            _ = self.controller.light_bulb_on() if on else self.controller.light_bulb_off()
+        else:
+            _ = self.controller.water_pump_on() if on else self.controller.water_pump_off()
+
+    async def _sync_timeline(self, actuator: str) -> None:
+        """Apply the timeline's state if it changed, then arm the event for its next transition"""
+        timeline = self.timelines[actuator]
+        now = self.clock.now()
+        desired = timeline.state_at(now)
+        if desired != self._timeline_state[actuator]:
+            self._timeline_state[actuator] = desired
+            self._set_actuator(actuator, desired)
+        transition = timeline.next_transition(now)
+        events: list[ScheduledEvent] = []
+        if transition is not None:
+            async def on_transition() -> None:
+                await self._sync_timeline(actuator)
+            events.append(ScheduledEvent(transition[0], on_transition, tags=(timeline_tag(actuator),), lane=actuator))
+        _ = await self.scheduler.replace_tagged(timeline_tag(actuator), events)
+
+    def _schedule_entries(self, actuator: str) -> list[dict[str, Any]]:
+        entries: list[dict[str, Any]] = []
+        schedules = self.schedules[actuator]
+        timeline = self.timelines.get(actuator)
+        now = self.clock.now()
+        for schedule_id, request in list(schedules.items()):
+            next_runs = [event.execution_time for event in self.scheduler.tagged(schedule_tag(schedule_id))]
+            if timeline is not None and schedule_id in timeline:
+                next_window = timeline.next_start(schedule_id, now)
+                if next_window is not None:
+                    next_runs.append(next_window)
+            if not next_runs:
+                # Every event has fired and none repeats
+                del schedules[schedule_id]
+                if timeline is not None:
+                    _ = timeline.remove(schedule_id)
+                continue
+            entries.append({
+                "schedule_id": schedule_id,
+                "actuator": actuator,
+                "next_run": min(next_runs).isoformat(),
+                "request": request.model_dump(mode="json", exclude={"schedule_id"}),
+            })
+        return entries
+
+    async def _publish_schedules(self, request: ScheduleListRequest) -> None:
+        actuators = [request.actuator] if request.actuator else list(self.schedules)
+        entries = [entry for actuator in actuators for entry in self._schedule_entries(actuator)]
+        await self.client.publish(self.schedules_topic, json.dumps({"action": "list_schedules", "schedules": entries}))
+
+    async def _cancel_schedules(self, request: ScheduleCancelRequest) -> None:
+        actuators = [request.actuator] if request.actuator else list(self.schedules)
+        cancelled: list[str] = []
+        removed_events = 0
+        changed_timelines: list[str] = []
+        if request.schedule_id is not None:
+            for actuator in actuators:
+                if self.schedules[actuator].pop(request.schedule_id, None) is not None:
+                    removed_events += len(await self.scheduler.remove_tagged(schedule_tag(request.schedule_id)))
+                    cancelled.append(request.schedule_id)
+                timeline = self.timelines.get(actuator)
+                if timeline is not None and timeline.remove(request.schedule_id):
+                    changed_timelines.append(actuator)
+        else:
+            for actuator in actuators:
+                removed_events += len(await self.scheduler.remove_tagged(actuator_tag(actuator)))
+                cancelled.extend(self.schedules[actuator])
+                self.schedules[actuator].clear()
+                timeline = self.timelines.get(actuator)
+                if timeline is not None and timeline.clear():
+                    changed_timelines.append(actuator)
+        # A cancelled window that is on right now turns the actuator off
+        for actuator in changed_timelines:
+            await self._sync_timeline(actuator)
+        await self.client.publish(self.schedules_topic, json.dumps({
+            "action": "cancel_schedule",
+            "cancelled": cancelled,
+            "events": removed_events,
+        }))
     
     async def _schedule_lightbulb(self, request: LightControlRequest) -> None:
+        self._end_task_hop()
         if not request.scheduled_time:
             print("[ERROR] Request passed to _schedule_lightbulb without scheduled_time")
             return
@@ -66,48 +257,42 @@ class ControlManager(MQTTHandler):
     
         # Helper to resolve "now"
         def resolve_time(t: datetime | Literal["now"]) -> datetime:
-            from datetime import datetime
             if t == "now":
-                return datetime.now()
+                return self.clock.now()
             return t
         
-        def on_action():
-            self.controller.light_bulb_on()
         def off_action():
             self.controller.light_bulb_off()
         
         start_time = resolve_time(st.start_time)
         repeat_interval = st.repeat_interval
+        recurrence = st.recurrence()
+        first_time = start_time
+        if recurrence is not None:
+            # With cron, start_time is when the recurrence begins
+            first_time = recurrence.first_at_or_after(start_time)
+            if first_time is None:
+                print(f"[WARN] Cron expression {st.cron!r} never fires, ignoring schedule")
+                return
+        tags = self._schedule_tags(request)
     
         if request.command == "on":
+            # ON windows go on the timeline, which merges overlapping schedules
             # ON with duration
             if st.duration is not None:
-                
-                # Schedule ON
-                await self.scheduler.add_event(
-                    ScheduledEvent(start_time, on_action, repeat_interval)
-                )
-                # Schedule OFF after duration
-                await self.scheduler.add_event(
-                    ScheduledEvent(start_time + st.duration, off_action, repeat_interval)
-                )
+                window = Window(first_time, first_time + st.duration, repeat_interval, recurrence)
             # ON with end_time
             elif st.end_time is not None:
-                await self.scheduler.add_event(
-                    ScheduledEvent(start_time, on_action, repeat_interval)
-                )
-                await self.scheduler.add_event(
-                    ScheduledEvent(resolve_time(st.end_time), off_action, repeat_interval)
-                )
+                duration = resolve_time(st.end_time) - start_time
+                window = Window(first_time, first_time + duration, repeat_interval, recurrence)
             # ON indefinitely from start_time
             else:
-                await self.scheduler.add_event(
-                    ScheduledEvent(start_time, on_action, repeat_interval)
-                )
+                window = Window(first_time)
+            await self._set_schedule(request, tags, [], [window])
         elif request.command == "off":
-            await self.scheduler.add_event(
-                ScheduledEvent(start_time, off_action, repeat_interval)
-            )
+            await self._set_schedule(request, tags, [ScheduledEvent(
+                first_time, off_action, repeat_interval, tags, recurrence, st.misfire, offload=True, lane="light_bulb"
+            )])
     
     def _handle_light_control_request(self, request: LightControlRequest) -> None:
         if not request.scheduled_time:
@@ -118,12 +303,13 @@ class ControlManager(MQTTHandler):
                 self.controller.light_bulb_off()
         else:
             # Scheduled or repeating action
-            _ = asyncio.create_task(self._schedule_lightbulb(request))
+            self._create_traced_task(self._schedule_lightbulb(request))
             
     def _handle_water_pump_control_request(self, request: WaterPumpControlRequest) -> None:
-        _ = asyncio.create_task(self._schedule_water_pump(request))
+        self._create_traced_task(self._schedule_water_pump(request))
         
     async def _schedule_water_pump(self, request: WaterPumpControlRequest):
+        self._end_task_hop()
         def on_action():
             self.controller.water_pump_on()
         def off_action():
@@ -133,7 +319,7 @@ class ControlManager(MQTTHandler):
                 if request.command == "on":
                     on_action()
                     await self.scheduler.add_event(
-                        ScheduledEvent(datetime.now() + WATER_PULSE_DURATION, off_action)
+                        ScheduledEvent(self.clock.now() + self.water_pulse_duration, off_action, offload=True, lane="water_pump")
                     )
                 else:
                     off_action()
@@ -145,20 +331,31 @@ class ControlManager(MQTTHandler):
         st = request.scheduled_time
         # Helper to resolve "now"
         def resolve_time(t: datetime | Literal["now"]) -> datetime:
-            from datetime import datetime
             if t == "now":
-                return datetime.now()
+                return self.clock.now()
             return t
+
+        async def pulse_action():
+            # The off event is not part of the schedule, so cancelling the
+            # schedule mid-pulse can't leave the pump running
+            await asyncio.get_running_loop().run_in_executor(self.scheduler.executor, contextvars.copy_context().run, on_action)
+            await self.scheduler.add_event(
+                ScheduledEvent(self.clock.now() + self.water_pulse_duration, off_action, offload=True, lane="water_pump")
+            )
             
         start_time = resolve_time(st.start_time)
-        repeat_interval = st.repeat_interval
-            
-        await self.scheduler.add_event(
-            ScheduledEvent(start_time, on_action, repeat_interval)
-        )
-        await self.scheduler.add_event(
-            ScheduledEvent(start_time + WATER_PULSE_DURATION, off_action, repeat_interval)
-        )
+        recurrence = st.recurrence()
+        if recurrence is not None:
+            # With cron, start_time is when the recurrence begins
+            first_time = recurrence.first_at_or_after(start_time)
+            if first_time is None:
+                print(f"[WARN] Cron expression {st.cron!r} never fires, ignoring schedule")
+                return
+            start_time = first_time
+        tags = self._schedule_tags(request)
+        await self._set_schedule(request, tags, [ScheduledEvent(
+            start_time, pulse_action, st.repeat_interval, tags, recurrence, st.misfire, lane="water_pump"
+        )])
         
         
     def _start_sensor_publishing(self) -> None:
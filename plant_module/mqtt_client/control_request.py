@@ -2,22 +2,49 @@ from enum import Enum
 from datetime import datetime, timedelta
 from re import A
 from typing import Annotated, Literal
-from pydantic import BaseModel
+from functools import cache
+from pydantic import BaseModel, model_validator
 from pydantic import TypeAdapter
 
+from .startup import LAZY_STARTUP
+from .recurrence import CronSchedule
+from .schedule import MisfirePolicy
+
 ActuatorLiteral = Literal["water_pump", "light_bulb"]
 Command = Literal["on", "off"]
 
 
+'''
+Base for scheduled times that can repeat, either every repeat_interval or on a cron schedule
+'''
+class RepeatableScheduledTime(BaseModel):
+    repeat_interval: timedelta | None = None # how often to repeat
+    cron: str | None = None # OR calendar recurrence, e.g. "0 6 * * MON-FRI" (see recurrence.py)
+    misfire: MisfirePolicy = "skip" # what to do with occurrences missed while the module was stalled, see schedule.py
+    model_config = {"defer_build": LAZY_STARTUP}
+
+    @model_validator(mode="after")
+    def _check_recurrence(self):
+        if self.cron is not None:
+            if self.repeat_interval is not None:
+                raise ValueError("repeat_interval and cron are mutually exclusive")
+            _ = CronSchedule(self.cron)
+        return self
+
+    def recurrence(self) -> CronSchedule | None:
+        return CronSchedule(self.cron) if self.cron is not None else None
+
+
 '''
 Scheduled time with a duration or an end time with optional repeat interval
 '''
-class DurationScheduledTime(BaseModel):
+class DurationScheduledTime(RepeatableScheduledTime):
     start_time: datetime | Literal["now"] # when to start, now or at a specific time
     end_time: datetime | None = None # when to end
     duration: timedelta | None = None # OR how long
-    repeat_interval: timedelta | None = None # AND how often to repeat
+    # AND how often to repeat: repeat_interval or cron, see RepeatableScheduledTime
     model_config = {
+        "defer_build": LAZY_STARTUP,
         "json_schema_extra": {
             "oneOf": [
                 { # end at a specific end_time
@@ -39,9 +66,10 @@ class DurationScheduledTime(BaseModel):
 '''
 Scheduled time representing an impulse with optional repeat interval
 '''
-class ImpulseScheduledTime(BaseModel):
+class ImpulseScheduledTime(RepeatableScheduledTime):
     start_time: datetime | Literal["now"] # when to start, now or at a specific time
-    repeat_interval: timedelta | None = None # how often to repeat
+    # how often to repeat: repeat_interval or cron, see RepeatableScheduledTime
+    model_config = {"defer_build": LAZY_STARTUP}
 
 '''
 Examples:
@@ -75,6 +103,17 @@ Examples:
             "repeat_interval": "P1D"
         }
     }
+    - Turn the light on for an hour at 06:00 on weekdays (with cron, start_time is
+    when the recurrence begins; the first run is the first cron match from then on)
+    {
+        "actuator": "light_bulb",
+        "command": "on",
+        "scheduled_time": {
+            "start_time": "now",
+            "duration": "PT1H",
+            "cron": "0 6 * * MON-FRI"
+        }
+    }
     - Turn the light on now indefinitely
     (for immediate, non-repeating actions you can ommit scheduled_time)
     {
@@ -96,11 +135,26 @@ Examples:
         "actuator": "light_bulb",
         "command": "on"
     }
+
+    - Name a schedule so it can be listed, cancelled or replaced later; sending
+    another request with the same schedule_id replaces it atomically
+    {
+        "actuator": "light_bulb",
+        "command": "on",
+        "schedule_id": "evening",
+        "scheduled_time": {
+            "start_time": "2023-04-01T20:00:00",
+            "duration": "PT1H",
+            "repeat_interval": "P1D"
+        }
+    }
 '''
 class LightControlRequest(BaseModel):
     actuator: Literal["light_bulb"]
     command: Command
     scheduled_time: DurationScheduledTime | None = None # Schedule the action to execute later or in a loop
+    schedule_id: str | None = None # Client-chosen name of the schedule, generated if omitted
+    model_config = {"defer_build": LAZY_STARTUP}
 
 '''
 Examples:
@@ -130,6 +184,28 @@ Examples:
         }
     }
     
+    - Water the plant every 2 hours between 08:00 and 20:00
+    {
+        "actuator": "water_pump",
+        "command": "on",
+        "scheduled_time": {
+            "start_time": "now",
+            "cron": "0 8-20/2 * * *"
+        }
+    }
+    
+    - Water the plant every hour, but if the module was down when a pulse was
+    due, don't water late (the default, "skip", waters once on recovery)
+    {
+        "actuator": "water_pump",
+        "command": "on",
+        "scheduled_time": {
+            "start_time": "now",
+            "repeat_interval": "PT1H",
+            "misfire": "drop"
+        }
+    }
+    
     - Water the plant now and every 24h from now 
     (for all scheduled actions you have to include scheduled_time and start_time)
     {
@@ -148,12 +224,63 @@ class WaterPumpControlRequest(BaseModel):
     actuator: Literal["water_pump"]
     command: Command
     scheduled_time: ImpulseScheduledTime | None = None
+    schedule_id: str | None = None # Client-chosen name of the schedule, generated if omitted
+    model_config = {"defer_build": LAZY_STARTUP}
+
+'''
+Schedule management. The answer is published on /<pot_id>/control/schedules.
+Examples:
+    - List every schedule of the pot
+    {
+        "action": "list_schedules"
+    }
+
+    - List the light schedules
+    {
+        "action": "list_schedules",
+        "actuator": "light_bulb"
+    }
+'''
+class ScheduleListRequest(BaseModel):
+    action: Literal["list_schedules"]
+    actuator: ActuatorLiteral | None = None # only this actuator's schedules
+    model_config = {"defer_build": LAZY_STARTUP}
+
+'''
+Examples:
+    - Cancel one schedule
+    {
+        "action": "cancel_schedule",
+        "schedule_id": "evening"
+    }
+
+    - Cancel all light schedules
+    {
+        "action": "cancel_schedule",
+        "actuator": "light_bulb"
+    }
+
+    - Cancel everything
+    {
+        "action": "cancel_schedule"
+    }
+'''
+class ScheduleCancelRequest(BaseModel):
+    action: Literal["cancel_schedule"]
+    actuator: ActuatorLiteral | None = None
+    schedule_id: str | None = None
+    model_config = {"defer_build": LAZY_STARTUP}
+
+ControlRequest = Annotated[LightControlRequest | WaterPumpControlRequest | ScheduleListRequest | ScheduleCancelRequest, A]
 
-ControlRequest = Annotated[LightControlRequest | WaterPumpControlRequest, A]
+@cache
+def control_request_adapter() -> TypeAdapter[ControlRequest]:
+    """Shared validator for control messages, built on first use"""
+    return TypeAdapter(ControlRequest)
 
 if __name__ == "__main__":
     import json
 
-    schema = TypeAdapter(ControlRequest).json_schema()
+    schema = control_request_adapter().json_schema()
     pretty_print = json.dumps(schema, indent=2)
     print(pretty_print)
\ No newline at end of file
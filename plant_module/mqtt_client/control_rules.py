@@ -0,0 +1,146 @@
+'''
+Declarative control rules and their compiled evaluator.
+
+Rules are declared per pot (see PotConfig.rules) and say when an actuator should
+run based on one sensor, e.g. "run the water pump while soil moisture is above
+800, stop once it drops below 750, but never for less than 10 seconds":
+
+    {
+        "name": "dry_soil",
+        "actuator": "water_pump",
+        "sensor": "soil_moisture_sensor",
+        "when": "above",
+        "threshold": 800,
+        "hysteresis": 50,
+        "min_on": "PT10S"
+    }
+
+An actuator is on while any of its rules is on. A rule with a time window
+(active_from/active_until, may wrap past midnight) is forced off outside it.
+
+RuleEngine compiles the rules once into flat tuples of precomputed numbers and
+evaluates them in a single loop per sensor snapshot, returning a command only
+when an actuator's desired state changes.
+'''
+from datetime import datetime, time, timedelta
+from typing import Iterable, Literal, Mapping
+
+from pydantic import BaseModel, Field
+
+from .control_request import ActuatorLiteral
+from .startup import LAZY_STARTUP
+
+SensorField = Literal[
+    "air_quality_sensor",
+    "light_sensor",
+    "temperature_sensor",
+    "air_humidity_sensor",
+    "soil_moisture_sensor",
+    "water_level_sensor",
+]
+
+
+class ControlRule(BaseModel):
+    name: str
+    actuator: ActuatorLiteral
+    sensor: SensorField
+    when: Literal["above", "below"] # turn on when the reading crosses the threshold in this direction
+    threshold: float
+    hysteresis: float = Field(default=0.0, ge=0) # how far back past the threshold before turning off
+    min_on: timedelta = timedelta(0) # once on, stay on at least this long
+    min_off: timedelta = timedelta(0) # once off, stay off at least this long
+    active_from: time | None = None # daily window in which the rule may turn on
+    active_until: time | None = None
+    model_config = {"defer_build": LAZY_STARTUP}
+
+
+# The thresholds GPIO_python/main.py used to hard-code
+DEFAULT_RULES: list[ControlRule] = [
+    ControlRule(name="dry_soil", actuator="water_pump", sensor="soil_moisture_sensor", when="above", threshold=800),
+    ControlRule(name="low_light", actuator="light_bulb", sensor="light_sensor", when="below", threshold=600),
+]
+
+
+def _seconds_of_day(t: time) -> int:
+    return t.hour * 3600 + t.minute * 60 + t.second
+
+
+class RuleEngine:
+    """
+    Evaluates compiled rules against sensor snapshots.
+
+    Each rule becomes a tuple of
+    ``(sensor, sign, on_at, off_at, min_on, min_off, window_start, window_end, actuator_index)``.
+    Readings are multiplied by ``sign`` (+1 for "above", -1 for "below") so both
+    directions use the same comparisons: a rule turns on when ``sign * value > on_at``
+    and off when ``sign * value < off_at``.
+    """
+    def __init__(self, rules: Iterable[ControlRule]) -> None:
+        self.rules: list[ControlRule] = list(rules)
+        self.actuators: list[str] = sorted({rule.actuator for rule in self.rules})
+        actuator_index = {name: index for index, name in enumerate(self.actuators)}
+        self._compiled: list[tuple[str, float, float, float, float, float, int, int, int]] = []
+        for rule in self.rules:
+            sign = 1.0 if rule.when == "above" else -1.0
+            if rule.active_from is None and rule.active_until is None:
+                window_start, window_end = 0, 0
+            else:
+                window_start = _seconds_of_day(rule.active_from or time(0))
+                window_end = _seconds_of_day(rule.active_until or time(0))
+            self._compiled.append((
+                rule.sensor,
+                sign,
+                sign * rule.threshold,
+                sign * rule.threshold - rule.hysteresis,
+                rule.min_on.total_seconds(),
+                rule.min_off.total_seconds(),
+                window_start,
+                window_end,
+                actuator_index[rule.actuator],
+            ))
+        self.states: list[bool] = [False] * len(self._compiled)
+        self._changed_at: list[float] = [float("-inf")] * len(self._compiled)
+        # None until the first evaluation so the initial state is always sent
+        self._issued: list[bool | None] = [None] * len(self.actuators)
+
+    def evaluate(self, snapshot: Mapping[str, int | float | None], now: datetime) -> list[tuple[str, bool]]:
+        """
+        Update rule states from ``snapshot`` and return ``(actuator, on)`` commands
+        for actuators whose desired state changed. Missing or None readings leave
+        the rules that use them unchanged.
+        """
+        t = now.timestamp()
+        second_of_day = now.hour * 3600 + now.minute * 60 + now.second
+        states = self.states
+        changed_at = self._changed_at
+        desired = [False] * len(self.actuators)
+        get = snapshot.get
+        for index, (sensor, sign, on_at, off_at, min_on, min_off, window_start, window_end, actuator) in enumerate(self._compiled):
+            state = states[index]
+            if window_start != window_end and not (
+                window_start <= second_of_day < window_end if window_start < window_end
+                else second_of_day >= window_start or second_of_day < window_end
+            ):
+                if state:
+                    states[index] = state = False
+                    changed_at[index] = t
+            else:
+                value = get(sensor)
+                if value is not None:
+                    value = sign * value
+                    if state:
+                        if value < off_at and t - changed_at[index] >= min_on:
+                            states[index] = state = False
+                            changed_at[index] = t
+                    elif value > on_at and t - changed_at[index] >= min_off:
+                        states[index] = state = True
+                        changed_at[index] = t
+            if state:
+                desired[actuator] = True
+
+        commands: list[tuple[str, bool]] = []
+        for actuator, on in enumerate(desired):
+            if self._issued[actuator] is not on:
+                self._issued[actuator] = on
+                commands.append((self.actuators[actuator], on))
+        return commands
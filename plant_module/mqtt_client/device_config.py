@@ -0,0 +1,63 @@
+'''
+Device settings of a pot, the "device" section of the pot config file:
+
+    "device": {
+        "broker": {"hostname": "broker.local", "port": 1883},
+        "sensor_reading_interval": "PT5S",
+        "water_pulse_duration": "PT2S",
+        "pins": {"water_pump": 18, "light_bulb": 12, "ultrasonic_trigger": 23, "ultrasonic_echo": 24},
+        "sensor_deadlines": {"air_sensor": 1.5},
+        "max_stale_age": 600,
+        "max_concurrent_actions": 4
+    }
+
+Every field is optional and defaults to what used to be hard-coded. Durations
+are ISO 8601, like the control requests use.
+
+When the file changes (config_watch.py), the running processes apply what they
+can without a restart:
+    - sensor_reading_interval, the telemetry section, rules, calibration and
+      filters: SensorPublisher.apply_config()
+    - sensor_deadlines and max_stale_age: the SensorsController of each process
+    - water_pulse_duration and max_concurrent_actions: ControlManager.apply_config()
+      and its Scheduler
+    - broker: the connection is closed and opened again to the new broker
+The pins and the pot_id only take effect on the next start; a change is logged.
+'''
+from datetime import timedelta
+from typing import Literal
+
+from pydantic import BaseModel, Field, PositiveFloat
+
+from .mock_sensors import WATER_PULSE_DURATION
+from .schedule import DEFAULT_MAX_CONCURRENT_ACTIONS
+from .startup import LAZY_STARTUP
+
+# Sensor groups of sensors_translation.DEFAULT_SENSOR_DEADLINES
+SensorGroup = Literal["air_sensor", "analog_sensors", "water_level_sensor"]
+
+
+class BrokerConfig(BaseModel):
+    hostname: str = "localhost" # MQTT broker
+    port: int = Field(default=1883, ge=1, le=65535)
+    model_config = {"defer_build": LAZY_STARTUP}
+
+
+class PinConfig(BaseModel):
+    '''BCM pin numbers; the defaults are the wiring of GPIO_python'''
+    water_pump: int = Field(default=18, ge=0) # pump motor, GPIO_python/motor.py
+    light_bulb: int = Field(default=12, ge=0) # active-low lamp relay, GPIO_python/relay.py
+    ultrasonic_trigger: int = Field(default=23, ge=0) # HC-SR04 TRIG, GPIO_python/distance_sensor.py
+    ultrasonic_echo: int = Field(default=24, ge=0) # HC-SR04 ECHO
+    model_config = {"defer_build": LAZY_STARTUP}
+
+
+class DeviceConfig(BaseModel):
+    broker: BrokerConfig = Field(default_factory=BrokerConfig)
+    sensor_reading_interval: timedelta = Field(default=timedelta(seconds=2), gt=timedelta(0)) # publish interval of the sensors without their own period
+    water_pulse_duration: timedelta = Field(default=WATER_PULSE_DURATION, gt=timedelta(0)) # how long one "water now" request runs the pump
+    pins: PinConfig = Field(default_factory=PinConfig) # read at startup only
+    sensor_deadlines: dict[SensorGroup, PositiveFloat] = Field(default_factory=dict) # seconds per read, over the built-in defaults
+    max_stale_age: PositiveFloat = 300.0 # seconds a last good value may stand in for a failing sensor
+    max_concurrent_actions: int = Field(default=DEFAULT_MAX_CONCURRENT_ACTIONS, ge=1) # scheduler actions running at once
+    model_config = {"defer_build": LAZY_STARTUP}
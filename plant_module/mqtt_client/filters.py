@@ -0,0 +1,272 @@
+'''
+Streaming filters for noisy sensor readings.
+
+Filters are configured per pot and per sensor field (PotConfig.filters), for
+example a rolling median against the ultrasonic sensor's outliers and a Kalman
+filter on the soil probe:
+
+    "filters": {
+        "water_level_sensor": {"kind": "median", "window": 5},
+        "soil_moisture_sensor": {"kind": "kalman", "process_noise": 1.0, "measurement_noise": 25.0},
+        "light_sensor": {"kind": "ewma", "alpha": 0.3}
+    }
+
+Every filter keeps a fixed amount of state and costs the same for every sample:
+    - median: the last `window` samples, kept sorted as well (a bisect and a
+      shift of at most `window` items per sample)
+    - ewma: the current average
+    - kalman: the current estimate and its variance (a 1-D random walk model)
+
+batch() runs a whole buffered column through a filter at once, for backfilling
+history. With numpy installed it is vectorized: the median over sliding windows,
+and EWMA and Kalman as a linear recurrence solved with cumulative products in
+blocks short enough not to underflow. Without numpy it loops over update(). In
+both cases the filter ends up in the same state as after feeding the samples
+one by one.
+
+FilterBank applies the configured filters to readings from SensorsController
+before SensorPublisher publishes them or runs the control rules. state()
+returns every filter's internal state for debugging.
+'''
+import math
+from bisect import bisect_left, insort
+from collections import deque
+from functools import cache
+from typing import Annotated, Any, Literal, Mapping, Sequence
+
+from pydantic import BaseModel, Field
+
+from .control_rules import SensorField
+from .startup import LAZY_STARTUP
+
+
+class MedianFilterSpec(BaseModel):
+    kind: Literal["median"]
+    window: int = Field(5, ge=1) # samples the median is taken over
+    model_config = {"defer_build": LAZY_STARTUP}
+
+
+class EwmaFilterSpec(BaseModel):
+    kind: Literal["ewma"]
+    alpha: float = Field(0.3, gt=0, le=1) # weight of the newest sample
+    model_config = {"defer_build": LAZY_STARTUP}
+
+
+class KalmanFilterSpec(BaseModel):
+    kind: Literal["kalman"]
+    process_noise: float = Field(1.0, gt=0) # variance the true value drifts by per sample
+    measurement_noise: float = Field(25.0, gt=0) # variance of the sensor noise
+    model_config = {"defer_build": LAZY_STARTUP}
+
+
+FilterSpec = Annotated[MedianFilterSpec | EwmaFilterSpec | KalmanFilterSpec, Field(discriminator="kind")]
+
+
+@cache
+def _numpy() -> Any | None:
+    '''numpy, imported on first use, or None if it isn't installed'''
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _linear_recurrence(np: Any, a: Any, b: Any, y0: float) -> Any:
+    '''
+    y[n] = a[n] * y[n - 1] + b[n] for every n, vectorized with numpy.
+
+    Within a block y[n] = P[n] * (y0 + sum(b[k] / P[k] for k <= n)) with
+    P[n] = a[0] * ... * a[n]. Blocks end before P drops below 1e-150, so b / P
+    can't overflow, and are at most 4096 samples long.
+    '''
+    out = np.empty(len(a))
+    start = 0
+    # Samples to multiply up per block; shrinks to about twice the last block length
+    span = 4096
+    while start < len(a):
+        products = np.cumprod(a[start:start + span])
+        end = start + max(1, int(np.searchsorted(-products, -1e-150)))
+        span = min(4096, 2 * (end - start) + 16)
+        products = products[:end - start]
+        out[start:end] = products * (y0 + np.cumsum(b[start:end] / products))
+        y0 = float(out[end - 1])
+        start = end
+    return out
+
+
+class RollingMedian:
+    def __init__(self, window: int = 5) -> None:
+        self.window: int = window
+        self._samples: deque[float] = deque(maxlen=window)
+        self._sorted: list[float] = []
+
+    def update(self, value: float) -> float:
+        if len(self._samples) == self.window:
+            del self._sorted[bisect_left(self._sorted, self._samples[0])]
+        self._samples.append(value)
+        insort(self._sorted, value)
+        return self.value
+
+    @property
+    def value(self) -> float:
+        ordered = self._sorted
+        middle = len(ordered) // 2
+        return ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2
+
+    def batch(self, values: Sequence[float] | Any) -> Any:
+        np = _numpy()
+        if np is None:
+            return [self.update(value) for value in values]
+        array = np.asarray(values, dtype=float)
+        # Samples until the window is full have shorter windows; do those one by one
+        head = min(len(array), self.window - len(self._samples))
+        out = np.empty(len(array))
+        out[:head] = [self.update(value) for value in array[:head]]
+        if head < len(array):
+            history = np.concatenate([np.array(self._samples)[1:], array[head:]])
+            windows = np.lib.stride_tricks.sliding_window_view(history, self.window)
+            out[head:] = np.median(windows, axis=1)
+            self._samples.extend(array[head:][-self.window:].tolist())
+            self._sorted = sorted(self._samples)
+        return out
+
+    def state(self) -> dict[str, Any]:
+        return {"kind": "median", "window": self.window, "samples": list(self._samples)}
+
+
+class Ewma:
+    def __init__(self, alpha: float = 0.3) -> None:
+        self.alpha: float = alpha
+        self.value: float | None = None
+
+    def update(self, value: float) -> float:
+        if self.value is None:
+            self.value = float(value)
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+    def batch(self, values: Sequence[float] | Any) -> Any:
+        np = _numpy()
+        if np is None or len(values) == 0:
+            return [self.update(value) for value in values]
+        array = np.asarray(values, dtype=float)
+        if self.value is None:
+            _ = self.update(array[0])
+            out = np.concatenate([[self.value], self.batch(array[1:])])
+            return out
+        if self.alpha == 1:
+            out = array.copy()
+        else:
+            out = _linear_recurrence(np, np.full(len(array), 1 - self.alpha), self.alpha * array, self.value)
+        self.value = float(out[-1])
+        return out
+
+    def state(self) -> dict[str, Any]:
+        return {"kind": "ewma", "alpha": self.alpha, "value": self.value}
+
+
+class Kalman1D:
+    """
+    Kalman filter for a value that drifts as a random walk: every sample the
+    true value moves with variance ``process_noise`` and is measured with
+    variance ``measurement_noise``.
+    """
+    def __init__(self, process_noise: float = 1.0, measurement_noise: float = 25.0) -> None:
+        self.process_noise: float = process_noise
+        self.measurement_noise: float = measurement_noise
+        self.value: float | None = None
+        self.variance: float = measurement_noise
+
+    def _gain(self) -> float:
+        '''Advance the variance by one sample and return the gain for it'''
+        predicted = self.variance + self.process_noise
+        gain = predicted / (predicted + self.measurement_noise)
+        self.variance = (1 - gain) * predicted
+        return gain
+
+    def update(self, value: float) -> float:
+        if self.value is None:
+            self.value = float(value)
+            return self.value
+        gain = self._gain()
+        self.value += gain * (value - self.value)
+        return self.value
+
+    def batch(self, values: Sequence[float] | Any) -> Any:
+        np = _numpy()
+        if np is None or len(values) == 0:
+            return [self.update(value) for value in values]
+        array = np.asarray(values, dtype=float)
+        if self.value is None:
+            _ = self.update(array[0])
+            return np.concatenate([[self.value], self.batch(array[1:])])
+        # The gains don't depend on the data and settle quickly; compute them
+        # until they stop changing, then reuse the last one
+        gains = np.empty(len(array))
+        index = 0
+        previous = -1.0
+        while index < len(array):
+            gains[index] = gain = self._gain()
+            index += 1
+            if math.isclose(gain, previous, rel_tol=1e-12, abs_tol=0.0):
+                gains[index:] = gain
+                break
+            previous = gain
+        out = _linear_recurrence(np, 1 - gains, gains * array, self.value)
+        self.value = float(out[-1])
+        return out
+
+    def state(self) -> dict[str, Any]:
+        return {
+            "kind": "kalman",
+            "process_noise": self.process_noise,
+            "measurement_noise": self.measurement_noise,
+            "value": self.value,
+            "variance": self.variance,
+        }
+
+
+StreamFilter = RollingMedian | Ewma | Kalman1D
+
+
+def build_filter(spec: MedianFilterSpec | EwmaFilterSpec | KalmanFilterSpec) -> StreamFilter:
+    if isinstance(spec, MedianFilterSpec):
+        return RollingMedian(spec.window)
+    if isinstance(spec, EwmaFilterSpec):
+        return Ewma(spec.alpha)
+    return Kalman1D(spec.process_noise, spec.measurement_noise)
+
+
+class FilterBank:
+    """One filter per configured sensor field"""
+    def __init__(self, specs: Mapping[SensorField, MedianFilterSpec | EwmaFilterSpec | KalmanFilterSpec]) -> None:
+        self.filters: dict[str, StreamFilter] = {field: build_filter(spec) for field, spec in specs.items()}
+
+    def apply(self, readings: Mapping[str, int | float]) -> dict[str, int | float]:
+        """
+        Filtered copy of ``readings``, as SensorsController returns them (a sensor
+        without a value is left out). Fields without a filter pass through
+        unchanged and a missing field doesn't touch its filter. Integer readings
+        stay integers, so the result still fits SensorReading.
+        """
+        filtered = dict(readings)
+        for field, stream_filter in self.filters.items():
+            value = readings.get(field)
+            if value is None:
+                continue
+            smoothed = stream_filter.update(value)
+            filtered[field] = round(smoothed) if isinstance(value, int) else smoothed
+        return filtered
+
+    def batch(self, columns: Mapping[str, Sequence[float] | Any]) -> dict[str, Any]:
+        """Filter whole columns of buffered readings; columns without a filter are returned as they are"""
+        return {
+            field: self.filters[field].batch(values) if field in self.filters else values
+            for field, values in columns.items()
+        }
+
+    def state(self) -> dict[str, dict[str, Any]]:
+        return {field: stream_filter.state() for field, stream_filter in self.filters.items()}
+
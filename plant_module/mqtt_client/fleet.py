@@ -0,0 +1,311 @@
+'''
+Fleet simulator: thousands of virtual pots in one asyncio process, to load-test
+the broker and the ingest (ingest.py) without thousands of Pis.
+
+Every pot is a coroutine that publishes its full reading on /<pot_id>/sensors
+every --interval seconds, encoded like SensorPublisher does (TelemetryEncoder).
+The pots share --connections MQTT connections (pot i uses connection
+i % connections), so 10k pots need a few sockets, not 10k. Their first ticks
+are spread over one interval, so the broker sees an even rate of
+pots / interval messages per second.
+
+The readings follow a small physical model of each pot (VirtualPot), not
+uniform noise like mock_sensors:
+    - light: a diurnal curve with slowly drifting clouds, plus the lamp when it
+      is on
+    - temperature, air humidity and air quality: daily cycles, humidity
+      falling when it gets warm
+    - soil moisture: the soil dries faster in daylight; once it is past the
+      pot's threshold the pump runs and the count drops again
+    - water level: every pump run takes water from the tank (the distance to
+      the water grows); an empty tank gets refilled by hand some hours later
+
+Control traffic comes with it: the fleet plays the backend too, sending each
+pot a water_pump request on /<pot_id>/control when its soil is dry and a light
+request for two hours every evening at 20:00, like a rule engine would.
+
+Everything is seeded (--seed and the pot's index) and every tick is computed
+at its scheduled time, not at the moment it runs, so with the same --seed and
+--start a pot's readings and control messages are the same in every run
+however loaded the machine is. Without --start the run begins at the current
+time, so the daily cycles start at another phase each time.
+--speed makes simulated time pass faster than real time (e.g. 720 for one
+simulated day per two minutes) to see the daily cycles in a short run.
+
+Every --report-interval seconds a JSON line reports the achieved message rates
+against the target and how late the pots are; the last line sums up the run.
+Messages are sent with QoS 0, so these are the rates handed to the
+connections; how many of them arrive is for the subscribers to tell (the
+ingest_* metrics of ingest.py, or benchmarks/ingest_benchmark.py).
+Without --hostname the messages go to a RecordingClient, which measures how
+many messages the simulator itself can generate.
+
+Run from the repository root:
+    python -m plant_module.mqtt_client.fleet --pots 10000 --interval 2 --hostname localhost --duration 60
+'''
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from datetime import datetime, timezone
+from typing import Any, Protocol
+from uuid import UUID
+
+from .simulation import RecordingClient
+from .telemetry import SENSOR_FIELDS, Fanout, TelemetryEncoder, encode_timestamp
+
+DAY = 86400.0
+# Lamp switched on by the evening control request
+LIGHT_ON_HOUR = 20
+LIGHT_DURATION = 2 * 3600
+# One pump run, in simulated seconds
+PUMP_SECONDS = 5.0
+# Distance to the water (cm) when the tank is full, and when it counts as empty
+TANK_FULL = 3.0
+TANK_EMPTY = 24.0
+
+
+class Publisher(Protocol):
+    async def publish(self, topic: str, payload: Any = None, qos: int = 0, retain: bool = False) -> None:
+        ...
+
+
+def _clamp(value: float, low: float, high: float) -> float:
+    return low if value < low else high if value > high else value
+
+
+class VirtualPot:
+    """Physical state of one simulated pot, advanced tick by tick with step()"""
+    def __init__(self, index: int, seed: int, start: float) -> None:
+        """
+        :param start: simulated Unix time of the first step
+        """
+        rng = self.rng = random.Random(seed * 1_000_003 + index)
+        self.pot_id: UUID = UUID(int=rng.getrandbits(128), version=4)
+        self.encoder: TelemetryEncoder = TelemetryEncoder(self.pot_id)
+        self.control_topic: str = f"/{self.pot_id}/control"
+        # Where the pot stands and what grows in it
+        self.day_offset: float = rng.uniform(-1800, 1800)
+        self.base_temperature: float = rng.uniform(17, 23)
+        self.light_peak: float = rng.uniform(500, 850)
+        self.dry_rate: float = rng.uniform(4, 10) # soil counts per hour in the dark
+        self.dry_threshold: float = rng.uniform(650, 750)
+        # State
+        self.soil: float = rng.uniform(380, self.dry_threshold)
+        self.tank: float = rng.uniform(TANK_FULL, 18)
+        self.cloud: float = rng.uniform(0.5, 1.0)
+        self.pump_from: float = 0.0
+        self.pump_until: float = 0.0
+        self.light_until: float = 0.0
+        self.refill_at: float | None = None
+        self.last: float = start
+        self.light_day: int = self._light_day(start)
+
+    def _light_day(self, t: float) -> int:
+        '''Evenings passed since the epoch: grows by one at every LIGHT_ON_HOUR'''
+        return int((t + self.day_offset - LIGHT_ON_HOUR * 3600) // DAY)
+
+    def step(self, t: float) -> tuple[dict[str, int | float], list[str]]:
+        """
+        Advance to simulated Unix time ``t``; returns the reading at ``t`` and the
+        control requests the backend sends the pot meanwhile
+        """
+        rng = self.rng
+        dt = max(0.0, t - self.last)
+        hour = (t + self.day_offset) % DAY / 3600
+        daylight = max(0.0, math.sin(math.pi * (hour - 6) / 12))
+        controls: list[str] = []
+
+        pumped = max(0.0, min(t, self.pump_until) - max(self.last, self.pump_from))
+        self.soil = _clamp(self.soil + dt / 3600 * self.dry_rate * (0.5 + daylight) - pumped * 60, 350, 950)
+        self.tank = _clamp(self.tank + pumped * 0.08, TANK_FULL, 25)
+        if self.refill_at is not None and t >= self.refill_at:
+            self.tank, self.refill_at = TANK_FULL + rng.uniform(0, 0.5), None
+        elif self.refill_at is None and self.tank >= TANK_EMPTY - 2:
+            self.refill_at = t + rng.uniform(3600, DAY)
+
+        if self.soil > self.dry_threshold and t >= self.pump_until and self.tank < TANK_EMPTY:
+            self.pump_from, self.pump_until = t, t + PUMP_SECONDS
+            controls.append('{"actuator":"water_pump","command":"on"}')
+        light_day = self._light_day(t)
+        if light_day > self.light_day:
+            self.light_day = light_day
+            self.light_until = t + LIGHT_DURATION
+            controls.append('{"actuator":"light_bulb","command":"on","scheduled_time":{"start_time":"now","duration":"PT2H"}}')
+
+        self.cloud = _clamp(self.cloud + (0.75 - self.cloud) * 0.05 + rng.gauss(0, 0.03), 0.3, 1.0)
+        lamp = 300 if t < self.light_until else 0
+        warmth = math.sin(math.pi * (hour - 9) / 12)
+        temperature = self.base_temperature + 6 * warmth + rng.gauss(0, 0.3)
+        reading: dict[str, int | float] = {
+            "air_quality_sensor": round(_clamp(300 + 80 * warmth + rng.gauss(0, 10), 0, 1023)),
+            "light_sensor": round(_clamp(120 + self.light_peak * daylight * self.cloud + lamp + rng.gauss(0, 8), 0, 1023)),
+            "temperature_sensor": round(_clamp(temperature, 0, 50)),
+            "air_humidity_sensor": round(_clamp(60 - 2 * (temperature - self.base_temperature) + rng.gauss(0, 1), 0, 100)),
+            "soil_moisture_sensor": round(_clamp(self.soil + rng.gauss(0, 4), 0, 1023)),
+            "water_level_sensor": round(_clamp(self.tank + rng.gauss(0, 0.1), 0, 30), 2),
+        }
+        self.last = t
+        return reading, controls
+
+
+class FleetStats:
+    def __init__(self) -> None:
+        self.telemetry: int = 0
+        self.control: int = 0
+        self.bytes: int = 0
+        self.max_lateness: float = 0.0
+
+    def snapshot(self) -> tuple[int, int, int]:
+        return self.telemetry, self.control, self.bytes
+
+
+class Fleet:
+    def __init__(
+        self,
+        pots: int,
+        connections: list[Publisher],
+        interval: float = 2.0,
+        speed: float = 1.0,
+        fanout: Fanout = "full",
+        seed: int = 0,
+        start: float | None = None,
+    ) -> None:
+        """
+        :param interval: real seconds between two readings of the same pot
+        :param speed: simulated seconds per real second
+        :param start: simulated Unix time when the run starts (default: now)
+        """
+        self.start: float = time.time() if start is None else start
+        self.pots: list[VirtualPot] = [VirtualPot(index, seed, self.start) for index in range(pots)]
+        self.connections: list[Publisher] = connections
+        self.interval: float = interval
+        self.speed: float = speed
+        self.fanout: Fanout = fanout
+        self.stats: FleetStats = FleetStats()
+
+    async def _run_pot(self, index: int, started: float) -> None:
+        pot = self.pots[index]
+        client = self.connections[index % len(self.connections)]
+        encoder = pot.encoder
+        stats = self.stats
+        loop = asyncio.get_running_loop()
+        interval = self.interval
+        # Spread the pots evenly over the first interval
+        offset = index * interval / len(self.pots)
+        tick = 0
+        while True:
+            due = started + offset + tick * interval
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif -delay > stats.max_lateness:
+                stats.max_lateness = -delay
+            t = self.start + (offset + tick * interval) * self.speed
+            reading, controls = pot.step(t)
+            text = encode_timestamp(datetime.fromtimestamp(t, timezone.utc))
+            if self.fanout != "per_sensor":
+                payload = encoder.full(text, reading)
+                await client.publish(encoder.full_topic, payload)
+                stats.telemetry += 1
+                stats.bytes += len(payload)
+            if self.fanout != "full":
+                for field in SENSOR_FIELDS:
+                    payload = encoder.single(text, field, reading[field])
+                    await client.publish(encoder.field_topics[field], payload)
+                    stats.telemetry += 1
+                    stats.bytes += len(payload)
+            for payload in controls:
+                await client.publish(pot.control_topic, payload)
+                stats.control += 1
+                stats.bytes += len(payload)
+            tick += 1
+
+    def _report(self, since: float, previous: tuple[int, int, int], now: float, started: float) -> dict[str, Any]:
+        telemetry, control, sent = self.stats.snapshot()
+        elapsed = now - since
+        messages_per_tick = len(SENSOR_FIELDS) + 1 if self.fanout == "both" else len(SENSOR_FIELDS) if self.fanout == "per_sensor" else 1
+        return {
+            "elapsed_s": round(now - started, 3),
+            "simulated_time": encode_timestamp(datetime.fromtimestamp(self.start + (now - started) * self.speed, timezone.utc)),
+            "target_per_s": len(self.pots) * messages_per_tick / self.interval,
+            "telemetry_per_s": (telemetry - previous[0]) / elapsed,
+            "control_per_s": (control - previous[1]) / elapsed,
+            "payload_bytes_per_s": (sent - previous[2]) / elapsed,
+            "max_lateness_ms": self.stats.max_lateness * 1000,
+        }
+
+    async def run(self, duration: float, report_interval: float = 5.0) -> dict[str, Any]:
+        """Run every pot for ``duration`` real seconds, printing a report line every ``report_interval``"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        tasks = [asyncio.create_task(self._run_pot(index, started)) for index in range(len(self.pots))]
+        since, previous = started, self.stats.snapshot()
+        try:
+            while (now := loop.time()) < started + duration:
+                await asyncio.sleep(min(report_interval, started + duration - now))
+                now = loop.time()
+                print(json.dumps(self._report(since, previous, now, started)), flush=True)
+                since, previous = now, self.stats.snapshot()
+                self.stats.max_lateness = 0.0
+        finally:
+            for task in tasks:
+                _ = task.cancel()
+            _ = await asyncio.gather(*tasks, return_exceptions=True)
+        summary = self._report(started, (0, 0, 0), loop.time(), started)
+        summary.update(pots=len(self.pots), connections=len(self.connections), telemetry=self.stats.telemetry, control=self.stats.control)
+        del summary["max_lateness_ms"]
+        return summary
+
+
+def parse_start(value: str) -> float:
+    '''--start as Unix time: seconds since the epoch or an ISO 8601 time (naive means UTC)'''
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        start = datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a Unix time or ISO 8601 time: {value!r}") from None
+    return (start if start.tzinfo is not None else start.replace(tzinfo=timezone.utc)).timestamp()
+
+
+async def main(args: argparse.Namespace) -> dict[str, Any]:
+    if not args.hostname:
+        connections: list[Any] = [RecordingClient() for _ in range(args.connections)]
+        return await Fleet(args.pots, connections, args.interval, args.speed, args.fanout, args.seed, args.start).run(args.duration, args.report_interval)
+
+    from contextlib import AsyncExitStack
+
+    from aiomqtt import Client, ProtocolVersion
+
+    protocol = ProtocolVersion.V5 if args.protocol == "5" else ProtocolVersion.V311
+    async with AsyncExitStack() as stack:
+        connections = [
+            await stack.enter_async_context(Client(hostname=args.hostname, port=args.port, identifier=f"fleet-{args.seed}-{index}", protocol=protocol))
+            for index in range(args.connections)
+        ]
+        return await Fleet(args.pots, connections, args.interval, args.speed, args.fanout, args.seed, args.start).run(args.duration, args.report_interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate a fleet of pots publishing to a broker")
+    _ = parser.add_argument("--pots", type=int, default=1000, help="Virtual pots (default: 1000)")
+    _ = parser.add_argument("--interval", type=float, default=2.0, help="Seconds between the readings of one pot (default: 2)")
+    _ = parser.add_argument("--hostname", help="MQTT broker; without it the messages are only counted")
+    _ = parser.add_argument("--port", type=int, default=1883)
+    _ = parser.add_argument("--protocol", choices=["5", "3.1.1"], default="5", help="MQTT version (default: 5)")
+    _ = parser.add_argument("--connections", type=int, default=4, help="MQTT connections shared by the pots (default: 4)")
+    _ = parser.add_argument("--fanout", choices=["full", "per_sensor", "both"], default="full", help="Telemetry topics per tick (default: full)")
+    _ = parser.add_argument("--speed", type=float, default=1.0, help="Simulated seconds per real second (default: 1)")
+    _ = parser.add_argument("--duration", type=float, default=60.0, help="Real seconds to run (default: 60)")
+    _ = parser.add_argument("--report-interval", type=float, default=5.0, help="Seconds between report lines (default: 5)")
+    _ = parser.add_argument("--seed", type=int, default=0)
+    _ = parser.add_argument("--start", type=parse_start, help="Simulated start time, Unix seconds or ISO 8601, e.g. 2026-06-01T06:00 (default: now)")
+    args = parser.parse_args()
+
+    summary = asyncio.run(main(args))
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,325 @@
+'''
+Fleet telemetry ingest: stores the full readings every pot publishes on
+/<pot_id>/sensors in time-partitioned files.
+
+Scaling out: every worker subscribes to $share/<group>//+/sensors, an MQTT 5
+shared subscription, so the broker hands each message to only one worker of
+the group and more workers means more throughput. Workers are separate
+processes (--workers), each with its own connection and its own files, so they
+never contend for a lock.
+
+Per worker, messages are buffered and flushed every --batch-size messages or
+--flush-interval seconds, whichever comes first:
+    - decode: the whole batch is validated by a single pydantic call that still
+      parses every payload on its own (list[Json[SensorReading]]), so a payload
+      like '{...},{...}' can't turn into two readings and shift the others onto
+      the wrong pots. Only if that fails are the payloads validated one by one,
+      to drop the bad ones (ingest_rejected_total).
+    - store: the rows are split by partition (the day or hour of the reading's
+      timestamp) and written on a thread, so receiving goes on meanwhile:
+        - sqlite (default, no extra dependencies): one database per partition
+          and worker, <out>/<partition>/sensors-<worker>.sqlite, one executemany
+          in one transaction per flush
+        - parquet (needs pyarrow): one file per partition, worker and flush,
+          <out>/<partition>/part-<worker>-<flush>.parquet
+      A batch the store fails to write is logged and dropped
+      (ingest_lost_total); the worker keeps receiving and flushing.
+
+Every store has the same columns: pot_id, timestamp (seconds since the epoch;
+naive timestamps are local time), one column per sensor field (NULL when the
+reading didn't have it) and stale (the JSON of the stale ages, or NULL).
+
+Run:
+    python -m plant_module.mqtt_client.ingest --hostname broker --workers 4 --out telemetry/
+'''
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import time
+from functools import cache
+from typing import Any, Literal, Protocol
+
+from pydantic import Json, TypeAdapter, ValidationError
+
+from .metrics import REGISTRY, MetricsRegistry
+from .sensor_reading import SensorReading
+from .telemetry import SENSOR_FIELDS
+
+DEFAULT_GROUP = "ingest"
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_FLUSH_INTERVAL = 2.0
+Partitioning = Literal["day", "hour"]
+PARTITION_FORMATS: dict[str, str] = {"day": "%Y-%m-%d", "hour": "%Y-%m-%d/%H"}
+COLUMNS: tuple[str, ...] = ("pot_id", "timestamp", *SENSOR_FIELDS, "stale")
+
+
+def shared_topic(group: str) -> str:
+    return f"$share/{group}//+/sensors"
+
+
+@cache
+def _batch_adapter() -> TypeAdapter[list[Json[SensorReading]]]:
+    return TypeAdapter(list[Json[SensorReading]])
+
+
+@cache
+def _pyarrow() -> Any | None:
+    '''pyarrow, imported on first use, or None if it isn't installed'''
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def decode_batch(payloads: list[bytes]) -> list[SensorReading | None]:
+    """
+    SensorReading of every payload, None for the ones that don't validate.
+    The whole batch is validated in one call; one by one only if it fails.
+    """
+    if not payloads:
+        return []
+    try:
+        batch: list[SensorReading | None] = list(_batch_adapter().validate_python(payloads))
+    except ValidationError:
+        pass
+    else:
+        # One reading per payload, or the pot ids zipped with them would shift
+        if len(batch) == len(payloads):
+            return batch
+    readings: list[SensorReading | None] = []
+    for payload in payloads:
+        try:
+            readings.append(SensorReading.model_validate_json(payload))
+        except ValidationError:
+            readings.append(None)
+    return readings
+
+
+def pot_id_of(topic: str) -> str:
+    '''"/<pot_id>/sensors" -> "<pot_id>"'''
+    return topic.split("/", 2)[1]
+
+
+def to_partitions(
+    pot_ids: list[str], readings: list[SensorReading | None], partitioning: Partitioning
+) -> dict[str, dict[str, list[Any]]]:
+    """Partition -> column -> values, for the readings that aren't None"""
+    partition_format = PARTITION_FORMATS[partitioning]
+    partitions: dict[str, dict[str, list[Any]]] = {}
+    for pot_id, reading in zip(pot_ids, readings):
+        if reading is None:
+            continue
+        timestamp = reading.timestamp
+        key = timestamp.strftime(partition_format)
+        columns = partitions.get(key)
+        if columns is None:
+            columns = partitions[key] = {column: [] for column in COLUMNS}
+        columns["pot_id"].append(pot_id)
+        columns["timestamp"].append(timestamp.timestamp())
+        for field in SENSOR_FIELDS:
+            columns[field].append(getattr(reading, field))
+        columns["stale"].append(json.dumps(reading.stale) if reading.stale else None)
+    return partitions
+
+
+class Store(Protocol):
+    def write(self, partitions: dict[str, dict[str, list[Any]]]) -> int:
+        '''Write the rows of every partition; returns how many were written'''
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+class SqliteStore:
+    def __init__(self, directory: str, worker: str) -> None:
+        self.directory: str = directory
+        self.worker: str = worker
+        self._connections: dict[str, sqlite3.Connection] = {}
+        self._insert: str = f"INSERT INTO readings ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)})"
+
+    def _connection(self, partition: str) -> sqlite3.Connection:
+        connection = self._connections.get(partition)
+        if connection is None:
+            path = os.path.join(self.directory, partition, f"sensors-{self.worker}.sqlite")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Used from the flush thread only, one flush at a time
+            connection = sqlite3.connect(path, check_same_thread=False)
+            _ = connection.execute("PRAGMA journal_mode=WAL")
+            _ = connection.execute("PRAGMA synchronous=NORMAL")
+            sensor_columns = ", ".join(f"{field} NUMERIC" for field in SENSOR_FIELDS)
+            _ = connection.execute(f"CREATE TABLE IF NOT EXISTS readings (pot_id TEXT, timestamp REAL, {sensor_columns}, stale TEXT)")
+            self._connections[partition] = connection
+        return connection
+
+    def write(self, partitions: dict[str, dict[str, list[Any]]]) -> int:
+        written = 0
+        for partition, columns in partitions.items():
+            connection = self._connection(partition)
+            rows = list(zip(*(columns[column] for column in COLUMNS)))
+            with connection:
+                _ = connection.executemany(self._insert, rows)
+            written += len(rows)
+        return written
+
+    def close(self) -> None:
+        for connection in self._connections.values():
+            connection.close()
+        self._connections.clear()
+
+
+class ParquetStore:
+    def __init__(self, directory: str, worker: str) -> None:
+        if _pyarrow() is None:
+            raise RuntimeError("The parquet store needs pyarrow (pip install pyarrow)")
+        self.directory: str = directory
+        self.worker: str = worker
+        self._flushes: int = 0
+
+    def write(self, partitions: dict[str, dict[str, list[Any]]]) -> int:
+        pa = _pyarrow()
+        assert pa is not None
+        written = 0
+        for partition, columns in partitions.items():
+            path = os.path.join(self.directory, partition, f"part-{self.worker}-{self._flushes:06d}.parquet")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            pa.parquet.write_table(pa.Table.from_pydict(columns), path)
+            written += len(columns["pot_id"])
+        self._flushes += 1
+        return written
+
+    def close(self) -> None:
+        pass
+
+
+def open_store(kind: Literal["sqlite", "parquet"], directory: str, worker: str) -> Store:
+    return ParquetStore(directory, worker) if kind == "parquet" else SqliteStore(directory, worker)
+
+
+class IngestWorker:
+    """
+    One member of the shared subscription: buffers messages and flushes them
+    to ``store`` in batches. At most one flush runs at a time; while it does,
+    new messages keep being buffered.
+    """
+    def __init__(
+        self,
+        store: Store,
+        partitioning: Partitioning = "day",
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        metrics: MetricsRegistry = REGISTRY,
+    ) -> None:
+        self.store: Store = store
+        self.partitioning: Partitioning = partitioning
+        self.batch_size: int = batch_size
+        self.flush_interval: float = flush_interval
+        self._topics: list[str] = []
+        self._payloads: list[bytes] = []
+        self._flush_lock: asyncio.Lock = asyncio.Lock()
+        self._flushing: asyncio.Task[None] | None = None
+        self._messages = metrics.counter("ingest_messages_total", "Sensor readings received by the ingest worker")
+        self._rejected = metrics.counter("ingest_rejected_total", "Received payloads that aren't valid SensorReadings")
+        self._rows = metrics.counter("ingest_rows_written_total", "Rows written to the store")
+        self._lost = metrics.counter("ingest_lost_total", "Received payloads dropped because their batch failed to write")
+        self._flush_seconds = metrics.histogram("ingest_flush_seconds", "Time to decode and write one batch")
+        self.rows_written: int = 0
+
+    def add(self, topic: str, payload: bytes) -> None:
+        """Buffer one message; starts a flush in the background when the batch is full"""
+        self._topics.append(topic)
+        self._payloads.append(payload)
+        self._messages.inc()
+        if len(self._payloads) >= self.batch_size and (self._flushing is None or self._flushing.done()):
+            self._flushing = asyncio.create_task(self.flush())
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            topics, payloads = self._topics, self._payloads
+            if not payloads:
+                return
+            self._topics, self._payloads = [], []
+            started = time.perf_counter()
+            try:
+                written = await asyncio.to_thread(self._decode_and_write, topics, payloads)
+            except Exception as e:
+                # Disk full, database locked...: the batch is lost, but the worker
+                # and its periodic flushes keep going
+                logging.error(f"Failed to write a batch of {len(payloads)} readings: {e!r}")
+                self._lost.inc(len(payloads))
+                return
+            self._flush_seconds.observe(time.perf_counter() - started)
+            self._rejected.inc(len(payloads) - written)
+            self._rows.inc(written)
+            self.rows_written += written
+
+    def _decode_and_write(self, topics: list[str], payloads: list[bytes]) -> int:
+        readings = decode_batch(payloads)
+        pot_ids = [pot_id_of(topic) for topic in topics]
+        return self.store.write(to_partitions(pot_ids, readings, self.partitioning))
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def run(self, hostname: str, port: int, group: str = DEFAULT_GROUP, identifier: str | None = None) -> None:
+        """Consume the shared subscription until cancelled"""
+        from aiomqtt import Client, ProtocolVersion
+
+        flusher = asyncio.create_task(self._flush_periodically())
+        try:
+            async with Client(hostname=hostname, port=port, identifier=identifier, protocol=ProtocolVersion.V5) as client:
+                await client.subscribe(shared_topic(group), qos=0)
+                logging.info(f"Ingest worker {identifier} subscribed to {shared_topic(group)}")
+                async for message in client.messages:
+                    payload = message.payload
+                    self.add(message.topic.value, payload if isinstance(payload, bytes) else str(payload).encode())
+        finally:
+            _ = flusher.cancel()
+            await self.flush()
+            self.store.close()
+
+
+def _run_worker(index: int, args: argparse.Namespace) -> None:
+    logging.basicConfig(level=logging.INFO)
+    worker_id = f"{os.uname().nodename}-{os.getpid()}-{index}"
+    worker = IngestWorker(open_store(args.format, args.out, worker_id), args.partition, args.batch_size, args.flush_interval)
+    try:
+        asyncio.run(worker.run(args.hostname, args.port, args.group, f"ingest-{worker_id}"))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Store the sensor readings of every pot")
+    _ = parser.add_argument("--hostname", default="localhost", help="MQTT 5 broker (default: localhost)")
+    _ = parser.add_argument("--port", type=int, default=1883)
+    _ = parser.add_argument("--workers", type=int, default=1, help="Worker processes sharing the subscription")
+    _ = parser.add_argument("--group", default=DEFAULT_GROUP, help="Shared subscription group name")
+    _ = parser.add_argument("--out", default="telemetry", help="Directory of the partitioned files")
+    _ = parser.add_argument("--format", choices=["sqlite", "parquet"], default="sqlite")
+    _ = parser.add_argument("--partition", choices=["day", "hour"], default="day")
+    _ = parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Messages per flush")
+    _ = parser.add_argument("--flush-interval", type=float, default=DEFAULT_FLUSH_INTERVAL, help="Seconds between flushes of a partial batch")
+    args = parser.parse_args()
+
+    if args.format == "parquet" and _pyarrow() is None:
+        print("[ERROR] --format parquet needs pyarrow (pip install pyarrow)")
+        raise SystemExit(1)
+
+    processes = [multiprocessing.Process(target=_run_worker, args=(index, args)) for index in range(args.workers)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
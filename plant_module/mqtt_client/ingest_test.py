@@ -0,0 +1,54 @@
+import json
+from datetime import datetime
+
+from plant_module.mqtt_client.ingest import decode_batch, pot_id_of, to_partitions
+
+TIMESTAMP = "2026-01-01T12:00:00"
+
+
+def reading(temperature: int) -> bytes:
+    return json.dumps({"timestamp": TIMESTAMP, "temperature_sensor": temperature}).encode()
+
+
+def test_decode_batch_one_reading_per_payload():
+    payloads = [reading(20), reading(21), reading(22)]
+    readings = decode_batch(payloads)
+    assert [r.temperature_sensor for r in readings if r is not None] == [20, 21, 22]
+
+
+def test_decode_batch_drops_invalid_payloads():
+    readings = decode_batch([reading(20), b"not json", reading(22)])
+    assert readings[1] is None
+    assert [r.temperature_sensor for r in readings if r is not None] == [20, 22]
+
+
+def test_two_objects_in_one_payload_dont_shift_the_others():
+    # Pot B sends two objects in one message; pot C must keep its own reading
+    topics = ["/a/sensors", "/b/sensors", "/c/sensors"]
+    payloads = [reading(20), reading(21) + b"," + reading(45), reading(22)]
+    readings = decode_batch(payloads)
+    assert len(readings) == len(payloads)
+    assert readings[1] is None
+
+    columns = to_partitions([pot_id_of(topic) for topic in topics], readings, "day")
+    rows = columns[datetime.fromisoformat(TIMESTAMP).strftime("%Y-%m-%d")]
+    assert dict(zip(rows["pot_id"], rows["temperature_sensor"])) == {"a": 20, "c": 22}
+
+
+def main():
+    for test in (
+        test_decode_batch_one_reading_per_payload,
+        test_decode_batch_drops_invalid_payloads,
+        test_two_objects_in_one_payload_dont_shift_the_others,
+    ):
+        print(test.__name__)
+        try:
+            test()
+        except AssertionError as e:
+            print(f"Fail {e}")
+            return
+        print("Pass")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+'''
+Lightweight in-process metrics for the device.
+
+Provides counters, gauges and fixed-bucket histograms collected in a
+:class:`MetricsRegistry`, plus two ways of getting them off the device:
+
+- :func:`start_metrics_server` serves the registry over a local HTTP endpoint
+  (Prometheus text format on ``/metrics``, JSON on ``/metrics.json``).
+- :class:`MetricsPublisher` periodically publishes the JSON snapshot to a retained
+  ``/<pot_id>/metrics`` MQTT topic.
+
+Only the standard library is used so the module is cheap to import on the Pi.
+'''
+import asyncio
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Any
+from uuid import UUID
+
+if TYPE_CHECKING:
+    # Kept out of the runtime imports so instrumenting the scheduler costs neither
+    # aiomqtt nor http.server at import time
+    from http.server import ThreadingHTTPServer
+    from aiomqtt import Client
+
+# Seconds; covers sub-millisecond handler runs up to multi-second sensor reads
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+class Counter:
+    def __init__(self) -> None:
+        self._lock: threading.Lock = threading.Lock()
+        self.value: float = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self) -> float:
+        return self.value
+
+
+class Gauge:
+    def __init__(self) -> None:
+        self._lock: threading.Lock = threading.Lock()
+        self.value: float = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def snapshot(self) -> float:
+        return self.value
+
+
+class Histogram:
+    """
+    Cumulative fixed-bucket histogram.
+
+    ``observe`` is O(log buckets). Quantiles in :meth:`snapshot` are estimated from
+    the bucket upper bounds, which is coarse but needs no per-sample storage.
+    """
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self._lock: threading.Lock = threading.Lock()
+        self.buckets: tuple[float, ...] = tuple(sorted(buckets))
+        # Last slot is the +Inf bucket
+        self.counts: list[int] = [0] * (len(self.buckets) + 1)
+        self.count: int = 0
+        self.sum: float = 0.0
+        self.max: float = 0.0
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def time(self) -> '_HistogramTimer':
+        """Context manager observing the wall time spent inside it"""
+        return _HistogramTimer(self)
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+        }
+
+
+class _HistogramTimer:
+    def __init__(self, histogram: Histogram) -> None:
+        self.histogram: Histogram = histogram
+        self.start: float = 0.0
+
+    def __enter__(self) -> '_HistogramTimer':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class MetricsRegistry:
+    """
+    Named, labelled metrics.
+
+    Metrics are created on first access and cached, so instrumented code can call
+    ``registry.counter("name", topic=topic)`` on every event without extra setup.
+    Hot paths should still keep a reference to the returned metric.
+    """
+    def __init__(self) -> None:
+        self._lock: threading.Lock = threading.Lock()
+        self._metrics: dict[str, tuple[str, str, dict[LabelKey, Counter | Gauge | Histogram]]] = {}
+
+    def _get(self, kind: str, name: str, description: str, labels: dict[str, str], factory: Any) -> Any:
+        key: LabelKey = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            family = self._metrics.get(name)
+            if family is None:
+                family = (kind, description, {})
+                self._metrics[name] = family
+            elif family[0] != kind:
+                raise ValueError(f"Metric {name} already registered as {family[0]}")
+            children = family[2]
+            metric = children.get(key)
+            if metric is None:
+                metric = factory()
+                children[key] = metric
+            return metric
+
+    def counter(self, name: str, description: str = "", **labels: str) -> Counter:
+        return self._get("counter", name, description, labels, Counter)
+
+    def gauge(self, name: str, description: str = "", **labels: str) -> Gauge:
+        return self._get("gauge", name, description, labels, Gauge)
+
+    def histogram(self, name: str, description: str = "", buckets: tuple[float, ...] = DEFAULT_BUCKETS, **labels: str) -> Histogram:
+        return self._get("histogram", name, description, labels, lambda: Histogram(buckets))
+
+    def snapshot(self) -> dict[str, Any]:
+        """JSON-serializable view of every metric"""
+        with self._lock:
+            families = list(self._metrics.items())
+        result: dict[str, Any] = {}
+        for name, (kind, _, children) in families:
+            result[name] = {
+                "type": kind,
+                "values": [
+                    {"labels": dict(key), "value": metric.snapshot()}
+                    for key, metric in list(children.items())
+                ],
+            }
+        return result
+
+    def to_prometheus(self) -> str:
+        """Render the registry in the Prometheus text exposition format"""
+        with self._lock:
+            families = list(self._metrics.items())
+        lines: list[str] = []
+        for name, (kind, description, children) in families:
+            if description:
+                lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, metric in list(children.items()):
+                if isinstance(metric, Histogram):
+                    cumulative = 0
+                    for bound, bucket_count in zip(metric.buckets, metric.counts):
+                        cumulative += bucket_count
+                        lines.append(f"{name}_bucket{_format_labels(key, le=repr(bound))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key, le='+Inf')} {metric.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {metric.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {metric.count}")
+                else:
+                    lines.append(f"{name}{_format_labels(key)} {metric.value}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(key: LabelKey, **extra: str) -> str:
+    pairs = list(key) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in pairs) + "}"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Process-wide registry used by the instrumented modules unless one is passed in
+REGISTRY = MetricsRegistry()
+
+
+def start_metrics_server(port: int = 9108, host: str = "127.0.0.1", registry: MetricsRegistry = REGISTRY) -> 'ThreadingHTTPServer':
+    """
+    Serve ``registry`` over HTTP from a daemon thread.
+
+    Returns the server; call ``shutdown()`` on it to stop serving.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path == "/metrics":
+                body = registry.to_prometheus().encode("utf-8")
+                content_type = "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body = json.dumps(registry.snapshot()).encode("utf-8")
+                content_type = "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            _ = self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logging.debug(f"metrics http: {format % args}")
+
+    server = ThreadingHTTPServer((host, port), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http")
+    thread.start()
+    logging.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
+
+
+class MetricsPublisher:
+    """Publishes the registry snapshot to the retained ``/<pot_id>/metrics`` topic, or ``/<pot_id>/metrics/<process>``"""
+    def __init__(self, client: 'Client', pot_id: UUID, interval: float = 30.0, registry: MetricsRegistry = REGISTRY, process: str | None = None) -> None:
+        self.client: 'Client' = client
+        # Each process has its own registry, so each needs its own retained topic
+        self.topic: str = f"/{pot_id}/metrics/{process}" if process else f"/{pot_id}/metrics"
+        self.interval: float = interval
+        self.registry: MetricsRegistry = registry
+        self.publishing: bool = False
+
+    async def start(self) -> None:
+        self.publishing = True
+        while self.publishing:
+            try:
+                await self.client.publish(self.topic, json.dumps(self.registry.snapshot()), retain=True)
+            except Exception as e:
+                logging.warning(f"Failed to publish metrics: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def stop(self) -> None:
+        self.publishing = False
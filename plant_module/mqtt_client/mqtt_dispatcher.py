@@ -7,18 +7,25 @@ from abc import ABC, abstractmethod
 from asyncio import Queue
 
 from plant_module.mqtt_client.mqtt_handler import MQTTHandler
-from plant_module.mqtt_client.pot_config import PotConfig
+from plant_module.mqtt_client.pot_config import PotConfig, warm_up
 from plant_module.mqtt_client.control_manager import ControlManager
+from plant_module.mqtt_client.metrics import REGISTRY, MetricsPublisher, MetricsRegistry, start_metrics_server
+from plant_module.mqtt_client import tracing
+from plant_module.mqtt_client.tracing import Trace
 
 
 '''This class is responsible for managing MQTT client connections and message dispatching to handlers.'''
 class MQTTDispatcher:
-    def __init__(self, hostname: str = "localhost", port: int=1883, pot_config: PotConfig = PotConfig.load_from_file() or PotConfig()) -> None:
+    def __init__(self, hostname: str = "localhost", port: int=1883, pot_config: PotConfig | None = None, metrics: MetricsRegistry = REGISTRY) -> None:
+        if pot_config is None:
+            # Read at construction, not as a default argument evaluated at import
+            pot_config = PotConfig.load_from_file() or PotConfig()
         self.client: Client = Client(hostname, port)
         self.pot_id = pot_config.get_pot_id()
         self._running: bool = False
-        self.handlers: dict[str, tuple[MQTTHandler, Queue[bytes]]] = {}
+        self.handlers: dict[str, tuple[MQTTHandler, Queue[tuple[bytes, Trace | None]]]] = {}
         self.tasks: dict[str, Task[None]] = {}
+        self.metrics: MetricsRegistry = metrics
     
     """Start the dispatcher and subscribe to all topics"""
     async def start(self) -> None:
@@ -32,10 +39,15 @@ class MQTTDispatcher:
         if topic in self.handlers.keys():
             raise ValueError(f"Handler for topic {topic} already exists")
         
-        queue: Queue[bytes] = Queue()
+        queue: Queue[tuple[bytes, Trace | None]] = Queue()
         self.handlers[topic] = (handler, queue)
         # self.tasks[topic] = asyncio.create_task(self._process_queue(topic, handler, queue))      
     
+    """Use a new client for another broker; enter it and start() again to subscribe there"""
+    def use_broker(self, hostname: str, port: int) -> Client:
+        self.client = Client(hostname, port)
+        return self.client
+    
     """Stop the dispatcher and unsubscribe from all topics"""
     async def stop(self) -> None:
         # unsubscribe from all topics
@@ -46,9 +58,12 @@ class MQTTDispatcher:
     '''Run MQTT message loop, dispatch messages to handlers based on topic'''
     async def run_dispatch(self) -> None:
         for (topic, (handler, queue)) in self.handlers.items():
-            self.tasks[topic] = asyncio.create_task(self._process_queue(topic, handler, queue))
+            # Queue workers outlive a reconnect; only start the missing ones
+            if topic not in self.tasks or self.tasks[topic].done():
+                self.tasks[topic] = asyncio.create_task(self._process_queue(topic, handler, queue))
         
         all_topics: list[str] = [str(topic) for topic in self.handlers.keys()]
+        depth_gauges = {topic: self.metrics.gauge("dispatcher_queue_depth", "Messages waiting per topic", topic=topic) for topic in all_topics}
         logging.info(f"Subscribed to topics: {all_topics}")
         async for message in self.client.messages:
             topic = str(message.topic)
@@ -57,24 +72,91 @@ class MQTTDispatcher:
                 continue
             _, queue = self.handlers[topic]
             payload: bytes = message.payload if isinstance(message.payload, bytes) else bytes(str(message.payload), 'utf-8')
-            await queue.put(payload)
+            trace = tracing.start_trace("mqtt_receive", topic=topic)
+            if trace is not None:
+                trace.mark("dispatcher_queue")
+            await queue.put((payload, trace))
+            depth_gauges[topic].set(queue.qsize())
             
-    async def _process_queue(self, topic: str, handler: MQTTHandler, message_queue: Queue[bytes]) -> None:
+    async def _process_queue(self, topic: str, handler: MQTTHandler, message_queue: Queue[tuple[bytes, Trace | None]]) -> None:
+        depth = self.metrics.gauge("dispatcher_queue_depth", "Messages waiting per topic", topic=topic)
+        latency = self.metrics.histogram("dispatcher_handler_latency_seconds", "Time spent in handle_message per topic", topic=topic)
+        errors = self.metrics.counter("dispatcher_handler_errors_total", "Exceptions raised by handlers per topic", topic=topic)
         while self._running:
-            payload: bytes = await message_queue.get()
+            payload, trace = await message_queue.get()
+            depth.set(message_queue.qsize())
+            if trace is not None:
+                trace.end("dispatcher_queue", depth=message_queue.qsize())
+            # Handlers and any tasks they create inherit the trace through the context
+            token = tracing.activate(trace)
             try:
-                await handler.handle_message(topic, payload)
+                with latency.time(), tracing.span("handle_message"):
+                    await handler.handle_message(topic, payload)
             except Exception as e:
+                errors.inc()
                 print(f"[ERROR] Error handling message for topic {topic}: {e}")
+            finally:
+                tracing.deactivate(token)
             message_queue.task_done()
             
 async def main():
-    pot_config = PotConfig.load_from_file() or PotConfig()
-    dispatcher = MQTTDispatcher(pot_config=pot_config)
-    dispatcher.add_handler(f"/{pot_config.get_pot_id()}/control", ControlManager(pot_config, dispatcher.client))
-    async with dispatcher.client:
-        await dispatcher.start()
-        await dispatcher.run_dispatch()
+    import argparse
+    from plant_module.mqtt_client.config_watch import ConfigWatcher
+    from plant_module.mqtt_client.pot_config import DEFAULT_POT_CONFIG_PATH
+    parser = argparse.ArgumentParser()
+    _ = parser.add_argument("--trace-file", help="Write sampled control-message traces (Chrome trace format) to this file")
+    _ = parser.add_argument("--trace-sample-rate", type=float, default=1.0, help="Fraction of messages to trace (default: 1.0)")
+    _ = parser.add_argument("--path", default=DEFAULT_POT_CONFIG_PATH, help="Pot config file, watched for changes (default: as per PotConfig)")
+    _ = parser.add_argument("--metrics-port", type=int, help="Serve runtime metrics on http://127.0.0.1:<port>/metrics")
+    _ = parser.add_argument("--publish-metrics", action="store_true", help="Also publish metrics to the retained /<pot_id>/metrics/dispatcher topic")
+    args = parser.parse_args()
+    if args.trace_file:
+        tracing.configure(args.trace_file, args.trace_sample_rate)
+    if args.metrics_port:
+        _ = start_metrics_server(args.metrics_port)
+    
+    watcher = ConfigWatcher(args.path)
+    pot_config = watcher.config
+    broker = pot_config.device.broker
+    dispatcher = MQTTDispatcher(broker.hostname, broker.port, pot_config=pot_config)
+    manager = ControlManager(pot_config, dispatcher.client)
+    dispatcher.add_handler(f"/{pot_config.get_pot_id()}/control", manager)
+    
+    broker_changed = asyncio.Event()
+    def on_config_changed(old: PotConfig, new: PotConfig) -> None:
+        manager.apply_config(new)
+        if new.device.broker != old.device.broker:
+            broker_changed.set()
+    watcher.listeners.append(on_config_changed)
+    _ = asyncio.create_task(watcher.watch())
+    
+    while True:
+        async with dispatcher.client:
+            await dispatcher.start()
+            # Retained, so a sensor publisher connecting later also knows what runs
+            await manager.publish_actuator_state()
+            # Subscribed; build the deferred validators before the first control message arrives
+            warm_up()
+            dispatch = asyncio.create_task(dispatcher.run_dispatch())
+            metrics_task = None
+            if args.publish_metrics:
+                # Started after run_dispatch, which registers the queue gauges, so the first snapshot has them
+                metrics_task = asyncio.create_task(
+                    MetricsPublisher(dispatcher.client, pot_config.get_pot_id(), process="dispatcher").start()
+                )
+            changed = asyncio.create_task(broker_changed.wait())
+            done, _ = await asyncio.wait({dispatch, changed}, return_when=asyncio.FIRST_COMPLETED)
+            if metrics_task is not None:
+                _ = metrics_task.cancel()
+            if dispatch in done:
+                _ = changed.cancel()
+                dispatch.result()
+                return
+            _ = dispatch.cancel()
+        broker_changed.clear()
+        broker = watcher.config.device.broker
+        logging.info(f"Broker changed, reconnecting to {broker.hostname}:{broker.port}")
+        manager.client = dispatcher.use_broker(broker.hostname, broker.port)
     
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
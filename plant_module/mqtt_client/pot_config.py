@@ -2,15 +2,29 @@ from typing import Self
 from uuid import UUID
 import uuid
 import os
-import json
 
 from pydantic.main import BaseModel
 import pydantic
 
+from .startup import LAZY_STARTUP
+from .control_rules import ControlRule, SensorField
+from .calibration import DEFAULT_CALIBRATION, CalibrationCurve
+from .filters import FilterSpec
+from .telemetry import TelemetryConfig
+from .device_config import DeviceConfig
+from .control_request import control_request_adapter
+from .sensor_reading import SensorReading
+
 DEFAULT_POT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pot_config/config.json")
 
 class PotConfig(BaseModel):
     pot_id: UUID = pydantic.Field(default_factory=uuid.uuid4, )
+    rules: list[ControlRule] = pydantic.Field(default_factory=list) # automatic control, see control_rules.py
+    calibration: dict[SensorField, CalibrationCurve] = pydantic.Field(default_factory=lambda: dict(DEFAULT_CALIBRATION)) # raw -> physical units, see calibration.py
+    filters: dict[SensorField, FilterSpec] = pydantic.Field(default_factory=dict) # smoothing of noisy sensors, see filters.py
+    telemetry: TelemetryConfig = pydantic.Field(default_factory=TelemetryConfig) # topic fan-out and MQTT 5 topic aliases, see telemetry.py
+    device: DeviceConfig = pydantic.Field(default_factory=DeviceConfig) # broker, intervals, pins and limits, see device_config.py
+    model_config = {"defer_build": LAZY_STARTUP}
     
     def get_pot_id(self) -> UUID:
         return self.pot_id
@@ -27,8 +41,7 @@ class PotConfig(BaseModel):
             return None
             
         try:
-            json_object = json.loads(text)
-            pot_config: PotConfig = pydantic.TypeAdapter(PotConfig).validate_python(json_object)
+            pot_config: PotConfig = PotConfig.model_validate_json(text)
             return pot_config
         except Exception as e:
             print(f"Error loading pot config: {e}")
@@ -42,4 +55,11 @@ class PotConfig(BaseModel):
         except Exception as e:
             print(f"Error saving pot config: {e}")
             return False
-    
\ No newline at end of file
+    
+
+
+def warm_up() -> None:
+    """Build the deferred validators now, e.g. once the device is connected and idle"""
+    _ = control_request_adapter()
+    for model in (PotConfig, SensorReading):
+        _ = model.model_rebuild(force=True)
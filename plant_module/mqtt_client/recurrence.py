@@ -0,0 +1,151 @@
+'''
+Cron-style calendar recurrence.
+
+CronSchedule understands the usual five fields, "minute hour day-of-month month
+day-of-week", each a "*", a number, a range "a-b", a list "a,b" or a step
+"*/n" / "a-b/n", with month and weekday names (JAN, MON-FRI) and the @hourly,
+@daily, @weekly, @monthly and @yearly shortcuts. Like cron, when both the
+day-of-month and the day-of-week are restricted a day matches if either does.
+
+    "0 6 * * MON-FRI"   weekdays at 06:00
+    "0 8-20/2 * * *"    every 2 hours between 08:00 and 20:00
+
+Instead of searching the calendar on every call, the schedule precomputes the
+sorted minutes of the day it fires at and remembers where the last answer was
+(a cursor into that list). Asking for the fire after the previous one, which is
+what re-arming a recurring event does, only moves the cursor: O(1), plus one
+step to the next matching day once per day. That step jumps over months that
+don't match and, when only the day of the month is restricted, straight to the
+next allowed day, so monthly and yearly schedules don't walk every day between.
+'''
+from bisect import bisect_right
+from calendar import monthrange
+from datetime import date, datetime, time, timedelta
+
+MONTH_NAMES = {name: index for index, name in enumerate(
+    ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"], start=1
+)}
+WEEKDAY_NAMES = {name: index for index, name in enumerate(["SUN", "MON", "TUE", "WED", "THU", "FRI", "SAT"])}
+SHORTCUTS = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+# Longest gap between two matching days: "29 Feb that is a Monday" recurs every 28 years
+MAX_YEARS_SEARCHED = 28
+
+
+def _parse_value(value: str, names: dict[str, int]) -> int:
+    return names[value.upper()] if value.upper() in names else int(value)
+
+
+def _parse_field(field: str, low: int, high: int, names: dict[str, int] | None = None) -> tuple[frozenset[int], bool]:
+    '''The values a field allows, and whether it was restricted (not "*")'''
+    names = names or {}
+    values: set[int] = set()
+    for part in field.split(","):
+        range_part, _, step_part = part.partition("/")
+        step = int(step_part) if step_part else 1
+        if step < 1:
+            raise ValueError(f"Invalid step in cron field {field!r}")
+        if range_part == "*":
+            start, end = low, high
+        elif "-" in range_part:
+            first, _, last = range_part.partition("-")
+            start, end = _parse_value(first, names), _parse_value(last, names)
+        else:
+            start = _parse_value(range_part, names)
+            end = high if step_part else start
+        if not low <= start <= high or not low <= end <= high or start > end:
+            raise ValueError(f"Cron field {field!r} is out of range {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values), field != "*"
+
+
+class CronSchedule:
+    def __init__(self, expression: str) -> None:
+        self.expression: str = expression
+        fields = SHORTCUTS.get(expression.strip().lower(), expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression {expression!r} must have 5 fields")
+        minutes, _ = _parse_field(fields[0], 0, 59)
+        hours, _ = _parse_field(fields[1], 0, 23)
+        self.days_of_month, self._dom_restricted = _parse_field(fields[2], 1, 31)
+        self.months, _ = _parse_field(fields[3], 1, 12, MONTH_NAMES)
+        weekdays, self._dow_restricted = _parse_field(fields[4], 0, 7, WEEKDAY_NAMES)
+        # Both 0 and 7 mean Sunday
+        self.weekdays: frozenset[int] = frozenset(day % 7 for day in weekdays)
+        self._sorted_days_of_month: list[int] = sorted(self.days_of_month)
+        # Minutes after midnight the schedule fires at, sorted
+        self.times: list[int] = sorted(hour * 60 + minute for hour in hours for minute in minutes)
+        # Cursor: the last fire time returned and its position in `times`
+        self._last: datetime | None = None
+        self._index: int = 0
+
+    def __repr__(self) -> str:
+        return f"CronSchedule({self.expression!r})"
+
+    def matches_day(self, day: date) -> bool:
+        if day.month not in self.months:
+            return False
+        dom = day.day in self.days_of_month
+        dow = (day.weekday() + 1) % 7 in self.weekdays
+        if self._dom_restricted and self._dow_restricted:
+            return dom or dow
+        return dom and dow
+
+    def _fire(self, day: date, index: int, like: datetime) -> datetime:
+        minute = self.times[index]
+        fire = datetime.combine(day, time(minute // 60, minute % 60), tzinfo=like.tzinfo)
+        self._last, self._index = fire, index
+        return fire
+
+    def _next_day(self, day: date, like: datetime) -> datetime | None:
+        '''The first fire on a matching day after `day`'''
+        year, month = day.year, day.month
+        after = day.day
+        for _ in range(12 * MAX_YEARS_SEARCHED + 1):
+            if month in self.months:
+                last = monthrange(year, month)[1]
+                if self._dom_restricted and not self._dow_restricted:
+                    # Only the listed days can match
+                    for dom in self._sorted_days_of_month:
+                        if dom > last:
+                            break
+                        if dom > after:
+                            return self._fire(date(year, month, dom), 0, like)
+                else:
+                    for dom in range(after + 1, last + 1):
+                        candidate = date(year, month, dom)
+                        if self.matches_day(candidate):
+                            return self._fire(candidate, 0, like)
+            month += 1
+            if month > 12:
+                year, month = year + 1, 1
+            after = 0
+        return None
+
+    def next_after(self, t: datetime) -> datetime | None:
+        '''The first fire time strictly after `t`, or None if the schedule never fires'''
+        if not self.times:
+            return None
+        if self._last is not None and t == self._last:
+            # Re-arming from the previous answer: step the cursor
+            if self._index + 1 < len(self.times):
+                return self._fire(t.date(), self._index + 1, t)
+            return self._next_day(t.date(), t)
+        day = t.date()
+        if self.matches_day(day):
+            # Fire times are on whole minutes; anything later in the current minute is past it
+            index = bisect_right(self.times, t.hour * 60 + t.minute)
+            if index < len(self.times):
+                return self._fire(day, index, t)
+        return self._next_day(day, t)
+
+    def first_at_or_after(self, t: datetime) -> datetime | None:
+        '''Like next_after, but `t` itself counts if the schedule fires at it'''
+        return self.next_after(t - timedelta(microseconds=1))
@@ -0,0 +1,208 @@
+'''
+Per-sensor sampling periods on one merged timeline.
+
+Temperature changes over minutes, the water level during watering over
+seconds. Every sensor field can have its own period (PotConfig.telemetry.periods,
+ISO 8601 durations like the control requests use):
+
+    "telemetry": {
+        "periods": {"water_level_sensor": "PT1S", "temperature_sensor": "PT5M"}
+    }
+
+Fields without a period use the publisher's interval. SamplingTimeline keeps
+the next due time of every field in a heap. Each tick pops every field that is
+due, together with those due within `merge_window` seconds, so fields
+whose periods line up are read and published together instead of in separate
+ticks a few milliseconds apart. SensorPublisher then reads only the hardware of
+those fields and publishes only them.
+
+A field that fell more than a period behind (the loop stalled) is sampled once
+and rescheduled on its grid after `now`, like the "skip" misfire policy of the
+scheduler.
+
+Periods can also adapt to what is going on (PotConfig.telemetry.adaptive). A
+field with an AdaptiveSamplingSpec is sampled at `fast_period` as soon as it
+changes by at least `active_change` between two samples, or while one of its
+`actuators` runs, and backs off towards `slow_period` once it has been stable
+(changes of at most `stable_change`) for `stable_samples` samples in a row,
+multiplying its period by `backoff` each time. Changes between the two
+thresholds keep the current period, so noise around one of them doesn't make
+the rate flap. For the tank during watering:
+
+    "adaptive": {
+        "water_level_sensor": {
+            "fast_period": "PT1S", "slow_period": "PT10M",
+            "active_change": 0.5, "stable_change": 0.2,
+            "actuators": ["water_pump"]
+        }
+    }
+
+Changes are compared between consecutive samples, so the longer the period,
+the smaller the drift per second that speeds it up again.
+
+Actuators switched by control requests are switched in the dispatcher process;
+its ControlManager publishes their state, retained, on /<pot_id>/actuators/<actuator>
+and SensorPublisher.follow_actuators() applies it here.
+'''
+import heapq
+from datetime import timedelta
+from typing import Mapping
+
+from pydantic import BaseModel, Field, model_validator
+
+from .control_request import ActuatorLiteral
+from .control_rules import SensorField
+from .startup import LAZY_STARTUP
+
+# Fields due this close after the first due one join its tick
+DEFAULT_MERGE_WINDOW = 0.01
+
+
+class SamplingTimeline:
+    def __init__(self, periods: dict[str, float], start: float, merge_window: float = DEFAULT_MERGE_WINDOW) -> None:
+        """
+        :param periods: field -> seconds between samples
+        :param start: monotonic time of the first tick; every field is due then
+        """
+        if any(period <= 0 for period in periods.values()):
+            raise ValueError("Sampling periods must be positive")
+        self.periods: dict[str, float] = dict(periods)
+        self.merge_window: float = merge_window
+        # (due, field); exactly one entry per field
+        self._heap: list[tuple[float, str]] = [(start, field) for field in self.periods]
+        heapq.heapify(self._heap)
+
+    def next_due(self) -> float:
+        return self._heap[0][0]
+
+    def pop_due(self, now: float) -> list[str]:
+        """
+        Fields to sample in the tick at ``now`` (empty if nothing is due yet),
+        each rescheduled one period later
+        """
+        heap = self._heap
+        if not heap or heap[0][0] > now:
+            return []
+        limit = now + self.merge_window
+        popped: list[tuple[float, str]] = []
+        while heap and heap[0][0] <= limit:
+            popped.append(heapq.heappop(heap))
+        for due, field in popped:
+            period = self.periods[field]
+            due += period
+            if due <= now:
+                # Missed whole periods: sample once and get back on the grid
+                due += ((now - due) // period + 1) * period
+            heapq.heappush(heap, (due, field))
+        return [field for _, field in popped]
+
+    def set_period(self, field: str, period: float, now: float) -> None:
+        """
+        Change the period of ``field``. It is next due one new period after its
+        last sample, or at ``now`` if that has already passed.
+        """
+        if period <= 0:
+            raise ValueError("Sampling periods must be positive")
+        old = self.periods[field]
+        self.periods[field] = period
+        for index, (due, name) in enumerate(self._heap):
+            if name == field:
+                self._heap[index] = (max(now, due - old + period), field)
+                heapq.heapify(self._heap)
+                return
+
+
+class AdaptiveSamplingSpec(BaseModel):
+    fast_period: timedelta # period while the value changes fast or an actuator runs
+    slow_period: timedelta # floor rate when the value is stable
+    active_change: float = Field(gt=0) # change between two samples that counts as activity
+    stable_change: float = Field(default=0.0, ge=0) # changes at most this big count as stable
+    stable_samples: int = Field(default=3, ge=1) # stable samples in a row before each slow-down step
+    backoff: float = Field(default=2.0, gt=1) # factor the period grows by per slow-down step
+    actuators: list[ActuatorLiteral] = Field(default_factory=list) # sample fast while any of these is on
+    model_config = {"defer_build": LAZY_STARTUP}
+
+    @model_validator(mode="after")
+    def _check_bounds(self):
+        if not timedelta(0) < self.fast_period <= self.slow_period:
+            raise ValueError("Need 0 < fast_period <= slow_period")
+        if self.stable_change >= self.active_change:
+            raise ValueError("stable_change must be below active_change")
+        return self
+
+
+class AdaptiveSampler:
+    """
+    Current sampling period of every field with an AdaptiveSamplingSpec.
+    observe() and actuator() return the periods that changed, for
+    SamplingTimeline.set_period().
+    """
+    def __init__(self, specs: Mapping[SensorField, AdaptiveSamplingSpec], periods: Mapping[str, float]) -> None:
+        """
+        :param periods: field -> starting period in seconds, clamped to the spec's bounds
+        """
+        self.specs: dict[SensorField, AdaptiveSamplingSpec] = dict(specs)
+        # field -> (fast, slow, active_change, stable_change, stable_samples, backoff, actuators)
+        self._compiled: dict[str, tuple[float, float, float, float, int, float, frozenset[str]]] = {
+            field: (
+                spec.fast_period.total_seconds(),
+                spec.slow_period.total_seconds(),
+                spec.active_change,
+                spec.stable_change,
+                spec.stable_samples,
+                spec.backoff,
+                frozenset(spec.actuators),
+            )
+            for field, spec in self.specs.items()
+        }
+        self.periods: dict[str, float] = {
+            field: min(compiled[1], max(compiled[0], periods.get(field, compiled[1])))
+            for field, compiled in self._compiled.items()
+        }
+        self._last: dict[str, float] = {}
+        # field -> stable samples in a row
+        self._stable: dict[str, int] = {}
+        self._running: set[str] = set()
+
+    def observe(self, field: str, value: float) -> float | None:
+        """Take a new sample of ``field``; returns its new period if it changed"""
+        compiled = self._compiled.get(field)
+        if compiled is None:
+            return None
+        fast, slow, active_change, stable_change, stable_samples, backoff, actuators = compiled
+        last = self._last.get(field)
+        self._last[field] = value
+        if last is None:
+            return None
+        period = current = self.periods[field]
+        change = abs(value - last)
+        if change >= active_change or not actuators.isdisjoint(self._running):
+            self._stable[field] = 0
+            period = fast
+        elif change <= stable_change:
+            stable = self._stable.get(field, 0) + 1
+            if stable >= stable_samples:
+                stable = 0
+                period = min(slow, current * backoff)
+            self._stable[field] = stable
+        else:
+            # Between the thresholds: keep the period, start counting again
+            self._stable[field] = 0
+        if period == current:
+            return None
+        self.periods[field] = period
+        return period
+
+    def actuator(self, actuator: str, on: bool) -> dict[str, float]:
+        """An actuator was switched; fields that watch it go fast while it is on"""
+        if on:
+            self._running.add(actuator)
+        else:
+            self._running.discard(actuator)
+            return {}
+        changed: dict[str, float] = {}
+        for field, compiled in self._compiled.items():
+            if actuator in compiled[6] and self.periods[field] != compiled[0]:
+                self.periods[field] = changed[field] = compiled[0]
+                self._stable[field] = 0
+        return changed
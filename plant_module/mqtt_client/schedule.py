@@ -1,7 +1,33 @@
+from concurrent.futures import Executor
 from datetime import datetime, timedelta
-from typing import Callable
+from typing import Awaitable, Callable, Iterable, Literal
+import heapq
+import inspect
+import itertools
+import time as _time
 import uuid
 import asyncio
+import contextvars
+
+from .clock import SYSTEM_CLOCK, Clock
+from .recurrence import CronSchedule
+from .metrics import REGISTRY, MetricsRegistry
+from . import tracing
+
+# What to do with an event that is found more than its misfire grace late
+# (after a suspend, a long blocking action or a clock jump):
+#   "skip" - fire once now, then continue at the first fire time after now
+#   "all"  - fire every missed occurrence, back to back
+#   "drop" - don't fire the late occurrence; continue at the first fire time after now.
+#            Only for repeating events: a one-shot event has no later occurrence,
+#            so it fires late, like with "skip"
+MisfirePolicy = Literal["skip", "all", "drop"]
+DEFAULT_MISFIRE_GRACE = timedelta(seconds=1)
+# Concurrent deferred (async or offloaded) actions a scheduler runs by default
+DEFAULT_MAX_CONCURRENT_ACTIONS = 4
+
+# The result is ignored (after awaiting it, for async actions), so methods returning e.g. a bool fit too
+Action = Callable[[], object] | Callable[[], Awaitable[object]]
 
 class ScheduledEvent:
     """
@@ -16,13 +42,39 @@ class ScheduledEvent:
     execution_time
         Next scheduled execution datetime for the event.
     action
-        A callable to be executed when the event fires. Must be synchronous
-        and non-blocking (the scheduler executes it directly).
+        A callable to be executed when the event fires. A plain function runs
+        directly on the scheduler loop, so it must be quick and non-blocking; a
+        coroutine function, or any function with ``offload=True``, is deferred
+        (see ``offload``).
     repeat_interval
         If provided, the event is repeating and ``execution_time`` is advanced
         by this timedelta after each execution.
+    recurrence
+        If provided (instead of ``repeat_interval``), the event repeats on this
+        calendar schedule: after each execution ``execution_time`` moves to the
+        schedule's next fire time. Re-arming steps the schedule's cached cursor,
+        so it costs O(1) rather than a calendar search.
+    misfire
+        The :data:`MisfirePolicy` applied when the event fires more than
+        ``misfire_grace`` late. The default, ``"skip"``, fires a repeating event
+        once after a stall instead of once per missed interval.
+    misfire_grace
+        How late the event may fire before it counts as misfired.
+    offload
+        Run a synchronous ``action`` in the scheduler's thread pool executor
+        instead of on the loop. Use it for actions that may block.
+    lane
+        Name of the serial lane the action runs in, usually the actuator it drives.
+        Actions in the same lane never overlap and run in firing order; actions
+        in different lanes run concurrently, up to the scheduler's limit.
     executed
         True when a non-repeating event has been executed (used by the scheduler).
+    trace
+        The :mod:`tracing` trace that was current when the event was created, if any.
+        Spans recorded while the event fires are attached to it.
+    tags
+        Labels the scheduler indexes the event by, e.g. the actuator it drives or
+        the schedule it belongs to. See :meth:`Scheduler.tagged`.
 
     Notes
     -----
@@ -42,48 +94,148 @@ class ScheduledEvent:
             timedelta(hours=21, minutes=37)
         )
     """
-    def __init__(self, time: datetime, action: Callable[[], None], repeat_interval: timedelta | None = None) -> None:
+    def __init__(
+        self,
+        time: datetime,
+        action: Action,
+        repeat_interval: timedelta | None = None,
+        tags: Iterable[str] = (),
+        recurrence: CronSchedule | None = None,
+        misfire: MisfirePolicy = "skip",
+        misfire_grace: timedelta = DEFAULT_MISFIRE_GRACE,
+        offload: bool = False,
+        lane: str | None = None,
+    ) -> None:
         """
         Create a :class:`ScheduledEvent`.
 
         :param time: The datetime at which the event should first execute.
         :type time: datetime
-        :param action: Callable with no parameters to run when the event fires.
-        :type action: Callable[[], None]
+        :param action: Callable with no parameters to run when the event fires,
+            or a coroutine function.
+        :type action: Action
         :param repeat_interval: Optional timedelta that, if provided, makes the
             event repeating. After each execution ``execution_time`` will be
             incremented by this interval.
         :type repeat_interval: timedelta | None
+        :param tags: Labels to index the event by.
+        :type tags: Iterable[str]
+        :param recurrence: Optional calendar schedule the event repeats on. ``time``
+            should be one of its fire times.
+        :type recurrence: CronSchedule | None
+        :param misfire: What to do when the event fires more than ``misfire_grace`` late.
+        :type misfire: MisfirePolicy
+        :param misfire_grace: Lateness tolerated before the misfire policy applies.
+        :type misfire_grace: timedelta
+        :param offload: Run a synchronous ``action`` in a worker thread.
+        :type offload: bool
+        :param lane: Serial lane the action runs in.
+        :type lane: str | None
         """
         self.id: uuid.UUID = uuid.uuid4()
         self.creation_time: datetime = datetime.now()
         self.execution_time: datetime = time
-        self.action: Callable[[], None] = action
+        self.action: Action = action
         self.repeat_interval: timedelta | None = repeat_interval
+        self.recurrence: CronSchedule | None = recurrence
+        self.misfire: MisfirePolicy = misfire
+        self.misfire_grace: timedelta = misfire_grace
+        self.offload: bool = offload
+        self.lane: str | None = lane
         self.executed: bool = False
+        self.trace: tracing.Trace | None = tracing.current_trace()
+        self.tags: frozenset[str] = frozenset(tags)
+        # Sequence number of the event's live entry in the scheduler heap
+        self._seq: int = -1
         
-    def execute(self) -> None:
+    def misfired(self, now: datetime) -> bool:
+        """True if firing at ``now`` is more than ``misfire_grace`` late."""
+        return now - self.execution_time > self.misfire_grace
+
+    def execute(self, now: datetime | None = None) -> None:
         """
         Execute the event's action.
 
+        :param now: The current time, used to apply the misfire policy. Without
+            it the event is never considered late.
+        :type now: datetime | None
+
         Behaviour
         ---------
-        - Calls the ``action`` callable.
+        - Calls the ``action`` callable, unless the event repeats, misfired and
+          its policy is ``"drop"``.
+        - If ``recurrence`` is set, moves ``execution_time`` to its next fire time,
+          or marks ``executed = True`` if it never fires again.
         - If ``repeat_interval`` is set, advances ``execution_time`` by that interval.
         - Otherwise marks ``executed = True``.
+        - If the event misfired and its policy is not ``"all"``, the next fire time
+          is the first one after ``now`` instead, so the missed occurrences are
+          skipped rather than fired in a burst.
 
         Notes
         -----
         Exceptions raised by ``action`` are not handled here; the scheduler
         surrounds :meth:`execute` with a try/except to avoid terminating the loop.
+        ``execution_time`` is advanced even when the action raises, so a failing
+        repeating event doesn't fire again immediately.
         Actions should ideally be lightweight and non-blocking. If you need to
         run async or long-running work, schedule it from inside the action.
         """
-        self.action()
-        if self.repeat_interval:
-            self.execution_time += self.repeat_interval
+        run, skip_to = self._apply_misfire(now)
+        try:
+            if run:
+                _ = self.action()
+        finally:
+            self._advance(skip_to)
+
+    def dispatch(self, now: datetime | None = None) -> bool:
+        """
+        Advance to the next fire time without running the action.
+
+        Used by the scheduler for deferred actions, which run after the event has
+        been rescheduled. Applies the misfire policy like :meth:`execute`.
+
+        :returns: Whether the action should run for the occurrence being fired.
+        :rtype: bool
+        """
+        run, skip_to = self._apply_misfire(now)
+        self._advance(skip_to)
+        return run
+
+    @property
+    def deferred(self) -> bool:
+        """True if the scheduler runs the action outside its loop iteration."""
+        return self.offload or inspect.iscoroutinefunction(self.action)
+
+    def _apply_misfire(self, now: datetime | None) -> tuple[bool, datetime | None]:
+        """Whether to run this occurrence, and the time to skip ahead to, if any"""
+        late = now is not None and self.misfired(now)
+        # A one-shot event would never run at all if dropped
+        return not (late and self.misfire == "drop" and self.repeats), (now if late and self.misfire != "all" else None)
+
+    def _advance(self, skip_to: datetime | None) -> None:
+        """Move to the next fire time, or the first one after ``skip_to`` if given."""
+        if self.recurrence is not None:
+            after = self.execution_time if skip_to is None else max(self.execution_time, skip_to)
+            next_time = self.recurrence.next_after(after)
+            if next_time is None:
+                self.executed = True
+            else:
+                self.execution_time = next_time
+        elif self.repeat_interval:
+            if skip_to is not None and skip_to >= self.execution_time:
+                # First time on the original grid strictly after skip_to, in O(1)
+                missed = (skip_to - self.execution_time) // self.repeat_interval + 1
+                self.execution_time += missed * self.repeat_interval
+            else:
+                self.execution_time += self.repeat_interval
         else:
             self.executed = True
+
+    @property
+    def repeats(self) -> bool:
+        """True if the event is rescheduled after it fires."""
+        return bool(self.repeat_interval) or self.recurrence is not None
             
     def __lt__(self, other: 'ScheduledEvent') -> bool:
         """
@@ -107,35 +259,107 @@ class Scheduler:
     - Create an instance.
     - Use :meth:`start` to create the background task running :meth:`run`.
     - Add / remove events with :meth:`add_event` and :meth:`remove_event`.
+    - Look up, cancel or atomically replace groups of events by tag with
+      :meth:`tagged`, :meth:`remove_tagged` and :meth:`replace_tagged`.
     - Call :meth:`stop` to stop the scheduler and await termination.
 
+    Storage
+    -------
+    Events are kept in a binary heap of ``(execution_time, seq, event)`` entries,
+    plus a dict by ``id`` and a dict per tag. Inserting and popping the head are
+    O(log n); removing is O(1) per event (the heap entry is left behind and skipped
+    when it reaches the head, and the heap is compacted when more than half of it
+    is stale); looking up or removing all events with a tag is O(k) for k events.
+
     Concurrency and semantics
     -------------------------
     - The scheduler uses an asyncio-based cooperative model (single-threaded event loop).
-    - ``queue_lock`` protects the ``events`` list for concurrent mutation by other coroutines.
+    - ``queue_lock`` protects the event storage for concurrent mutation by other coroutines.
     - ``_wakeup`` is an :class:`asyncio.Event` used to wake the scheduler when the queue
       changes (new event, removal, stop).
     - The scheduler re-checks the head of the queue under ``queue_lock`` to avoid races
       around clearing ``_wakeup`` and waiting for a timeout.
-    - For many events, replacing the sorted list with a heap (``heapq``) is advised
-      for performance (O(log n) inserts/pops).
+
+    Actions
+    -------
+    Plain actions run directly in the loop. Deferred actions (coroutine
+    functions, or ``offload=True`` actions run in ``executor``) are started as
+    tasks after their event has been rescheduled, so a slow action never pushes
+    back later events. At most ``max_concurrent_actions`` deferred actions run at
+    once, and actions sharing a ``lane`` run one at a time in firing order. A plain
+    action whose lane is busy waits its turn like a deferred one, so a quick "off"
+    can't overtake a slow "on" of the same actuator.
+
+    Time
+    ----
+    ``execution_time`` values are compared against ``clock.now()``. Pass a
+    :class:`~plant_module.mqtt_client.clock.VirtualClock` (and run on its event loop)
+    to replay schedules faster than real time.
+
+    Metrics
+    -------
+    ``scheduler_pending_events`` (gauge), ``scheduler_firing_lateness_seconds``
+    (histogram of how late each event fired) and ``scheduler_misfires_total``
+    (counter of events found later than their misfire grace),
+    ``scheduler_action_seconds`` (histogram of action run times, labelled by
+    ``kind``: inline, async or executor) and ``scheduler_running_actions`` (gauge
+    of deferred actions in progress, including those waiting for a lane or a
+    slot) are recorded in the given registry.
     """
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        metrics: MetricsRegistry = REGISTRY,
+        clock: Clock = SYSTEM_CLOCK,
+        max_concurrent_actions: int = DEFAULT_MAX_CONCURRENT_ACTIONS,
+        executor: Executor | None = None,
+    ) -> None:
         """
         Initialize the Scheduler.
 
         Initial state:
-        - ``events`` is empty.
-        - ``queue_lock`` is an asyncio lock protecting ``events``.
+        - No events are scheduled.
+        - ``queue_lock`` is an asyncio lock protecting the event storage.
         - ``_wakeup`` is the event used to interrupt the scheduler wait.
         - ``running`` is False until :meth:`start` or :meth:`run` sets it.
         - ``_scheduler_task`` stores the background :class:`asyncio.Task` created by :meth:`start`.
+
+        :param metrics: Registry receiving the scheduler metrics.
+        :type metrics: MetricsRegistry
+        :param clock: Source of the current time.
+        :type clock: Clock
+        :param max_concurrent_actions: Limit on deferred actions running at once.
+        :type max_concurrent_actions: int
+        :param executor: Executor for offloaded actions; None uses the loop's default.
+        :type executor: Executor | None
         """
-        self.events: list[ScheduledEvent] = []
+        self._heap: list[tuple[datetime, int, ScheduledEvent]] = []
+        self._by_id: dict[uuid.UUID, ScheduledEvent] = {}
+        self._by_tag: dict[str, dict[uuid.UUID, ScheduledEvent]] = {}
+        self._seq: itertools.count[int] = itertools.count()
         self.queue_lock: asyncio.Lock = asyncio.Lock()
         self._wakeup: asyncio.Event = asyncio.Event()
         self.running: bool = False
         self._scheduler_task: asyncio.Task[None] | None = None
+        self.clock: Clock = clock
+        self.executor: Executor | None = executor
+        self._action_slots: asyncio.Semaphore = asyncio.Semaphore(max_concurrent_actions)
+        # lane -> (lock, deferred actions started in it and not finished)
+        self._lanes: dict[str, tuple[asyncio.Lock, int]] = {}
+        self._action_tasks: set[asyncio.Task[None]] = set()
+        self._pending_gauge = metrics.gauge("scheduler_pending_events", "Events waiting in the scheduler queue")
+        self._lateness_histogram = metrics.histogram(
+            "scheduler_firing_lateness_seconds", "Delay between an event's execution_time and when it fired"
+        )
+        self._misfire_counter = metrics.counter(
+            "scheduler_misfires_total", "Events found later than their misfire grace"
+        )
+        self._action_histograms = {
+            kind: metrics.histogram("scheduler_action_seconds", "Run time of scheduled actions", kind=kind)
+            for kind in ("inline", "async", "executor")
+        }
+        self._running_gauge = metrics.gauge(
+            "scheduler_running_actions", "Deferred actions started and not yet finished"
+        )
     
     def start(self) -> None:
         """
@@ -156,6 +380,8 @@ class Scheduler:
         - Sets ``running = False`` and wakes the run loop via ``_wakeup.set()`` so it
           exits promptly.
         - Awaits the scheduler task (if present) to ensure the run loop has terminated.
+        - Waits for deferred actions that are still running, so an actuator is never
+          left half-switched.
 
         Notes
         -----
@@ -170,7 +396,83 @@ class Scheduler:
                 # Preserve the cancellation semantics while ensuring cleanup
                 pass
             self._scheduler_task = None
+        if self._action_tasks:
+            _ = await asyncio.gather(*self._action_tasks, return_exceptions=True)
     
+    @property
+    def events(self) -> list[ScheduledEvent]:
+        """
+        All pending events in execution order.
+
+        Builds a new sorted list on every access; meant for inspection, not for
+        the hot path.
+        """
+        return sorted(self._by_id.values(), key=lambda event: (event.execution_time, event._seq))
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def get_event(self, event_id: uuid.UUID) -> ScheduledEvent | None:
+        """Return the pending event with ``event_id``, if any."""
+        return self._by_id.get(event_id)
+
+    def tagged(self, tag: str) -> list[ScheduledEvent]:
+        """
+        Return the pending events carrying ``tag``, in no particular order.
+
+        :param tag: The tag to look up.
+        :type tag: str
+        """
+        return list(self._by_tag.get(tag, {}).values())
+
+    def set_max_concurrent_actions(self, max_concurrent_actions: int) -> None:
+        """
+        Change how many deferred actions may run at once.
+
+        Actions already running or waiting keep the old limit; actions started
+        from now on use the new one, so both can briefly overlap.
+
+        :param max_concurrent_actions: The new limit.
+        :type max_concurrent_actions: int
+        """
+        self._action_slots = asyncio.Semaphore(max_concurrent_actions)
+
+    def _push(self, event: ScheduledEvent) -> None:
+        if event.id in self._by_id:
+            self._discard(event.id)
+        event._seq = next(self._seq)
+        self._by_id[event.id] = event
+        for tag in event.tags:
+            self._by_tag.setdefault(tag, {})[event.id] = event
+        heapq.heappush(self._heap, (event.execution_time, event._seq, event))
+
+    def _discard(self, event_id: uuid.UUID) -> ScheduledEvent | None:
+        event = self._by_id.pop(event_id, None)
+        if event is None:
+            return None
+        for tag in event.tags:
+            index = self._by_tag.get(tag)
+            if index is not None:
+                _ = index.pop(event_id, None)
+                if not index:
+                    del self._by_tag[tag]
+        # The heap entry goes stale; compact once stale entries outnumber live ones
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._by_id):
+            self._heap = [entry for entry in self._heap if self._is_live(entry)]
+            heapq.heapify(self._heap)
+        return event
+
+    def _is_live(self, entry: tuple[datetime, int, ScheduledEvent]) -> bool:
+        _, seq, event = entry
+        return event._seq == seq and self._by_id.get(event.id) is event
+
+    def _head(self) -> ScheduledEvent | None:
+        """Drop stale entries from the top of the heap and return the next event."""
+        heap = self._heap
+        while heap and not self._is_live(heap[0]):
+            _ = heapq.heappop(heap)
+        return heap[0][2] if heap else None
+
     async def add_event(self, event: ScheduledEvent) -> None:
         """
         Add an event to the schedule.
@@ -180,22 +482,56 @@ class Scheduler:
 
         Behaviour
         ---------
-        - The event is appended and the internal list is sorted by execution time.
+        - The event is pushed onto the heap and indexed by id and tags (O(log n)).
         - Wakes the scheduler so it can re-evaluate the next deadline.
         - This method acquires ``queue_lock`` briefly and is safe to call concurrently.
         """
-        async with self.queue_lock:
-            self.events.append(event)
-            self.events.sort()
+        with tracing.span("scheduler_insert"):
+            async with self.queue_lock:
+                self._push(event)
+                self._pending_gauge.set(len(self._by_id))
         # Wake the loop so it can re-evaluate the head
         self._wakeup.set()
-        
-    async def remove_event(self, event_id: uuid.UUID) -> None:
+
+    async def add_events(self, events: Iterable[ScheduledEvent]) -> None:
+        """
+        Add many events at once.
+
+        :param events: The events to schedule.
+        :type events: Iterable[ScheduledEvent]
+
+        Behaviour
+        ---------
+        Same as calling :meth:`add_event` for each event, but under a single lock
+        acquisition and with one wake-up. A large batch is appended and the heap
+        rebuilt in O(n) instead of paying for n separate pushes.
+        """
+        events = list(events)
+        async with self.queue_lock:
+            if len(events) > len(self._heap):
+                for event in events:
+                    if event.id in self._by_id:
+                        _ = self._discard(event.id)
+                    event._seq = next(self._seq)
+                    self._by_id[event.id] = event
+                    for tag in event.tags:
+                        self._by_tag.setdefault(tag, {})[event.id] = event
+                    self._heap.append((event.execution_time, event._seq, event))
+                heapq.heapify(self._heap)
+            else:
+                for event in events:
+                    self._push(event)
+            self._pending_gauge.set(len(self._by_id))
+        self._wakeup.set()
+
+    async def remove_event(self, event_id: uuid.UUID) -> ScheduledEvent | None:
         """
         Remove an event by ``id``.
 
         :param event_id: The UUID of the event to remove.
         :type event_id: uuid.UUID
+        :returns: The removed event, or None if there was no such event.
+        :rtype: ScheduledEvent | None
 
         Behaviour
         ---------
@@ -204,9 +540,49 @@ class Scheduler:
           event was the next to run.
         """
         async with self.queue_lock:
-            self.events = [event for event in self.events if event.id != event_id]
+            event = self._discard(event_id)
+            self._pending_gauge.set(len(self._by_id))
         self._wakeup.set()
-        
+        return event
+
+    async def remove_tagged(self, tag: str) -> list[ScheduledEvent]:
+        """
+        Remove every pending event carrying ``tag``.
+
+        :param tag: The tag whose events to remove.
+        :type tag: str
+        :returns: The removed events.
+        :rtype: list[ScheduledEvent]
+
+        Only the k matching events are touched, not the whole queue.
+        """
+        return await self.replace_tagged(tag, ())
+
+    async def replace_tagged(self, tag: str, events: Iterable[ScheduledEvent]) -> list[ScheduledEvent]:
+        """
+        Atomically replace every pending event carrying ``tag`` with ``events``.
+
+        :param tag: The tag whose events to remove.
+        :type tag: str
+        :param events: The events to add in their place. They usually carry ``tag``
+            themselves, so that they can be replaced again later.
+        :type events: Iterable[ScheduledEvent]
+        :returns: The removed events.
+        :rtype: list[ScheduledEvent]
+
+        Behaviour
+        ---------
+        Removal and insertion happen under one ``queue_lock`` acquisition, so the
+        run loop never sees the old and new events together, or neither of them.
+        """
+        async with self.queue_lock:
+            removed = [self._discard(event_id) for event_id in list(self._by_tag.get(tag, {}))]
+            for event in events:
+                self._push(event)
+            self._pending_gauge.set(len(self._by_id))
+        self._wakeup.set()
+        return [event for event in removed if event is not None]
+
     async def run(self):
         """
         The scheduler loop.
@@ -224,6 +600,10 @@ class Scheduler:
                - If woken early: loop repeats to recompute head.
                - If timeout elapses: the candidate event should be due; pop it under lock,
                  execute its action (outside lock) and reinsert it if it's repeating.
+                 A late event is handled by its misfire policy, so a repeating event
+                 that missed many intervals is reinserted at its next fire time after
+                 now instead of once per missed interval. Deferred actions are
+                 rescheduled first and then run in a task (see :meth:`_run_action`).
 
         Notes
         -----
@@ -235,7 +615,7 @@ class Scheduler:
             while self.running:
                 # Get current head of event queue
                 async with self.queue_lock:
-                    next_event = self.events[0] if self.events else None
+                    next_event = self._head()
                 
                 if next_event is None:
                     # No events -> wait until someone wakes us (add/remove/stop)
@@ -244,20 +624,18 @@ class Scheduler:
                     continue
                 
                 # Compute how long until the head is due
-                now = datetime.now()
+                now = self.clock.now()
                 seconds_until_next_event = max(0.0, (next_event.execution_time - now).total_seconds())
                 
                 # Clear wake flag and re-check the head under lock to avoid losing a wake that happened before clear
                 self._wakeup.clear()
                 async with self.queue_lock:
-                    if not self.events:
-                        continue
-                    head = self.events[0]
+                    head = self._head()
                     # If head changed while we cleared, re-loop and recompute
-                    if head.id != next_event.id:
+                    if head is None or head.id != next_event.id:
                         continue
                     # Recompute remaining wait time in case time passed
-                    seconds_until_next_event = max(0.0, (head.execution_time - datetime.now()).total_seconds())
+                    seconds_until_next_event = max(0.0, (head.execution_time - self.clock.now()).total_seconds())
                 
                 try:
                     # Wait until either the head's time elapses or someone sets the wakeup
@@ -267,26 +645,111 @@ class Scheduler:
                 except asyncio.TimeoutError:
                     # Timeout expired -> candidate should be due; confirm and pop under lock
                     async with self.queue_lock:
-                        if not self.events:
-                            continue
-                        candidate = self.events[0]
-                        if candidate.id != next_event.id:
+                        candidate = self._head()
+                        if candidate is None or candidate.id != next_event.id:
                             # head changed -> skip
                             continue
-                        event = self.events.pop(0)
+                        _ = heapq.heappop(self._heap)
+                        event = candidate
+                        if not event.repeats:
+                            _ = self._discard(event.id)
+                        self._pending_gauge.set(len(self._by_id))
 
+                    now = self.clock.now()
+                    lateness = max(0.0, (now - event.execution_time).total_seconds())
+                    self._lateness_histogram.observe(lateness)
+                    if event.misfired(now):
+                        self._misfire_counter.inc()
                     # Execute outside the lock; protect against exceptions
+                    token = tracing.activate(event.trace)
                     try:
-                        event.execute()
-                    except Exception:
-                        # TODO: log the exception; don't let scheduler die
-                        pass
+                        with tracing.span("scheduler_fire", lateness_ms=lateness * 1000):
+                            if event.deferred or event.lane in self._lanes:
+                                # Reschedule now, run the action in its own task
+                                if event.dispatch(now):
+                                    self._start_action(event)
+                            else:
+                                started = _time.perf_counter()
+                                try:
+                                    event.execute(now)
+                                finally:
+                                    self._action_histograms["inline"].observe(_time.perf_counter() - started)
+                    except Exception as e:
+                        # Don't let a faulty action kill the scheduler
+                        print(f"[ERROR] Scheduled action failed: {e!r}")
+                    finally:
+                        tracing.deactivate(token)
 
-                    # If repeating, reinsert under lock
-                    if not event.executed:
+                    # If repeating and not removed while it ran, reinsert under lock
+                    if event.repeats:
                         async with self.queue_lock:
-                            self.events.append(event)
-                            self.events.sort()
+                            if self._by_id.get(event.id) is event:
+                                if event.executed:
+                                    # Its recurrence has no fire times left
+                                    _ = self._discard(event.id)
+                                else:
+                                    self._push(event)
+                            self._pending_gauge.set(len(self._by_id))
                         self._wakeup.set()
         finally:
             self.running = False
+
+    def _start_action(self, event: ScheduledEvent) -> None:
+        if event.lane is not None:
+            # Claim the lane before the task starts, so later firings queue behind it
+            lock, users = self._lanes.get(event.lane, (asyncio.Lock(), 0))
+            self._lanes[event.lane] = (lock, users + 1)
+        # The task inherits the current context, so the event's trace stays active in it
+        task = asyncio.create_task(self._run_action(event))
+        self._action_tasks.add(task)
+        self._running_gauge.set(len(self._action_tasks))
+        task.add_done_callback(self._action_done)
+
+    def _action_done(self, task: asyncio.Task[None]) -> None:
+        self._action_tasks.discard(task)
+        self._running_gauge.set(len(self._action_tasks))
+
+    async def _run_action(self, event: ScheduledEvent) -> None:
+        """
+        Run a deferred action: wait for its lane, then for a free slot, then run it
+        as a coroutine or in the executor and record how long it took.
+        """
+        lane = self._lanes[event.lane][0] if event.lane is not None else None
+        try:
+            if lane is not None:
+                await lane.acquire()
+            try:
+                async with self._action_slots:
+                    if inspect.iscoroutinefunction(event.action):
+                        kind = "async"
+                    elif event.offload:
+                        kind = "executor"
+                    else:
+                        # A plain action that only waited for its lane
+                        kind = "inline"
+                    started = _time.perf_counter()
+                    try:
+                        with tracing.span("scheduler_action", kind=kind, lane=event.lane or ""):
+                            if kind == "executor":
+                                # Executor threads don't inherit the context, and with it the trace
+                                result = await asyncio.get_running_loop().run_in_executor(
+                                    self.executor, contextvars.copy_context().run, event.action
+                                )
+                            else:
+                                result = event.action()
+                            if inspect.isawaitable(result):
+                                await result
+                    finally:
+                        self._action_histograms[kind].observe(_time.perf_counter() - started)
+            finally:
+                if lane is not None:
+                    lane.release()
+        except Exception as e:
+            print(f"[ERROR] Scheduled action failed: {e!r}")
+        finally:
+            if event.lane is not None:
+                lock, users = self._lanes[event.lane]
+                if users > 1:
+                    self._lanes[event.lane] = (lock, users - 1)
+                else:
+                    del self._lanes[event.lane]
@@ -5,9 +5,16 @@ from uuid import UUID
 from aiomqtt.client import Client
 
 from plant_module.mqtt_client.pot_config import PotConfig
-from .control_manager import Sensor
+from plant_module.mqtt_client.clock import SYSTEM_CLOCK, Clock
+from plant_module.mqtt_client.control_rules import RuleEngine
+from plant_module.mqtt_client.calibration import Calibrator
+from plant_module.mqtt_client.filters import FilterBank
+from plant_module.mqtt_client.metrics import REGISTRY, MetricsPublisher, MetricsRegistry, start_metrics_server
+from .control_manager import Sensor, actuator_state_topic
 from . import mock_sensors
-from .sensor_reading import SensorReading
+from .sensor_reading import CalibratedReading, SensorReading
+from .telemetry import TelemetryEncoder, TopicAliases, encode_timestamp
+from .sampling import AdaptiveSampler, SamplingTimeline
 from datetime import datetime, timedelta
 import asyncio
 import os
@@ -25,13 +32,47 @@ MOCK_SENSOR_METHODS = {
 
 class SensorPublisher:
     from .sensors_translation import SensorsController
-    def __init__(self, client: Client, publish_interval: timedelta, pot_config: PotConfig, sensors_controller: SensorsController | None = None) -> None:
+    def __init__(self, client: Client, publish_interval: timedelta, pot_config: PotConfig, sensors_controller: SensorsController | None = None, metrics: MetricsRegistry = REGISTRY, clock: Clock = SYSTEM_CLOCK, rule_engine: RuleEngine | None = None, calibrator: Calibrator | None = None, filters: FilterBank | None = None, validate: bool = False) -> None:
         logging.info("New SensorPublisher")
         
         self.client: Client = client
+        self.clock: Clock = clock
+        self.rule_engine: RuleEngine | None = rule_engine
+        # If set, physical values are also published on /<pot_id>/sensors/calibrated
+        self.calibrator: Calibrator | None = calibrator
+        # If set, readings are smoothed before anything else sees them
+        self.filters: FilterBank | None = filters
+        self._publish_latency = metrics.histogram("publish_latency_seconds", "Time spent in client.publish for sensor readings")
+        self._publish_errors = metrics.counter("publish_errors_total", "Sensor reading publishes that raised")
         self.publishing: bool = False
+        self.pot_config: PotConfig = pot_config
         self.pot_id: UUID = pot_config.get_pot_id()
+        # Build and validate a SensorReading per message instead of encoding with
+        # the precompiled TelemetryEncoder (see telemetry.py)
+        self.validate: bool = validate
+        self.telemetry: TelemetryEncoder = TelemetryEncoder(self.pot_id)
+        self.publish_full: bool = pot_config.telemetry.fanout in ("full", "both")
+        self.publish_per_sensor: bool = pot_config.telemetry.fanout in ("per_sensor", "both")
+        # Needs a client connected with MQTT 5
+        self.topic_aliases: TopicAliases | None = (
+            TopicAliases(pot_config.telemetry.topic_alias_maximum) if pot_config.telemetry.topic_alias_maximum else None
+        )
         self.publish_interval: timedelta = publish_interval
+        # Field -> sampling period in seconds, publish_interval unless the pot config sets one
+        self.sampling_periods: dict[str, float] = {
+            sensor.value: pot_config.telemetry.periods.get(sensor.value, publish_interval).total_seconds() for sensor in Sensor
+        }
+        # Fields with an adaptive spec get their period from the readings and actuators
+        self.adaptive: AdaptiveSampler | None = (
+            AdaptiveSampler(pot_config.telemetry.adaptive, self.sampling_periods) if pot_config.telemetry.adaptive else None
+        )
+        if self.adaptive is not None:
+            self.sampling_periods.update(self.adaptive.periods)
+        self.metrics: MetricsRegistry = metrics
+        self.sampling: SamplingTimeline | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        # Set when a period changed, to cut the sleep until the next tick short
+        self._wake: asyncio.Event | None = None
         if sensors_controller is None:
             logging.info("Using mock sensors, didn't receive SensorsController")
             self._if_use_mock_sensors: bool = True
@@ -39,33 +80,202 @@ class SensorPublisher:
             self._if_use_mock_sensors = False
             self.sensors_controller = sensors_controller
             sensors_controller.setup()
+            # Also without adaptive sampling, which a new pot config may turn on
+            sensors_controller.actuator_listeners.append(self._actuator_switched)
+
+    def apply_config(self, pot_config: PotConfig) -> None:
+        """
+        Apply a changed pot config while publishing: the interval, the telemetry
+        section, rules, calibration, filters and the sensor limits. Parts that
+        didn't change keep their state (filter history, adaptive periods). The
+        pot_id and the pins need a restart.
+        """
+        old, self.pot_config = self.pot_config, pot_config
+        telemetry = pot_config.telemetry
+        self.publish_full = telemetry.fanout in ("full", "both")
+        self.publish_per_sensor = telemetry.fanout in ("per_sensor", "both")
+        if telemetry.topic_alias_maximum != old.telemetry.topic_alias_maximum:
+            # A new alias table makes the next message on every topic carry it again
+            self.topic_aliases = TopicAliases(telemetry.topic_alias_maximum) if telemetry.topic_alias_maximum else None
+        if pot_config.rules != old.rules:
+            self.rule_engine = RuleEngine(pot_config.rules) if pot_config.rules else None
+        if pot_config.calibration != old.calibration:
+            self.calibrator = Calibrator(pot_config.calibration) if pot_config.calibration else None
+        if pot_config.filters != old.filters:
+            self.filters = FilterBank(pot_config.filters) if pot_config.filters else None
+        if not self._if_use_mock_sensors:
+            self.sensors_controller.set_limits(pot_config.device.sensor_deadlines, pot_config.device.max_stale_age)
+
+        interval = pot_config.device.sensor_reading_interval
+        if (interval, telemetry.periods, telemetry.adaptive) == (self.publish_interval, old.telemetry.periods, old.telemetry.adaptive):
+            return
+        self.publish_interval = interval
+        periods = {sensor.value: telemetry.periods.get(sensor.value, interval).total_seconds() for sensor in Sensor}
+        if telemetry.adaptive != old.telemetry.adaptive:
+            self.adaptive = AdaptiveSampler(telemetry.adaptive, periods) if telemetry.adaptive else None
+        if self.adaptive is not None:
+            # Adaptive fields keep their current period within the (new) bounds
+            periods.update(self.adaptive.periods)
+        self._set_periods({field: period for field, period in periods.items() if period != self.sampling_periods.get(field)})
         
-    async def _publish_all_readings(self):
-        full_topic = f"/{self.pot_id}/sensors"
-        timestamp = datetime.now() 
+    async def _publish_all_readings(self, fields: list[str] | None = None):
+        """Read and publish every sensor, or only ``fields``"""
+        timestamp = self.clock.now()
+        stale: dict[str, float] = {}
         if self._if_use_mock_sensors:
-            readings = {sensor.value: MOCK_SENSOR_METHODS[sensor]() for sensor in Sensor}    
+            readings = {sensor.value: MOCK_SENSOR_METHODS[sensor]() for sensor in Sensor if fields is None or sensor.value in fields}
         else:
-            readings = self.sensors_controller.get_sensor_reading()
+            readings = self.sensors_controller.get_sensor_reading(fields)
             if readings is None:
                 logging.error("Failed to get sensor readings, skipping publish tick")
                 return
+            if not readings:
+                logging.error("No sensor delivered a value in time, skipping publish tick")
+                return
+            stale = {name: round(age, 3) for name, age in self.sensors_controller.stale_ages.items()}
+
+        if self.filters is not None:
+            readings = self.filters.apply(readings)
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                # state() builds a dict per filter; don't pay for it on every tick otherwise
+                logging.debug("Filter state: %s", self.filters.state())
+
+        if self.adaptive is not None:
+            observe = self.adaptive.observe
+            self._set_periods({
+                field: period for field, value in readings.items() if (period := observe(field, value)) is not None
+            })
+
+        if self.rule_engine is not None:
+            self._apply_rules(readings, timestamp)
 
+        calibrated = self.calibrator.convert(readings) if self.calibrator is not None else None
+        if self.validate:
+            await self._publish_validated(readings, timestamp, stale, calibrated)
+            return
+
+        telemetry = self.telemetry
+        text = encode_timestamp(timestamp)
+        if self.publish_full:
+            await self._publish(telemetry.full_topic, telemetry.full(text, readings, stale))
+        if self.publish_per_sensor:
+            for name, value in readings.items():
+                await self._publish(telemetry.topic(name), telemetry.single(text, name, value, stale.get(name)))
+        if calibrated is not None:
+            await self._publish(telemetry.calibrated_topic, telemetry.calibrated(text, calibrated))
+
+    async def _publish_validated(
+        self, readings: dict[str, int | float], timestamp: datetime, stale: dict[str, float], calibrated: dict[str, float] | None
+    ) -> None:
+        full_topic = f"/{self.pot_id}/sensors"
         # Publish full
-        full_reading = SensorReading(timestamp=timestamp, **readings)
-        await self.client.publish(full_topic, full_reading.model_dump_json())
+        if self.publish_full:
+            full_reading = SensorReading(timestamp=timestamp, stale=stale or None, **readings)
+            await self._publish(full_topic, full_reading.model_dump_json())
         # Publish individual
-        for name, value in readings.items():
-            topic = f"/{self.pot_id}/sensors/{name}"
-            individual_reading = SensorReading(timestamp=timestamp, **{name: value})
-            await self.client.publish(topic, individual_reading.model_dump_json(exclude_none=True))
+        if self.publish_per_sensor:
+            for name, value in readings.items():
+                topic = f"/{self.pot_id}/sensors/{name}"
+                age = stale.get(name)
+                individual_reading = SensorReading(timestamp=timestamp, stale={name: age} if age is not None else None, **{name: value})
+                await self._publish(topic, individual_reading.model_dump_json(exclude_none=True))
+        if calibrated is not None:
+            calibrated_reading = CalibratedReading(timestamp=timestamp, values=calibrated)
+            await self._publish(f"{full_topic}/calibrated", calibrated_reading.model_dump_json())
+
+    def _apply_rules(self, readings: dict[str, int | float], timestamp: datetime) -> None:
+        assert self.rule_engine is not None
+        for actuator, on in self.rule_engine.evaluate(readings, timestamp):
+            if self._if_use_mock_sensors:
+                logging.info(f"Rules want {actuator} {'on' if on else 'off'} (mock sensors, not actuating)")
+            elif actuator == "water_pump":
+                _ = self.sensors_controller.water_pump_on() if on else self.sensors_controller.water_pump_off()
+            else:
+                _ = self.sensors_controller.light_bulb_on() if on else self.sensors_controller.light_bulb_off()
+
+    async def _publish(self, topic: str, payload: str) -> None:
+        try:
+            with self._publish_latency.time():
+                if self.topic_aliases is None:
+                    await self.client.publish(topic, payload)
+                else:
+                    topic, properties = self.topic_aliases.resolve(topic)
+                    await self.client.publish(topic, payload, properties=properties)
+        except Exception:
+            self._publish_errors.inc()
+            if self.topic_aliases is not None:
+                # The connection may be gone, and its aliases with it
+                self.topic_aliases.reset()
+            raise
     
+    def _actuator_switched(self, actuator: str, on: bool) -> None:
+        """SensorsController listener; may be called from any thread"""
+        if self._loop is not None:
+            _ = self._loop.call_soon_threadsafe(self._apply_actuator, actuator, on)
+
+    async def follow_actuators(self) -> None:
+        """
+        Apply the actuator states the dispatcher publishes (ControlManager), until
+        the connection closes. Its controller carries out the control requests, so
+        a water_pump request only reaches the adaptive sampling this way.
+        """
+        _ = await self.client.subscribe(actuator_state_topic(self.pot_id), qos=1)
+        async for message in self.client.messages:
+            payload = message.payload
+            try:
+                if not isinstance(payload, (bytes, str)):
+                    raise ValueError(f"unexpected payload {payload!r}")
+                state = json.loads(payload)
+                self._apply_actuator(str(state["actuator"]), bool(state["on"]))
+            except (ValueError, KeyError, TypeError) as e:
+                logging.warning(f"Ignoring actuator state on {message.topic}: {e}")
+
+    def _apply_actuator(self, actuator: str, on: bool) -> None:
+        if self.adaptive is not None:
+            self._set_periods(self.adaptive.actuator(actuator, on))
+
+    def _set_periods(self, periods: dict[str, float]) -> None:
+        if not periods:
+            return
+        logging.debug("Sampling periods changed: %s", periods)
+        now = self.clock.monotonic()
+        for field, period in periods.items():
+            self.sampling_periods[field] = period
+            if self.sampling is not None:
+                self.sampling.set_period(field, period, now)
+            self.metrics.gauge("sampling_period_seconds", "Current sampling period of a sensor", sensor=field).set(period)
+        if self._wake is not None:
+            self._wake.set()
+
     async def start(self):
         print("Starting sensor publisher...")
         self.publishing = True
+        self._loop = asyncio.get_running_loop()
+        self._wake = wake = asyncio.Event()
+        # Checked every tick: apply_config() can switch between the two loops
         while self.publishing:
-            await self._publish_all_readings()
-            await asyncio.sleep(self.publish_interval.total_seconds())
+            if self.adaptive is None and len(set(self.sampling_periods.values())) == 1:
+                # One period for everything: read all sensors every tick
+                self.sampling = None
+                await self._publish_all_readings()
+                await self.clock.sleep(self.publish_interval.total_seconds())
+                continue
+
+            # Each tick reads and publishes only the sensors that are due
+            sampling = self.sampling
+            if sampling is None:
+                self.sampling = sampling = SamplingTimeline(self.sampling_periods, self.clock.monotonic())
+                for field, period in self.sampling_periods.items():
+                    self.metrics.gauge("sampling_period_seconds", "Current sampling period of a sensor", sensor=field).set(period)
+            # Cleared before the tick, so a period changed during it wakes the sleep below at once
+            wake.clear()
+            fields = sampling.pop_due(self.clock.monotonic())
+            if fields:
+                await self._publish_all_readings(fields)
+            try:
+                _ = await asyncio.wait_for(wake.wait(), max(0.0, sampling.next_due() - self.clock.monotonic()))
+            except asyncio.TimeoutError:
+                pass
     
     async def stop(self):
         self.publishing = False
@@ -75,7 +285,7 @@ class SensorPublisher:
 if __name__ == "__main__":
     import uuid
     import asyncio
-    from aiomqtt import Client
+    from aiomqtt import Client, ProtocolVersion
     import sys
     from argparse import ArgumentParser
 
@@ -83,15 +293,15 @@ if __name__ == "__main__":
         
         # CLI argument parsing
         # --help: Display help message
-        # --hostname <hostname>: Set hostname of MQTT broker (default: localhost)
-        # --port <port>: Set port of MQTT broker (default: 1883)
-        # --interval <interval_seconds>: Set interval (in seconds) between sensor readings (default: 2 seconds)
+        # --hostname <hostname>: Set hostname of MQTT broker (default: from the pot config, localhost)
+        # --port <port>: Set port of MQTT broker (default: from the pot config, 1883)
+        # --interval <interval_seconds>: Set interval (in seconds) between sensor readings (default: from the pot config, 2 seconds)
         # --mock-sensors: Publish mock sensor data, don't try to connect to actual sensors
         
         parser = ArgumentParser()
-        _ = parser.add_argument("--hostname", default="localhost", help="Set hostname of MQTT broker (default: localhost)")
-        _ = parser.add_argument("--port", type=int, default=1883, help="Set port of MQTT broker (default: 1883)")
-        _ = parser.add_argument("--interval", type=float, default=2.0, help="Set interval (in seconds) between sensor readings")
+        _ = parser.add_argument("--hostname", help="Set hostname of MQTT broker (default: from the pot config, localhost)")
+        _ = parser.add_argument("--port", type=int, help="Set port of MQTT broker (default: from the pot config, 1883)")
+        _ = parser.add_argument("--interval", type=float, help="Set interval (in seconds) between sensor readings (default: from the pot config, 2)")
         _ = parser.add_argument("--mock", action="store_true", help="Publish mock sensor data, don't try to connect to actual sensors")
         _ = parser.add_argument("--pot-id", type=str, help="Set pot ID directly; overrides id from --path if provided.")
         _ = parser.add_argument(
@@ -99,25 +309,44 @@ if __name__ == "__main__":
             help=f"Load and save pot ID from file. Skip for default as per PotConfig; '--path <path>' for custom path."
         )
         _ = parser.add_argument("--save", action="store_true", help="Save pot ID to file; if no path is provided, use default path as per PotConfig")
+        _ = parser.add_argument("--watch", action="store_true", help="Load the pot config from --path (or the default path) and apply its changes while running")
+        _ = parser.add_argument("--metrics-port", type=int, help="Serve runtime metrics on http://127.0.0.1:<port>/metrics")
+        _ = parser.add_argument("--publish-metrics", action="store_true", help="Also publish metrics to the retained /<pot_id>/metrics topic")
+        _ = parser.add_argument("--fanout", choices=["full", "per_sensor", "both"], help="Which sensor topics to publish (default: from the pot config, \"both\")")
+        _ = parser.add_argument("--topic-aliases", type=int, help="Use up to this many MQTT 5 topic aliases (connects with MQTT 5); 0 to disable")
+        _ = parser.add_argument("--validate", action="store_true", help="Validate every reading with pydantic instead of the fast telemetry encoder")
         
         args = parser.parse_args(sys.argv[1:])
         
-        hostname = str(args.hostname)
-        port = int(args.port)
-        interval = timedelta(seconds=float(args.interval))
-        if args.mock:
-            sensors_controller = None
-        else:
-            from .sensors_translation import SensorsController
-            sensors_controller = SensorsController()
-        
+        def with_overrides(pot_config: PotConfig) -> PotConfig:
+            """The pot config with the command line options over it; applied again on every reload"""
+            device = pot_config.device
+            broker = device.broker.model_copy(update={
+                key: value for key, value in (("hostname", args.hostname), ("port", args.port)) if value is not None
+            })
+            interval = timedelta(seconds=float(args.interval)) if args.interval else device.sensor_reading_interval
+            telemetry = pot_config.telemetry.model_copy(update={
+                key: value for key, value in (("fanout", args.fanout), ("topic_alias_maximum", args.topic_aliases)) if value is not None
+            })
+            return pot_config.model_copy(update={
+                "device": device.model_copy(update={"broker": broker, "sensor_reading_interval": interval}),
+                "telemetry": telemetry,
+            })
+
+        watcher = None
         provided_pot_id = UUID(args.pot_id) if args.pot_id else None
-        if provided_pot_id:
+        if args.watch:
+            from .config_watch import ConfigWatcher
+            watcher = ConfigWatcher(args.path or DEFAULT_POT_CONFIG_PATH)
+            pot_config = watcher.config
+        elif provided_pot_id:
             pot_config = PotConfig(pot_id=provided_pot_id)
         elif args.path:
             pot_config = PotConfig.load_from_file(args.path) or PotConfig()
         else:
             pot_config = PotConfig()
+        if provided_pot_id and watcher is not None:
+            pot_config.set_pot_id(provided_pot_id)
             
         if args.save:
             if args.path:
@@ -125,12 +354,72 @@ if __name__ == "__main__":
             else:
                 pot_config.save_to_file()
         
+        if args.mock:
+            sensors_controller = None
+        else:
+            from .sensors_translation import SensorsController
+            device = pot_config.device
+            sensors_controller = SensorsController(
+                deadlines=device.sensor_deadlines, max_stale_age=device.max_stale_age, pins=device.pins.model_dump()
+            )
+        
+        if args.metrics_port:
+            _ = start_metrics_server(args.metrics_port)
+        
+        def connect(pot_config: PotConfig) -> Client:
+            broker = pot_config.device.broker
+            # Topic aliases only exist in MQTT 5
+            protocol = ProtocolVersion.V5 if pot_config.telemetry.topic_alias_maximum else None
+            return Client(hostname=broker.hostname, port=broker.port, protocol=protocol)
+        
+        pot_config = with_overrides(pot_config)
+        client = connect(pot_config)
+        rule_engine = RuleEngine(pot_config.rules) if pot_config.rules else None
+        calibrator = Calibrator(pot_config.calibration) if pot_config.calibration else None
+        filters = FilterBank(pot_config.filters) if pot_config.filters else None
+        publisher = SensorPublisher(
+            client, pot_config.device.sensor_reading_interval, pot_config, sensors_controller,
+            rule_engine=rule_engine, calibrator=calibrator, filters=filters, validate=args.validate
+        )
         
+        reconnect = asyncio.Event()
+        if watcher is not None:
+            def on_config_changed(old: PotConfig, new: PotConfig) -> None:
+                previous = publisher.pot_config
+                if provided_pot_id:
+                    new.set_pot_id(provided_pot_id)
+                publisher.apply_config(with_overrides(new))
+                # Topic aliases only exist in MQTT 5, so turning them on or off needs a new connection too
+                if (publisher.pot_config.device.broker != previous.device.broker
+                        or bool(publisher.pot_config.telemetry.topic_alias_maximum) != bool(previous.telemetry.topic_alias_maximum)):
+                    reconnect.set()
+            watcher.listeners.append(on_config_changed)
+            _ = asyncio.create_task(watcher.watch())
         
-        client = Client(hostname=hostname, port=port)
-        publisher = SensorPublisher(client, interval, pot_config, sensors_controller)
-        async with client:
-            task = asyncio.create_task(publisher.start())
-            await task  # Or, if you want to run other things, you can await asyncio.sleep() or similar
+        while True:
+            async with client:
+                metrics_task = None
+                if args.publish_metrics:
+                    metrics_task = asyncio.create_task(MetricsPublisher(client, pot_config.get_pot_id()).start())
+                task = asyncio.create_task(publisher.start())
+                follow = asyncio.create_task(publisher.follow_actuators())
+                changed = asyncio.create_task(reconnect.wait())
+                done, _ = await asyncio.wait({task, changed}, return_when=asyncio.FIRST_COMPLETED)
+                if metrics_task is not None:
+                    _ = metrics_task.cancel()
+                _ = follow.cancel()
+                if task in done:
+                    _ = changed.cancel()
+                    task.result()
+                    return
+                _ = task.cancel()
+            reconnect.clear()
+            broker = publisher.pot_config.device.broker
+            logging.info(f"Reconnecting to {broker.hostname}:{broker.port}")
+            client = connect(publisher.pot_config)
+            publisher.client = client
+            if publisher.topic_aliases is not None:
+                # The new connection knows none of the old aliases
+                publisher.topic_aliases.reset()
 
     asyncio.run(main())
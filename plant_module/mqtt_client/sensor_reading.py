@@ -1,6 +1,8 @@
 from datetime import datetime
 from pydantic import BaseModel, Field, TypeAdapter
 
+from .startup import LAZY_STARTUP
+
 class SensorReading(BaseModel):
     timestamp: datetime = Field(..., description="Timestamp of the reading")
     air_quality_sensor: int | None = Field(None, ge=0, le=1023)
@@ -9,8 +11,12 @@ class SensorReading(BaseModel):
     air_humidity_sensor: int | None = Field(None, ge=0, le=100)
     soil_moisture_sensor: int | None = Field(None, ge=0, le=1023)
     water_level_sensor: float | None = Field(None, ge=0, le=30)
+    stale: dict[str, float] | None = Field(
+        None, description="Age in seconds of the fields that repeat their last good value because the sensor failed or missed its deadline"
+    )
 
     model_config = {
+        "defer_build": LAZY_STARTUP,
         "json_schema_extra": {
             "minProperties": 2,  # timestamp + at least one sensor
             "examples": [
@@ -44,6 +50,22 @@ class SensorReading(BaseModel):
         )
     '''
 
+class CalibratedReading(BaseModel):
+    timestamp: datetime = Field(..., description="Timestamp of the raw reading the values were converted from")
+    values: dict[str, float] = Field(..., description="Physical quantities by name, e.g. soil_vwc_percent (see calibration.py)")
+
+    model_config = {
+        "defer_build": LAZY_STARTUP,
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "timestamp": "2024-06-01T12:00:00Z",
+                    "values": {"soil_vwc_percent": 31.5, "light_lux": 420.0, "tank_fill_percent": 59.1}
+                }
+            ]
+        }
+    }
+
 if __name__ == "__main__":
     import json
 
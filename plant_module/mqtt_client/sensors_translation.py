@@ -1,25 +1,181 @@
 '''
 This module provides higher level abstraction functions for polling sensors and controlling actuators.
+
+Every sensor is read on its own worker thread with a time budget (its deadline),
+so one failing sensor can't ruin a whole reading: a read that raises, returns a
+value outside the SensorReading bounds (the DHT11's (-1, -1)) or doesn't finish
+in time is replaced by the last good value, whose age is reported in
+SensorsController.stale_ages, or left out of the reading. A read that hangs keeps
+its worker busy; later ticks don't queue more reads behind it and keep falling
+back until it returns, and then its values become the last good ones (an HC-SR04
+echo that never comes gives up after distance_sensor.ECHO_TIMEOUT). The three
+analog channels share the MCP3008 on one SPI bus and are read together.
 '''
 
 import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Any, Callable, Collection, Literal, Mapping
+
+import GPIO_python.air_temp_moisture as atm_sensors
+import GPIO_python.analog_inputs as analog_inputs
+import GPIO_python.distance_sensor as water_level_sensor
+from GPIO_python.analog_inputs import Channel
+from GPIO_python.actuator import Transition
+from GPIO_python.motor import PWM_PIN, Motor
+from GPIO_python.relay import RELAY_PIN, Relay
+from GPIO_python.sensor_bus import SensorBus
+from plant_module.mqtt_client.metrics import REGISTRY, Counter, Histogram, MetricsRegistry
+from plant_module.mqtt_client import tracing
+
+if TYPE_CHECKING:
+    # Annotations only; importing this module still doesn't import pydantic
+    from plant_module.mqtt_client.device_config import SensorGroup
+
+# Seconds each sensor group may take per reading
+DEFAULT_SENSOR_DEADLINES: dict[str, float] = {
+    "air_sensor": 1.0, # DHT11 through the IIO driver
+    "analog_sensors": 0.1, # MCP3008 soil moisture, air quality and light channels
+    "water_level_sensor": 0.15, # HC-SR04: 50 ms settle plus at most ~40 ms of echo
+}
+# MCP3008 channel of every analog field; each is a separate SPI transfer
+ANALOG_CHANNELS: dict[str, Channel] = {
+    "soil_moisture_sensor": Channel.SOIL_MOISTURE_SENSOR,
+    "air_quality_sensor": Channel.GAS_QUALITY_SENSOR,
+    "light_sensor": Channel.LIGHT_SENSOR,
+}
+# How long a last good value may stand in for a failing sensor
+DEFAULT_MAX_STALE_AGE = 300.0
+
+
+def _sensor_bounds() -> dict[str, tuple[float, float]]:
+    '''The ge/le bounds of every sensor field of SensorReading'''
+    # Imported here so that importing this module doesn't import pydantic
+    from plant_module.mqtt_client.sensor_reading import SensorReading
+
+    bounds: dict[str, tuple[float, float]] = {}
+    for field, info in SensorReading.model_fields.items():
+        if field in ("timestamp", "stale"):
+            continue
+        low, high = float("-inf"), float("inf")
+        for constraint in info.metadata:
+            low = getattr(constraint, "ge", low)
+            high = getattr(constraint, "le", high)
+        bounds[field] = (low, high)
+    return bounds
 
 
+class _SensorWorker:
+    '''Runs the reads of one sensor group on its own daemon thread, one at a time'''
+    def __init__(
+        self,
+        name: str,
+        fields: tuple[str, ...],
+        read: Callable[[frozenset[str]], dict[str, int | float]],
+        accept: Callable[[dict[str, int | float]], dict[str, int | float]],
+    ) -> None:
+        self.name: str = name
+        # Fields the group's read returns
+        self.fields: tuple[str, ...] = fields
+        # Called with the fields that are wanted; may return more of its own
+        self.read: Callable[[frozenset[str]], dict[str, int | float]] = read
+        # Called on the worker thread with every result, also one that comes after
+        # its deadline; the future's result is what it returns
+        self.accept: Callable[[dict[str, int | float]], dict[str, int | float]] = accept
+        self._requests: queue.SimpleQueue[tuple[Future[dict[str, int | float]], frozenset[str]] | None] = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._pending: Future[dict[str, int | float]] | None = None
+
+    def submit(self, fields: frozenset[str]) -> Future[dict[str, int | float]]:
+        '''Start a read of ``fields``, or return the read still running'''
+        if self._pending is not None and not self._pending.done():
+            return self._pending
+        future: Future[dict[str, int | float]] = Future()
+        self._pending = future
+        self._requests.put((future, fields))
+        if self._thread is None:
+            # Daemon, so a read that never returns can't keep the process alive
+            self._thread = threading.Thread(target=self._run, name=f"sensor-{self.name}", daemon=True)
+            self._thread.start()
+        return future
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._requests.put(None)
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            request = self._requests.get()
+            if request is None:
+                return
+            future, fields = request
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self.accept(self.read(fields)))
+            except BaseException as e:
+                future.set_exception(e)
+
 
 class SensorsController:
-    def __init__(self):
-        from GPIO_python.motor import MotorThread
-        from GPIO_python.relay import RelayThread
-        self.water_pump: MotorThread = MotorThread()
-        self.light_bulb: RelayThread = RelayThread()
+    def __init__(
+        self,
+        metrics: MetricsRegistry = REGISTRY,
+        bus: SensorBus | None = None,
+        deadlines: 'Mapping[SensorGroup, float] | None' = None,
+        stale_fallback: Literal["last", "omit"] = "last",
+        max_stale_age: float = DEFAULT_MAX_STALE_AGE,
+        pins: dict[str, int] | None = None,
+    ):
+        # water_pump, light_bulb, ultrasonic_trigger, ultrasonic_echo -> BCM pin, over the GPIO_python defaults
+        pins = pins or {}
+        self.water_pump: Motor = Motor(pin=pins.get("water_pump", PWM_PIN))
+        self.light_bulb: Relay = Relay(pin=pins.get("light_bulb", RELAY_PIN))
+        self._ultrasonic_pins: tuple[int, int] = (
+            pins.get("ultrasonic_trigger", water_level_sensor.TRIG_PIN),
+            pins.get("ultrasonic_echo", water_level_sensor.ECHO_PIN),
+        )
         self._running: bool = False
         self._water_pump_running: bool = False
         self._light_bulb_running: bool = False
+        self.metrics: MetricsRegistry = metrics
+        # If set, every value is published here as soon as it is read
+        self.bus: SensorBus | None = bus
+        self._per_sensor_metrics: dict[str, tuple[Histogram, Counter]] = {}
+        # Called with (actuator, on) whenever the pump or light is switched, from the switching thread
+        self.actuator_listeners: list[Callable[[str, bool], None]] = []
+        # Sensor group -> seconds its read may take (see DEFAULT_SENSOR_DEADLINES)
+        self.deadlines: dict[str, float] = {**DEFAULT_SENSOR_DEADLINES, **deadlines} if deadlines else dict(DEFAULT_SENSOR_DEADLINES)
+        # What a failed or late field becomes: its last good value, or nothing
+        self.stale_fallback: Literal["last", "omit"] = stale_fallback
+        self.max_stale_age: float = max_stale_age
+        # Field -> (last good value, time.monotonic() when it was read)
+        self._last_good: dict[str, tuple[int | float, float]] = {}
+        # Field -> age in seconds, for the fields of the last reading that are stale values
+        self.stale_ages: dict[str, float] = {}
+        self._workers: list[_SensorWorker] = [
+            _SensorWorker("air_sensor", ("temperature_sensor", "air_humidity_sensor"), self._read_air_sensor, self._accept),
+            _SensorWorker("analog_sensors", tuple(ANALOG_CHANNELS), self._read_analog_sensors, self._accept),
+            _SensorWorker("water_level_sensor", ("water_level_sensor",), self._read_water_level, self._accept),
+        ]
+        self._bounds: dict[str, tuple[float, float]] = _sensor_bounds()
+        self._actuator_latency: Histogram = metrics.histogram(
+            "actuator_apply_latency_seconds", "Time from an actuator command to the GPIO write"
+        )
+        self.water_pump.driver.listeners.append(self._on_transition)
 
 
     def __del__(self):
         self.close()
 
+    def set_limits(self, deadlines: 'Mapping[SensorGroup, float]', max_stale_age: float) -> None:
+        '''Replace the read deadlines (over DEFAULT_SENSOR_DEADLINES) and max_stale_age; used from the next reading on'''
+        self.deadlines = {**DEFAULT_SENSOR_DEADLINES, **deadlines}
+        self.max_stale_age = max_stale_age
+
     def setup(self) -> bool:
         if self._running:
             logging.warning("SensorsController is already running")
@@ -38,41 +194,148 @@ class SensorsController:
             return False
 
     def close(self) -> bool:
+        for worker in self._workers:
+            worker.stop()
         try:
             self.water_pump.stop()
             self.light_bulb.stop()
+            if self._on_transition in self.water_pump.driver.listeners:
+                self.water_pump.driver.listeners.remove(self._on_transition)
             self._running = False
             return True
         except Exception as e:
             logging.error(f"An unexpected error occurred during close: {e}")
             return False
 
-    def get_sensor_reading(self) -> dict[str, int | float] | None:
-        import GPIO_python.air_temp_moisture as atm_sensors
-        import GPIO_python.analog_inputs as analog_inputs
-        import GPIO_python.distance_sensor as water_level_sensor
-        from GPIO_python.analog_inputs import Channel
+    def get_sensor_reading(self, fields: Collection[str] | None = None) -> dict[str, int | float] | None:
+        """
+        Read every sensor, or only those of ``fields``, each within its deadline.
+        Only the hardware behind the wanted fields is touched. The DHT11 always
+        reads both of its values; an unwanted one still goes to the bus and
+        becomes the last good value, but isn't returned.
+
+        Fields whose read failed, returned an out-of-range value or missed the
+        deadline hold their last good value (listed with its age in ``stale_ages``)
+        or, with ``stale_fallback="omit"`` or once that value is older than
+        ``max_stale_age``, are missing from the result.
+        """
         if not self._running:
             logging.error("SensorsController is not running")
             return None
 
-        (temperature, air_humidity) = atm_sensors.read_air_sensor_data()
-        soil_moisture = analog_inputs.read_channel(Channel.SOIL_MOISTURE_SENSOR)
-        air_quality = analog_inputs.read_channel(Channel.GAS_QUALITY_SENSOR)
-        light_level = analog_inputs.read_channel(Channel.LIGHT_SENSOR)
-        water_level = water_level_sensor.get_distance()
-
-        readings = {
-            "air_humidity_sensor": air_humidity,
-            "soil_moisture_sensor": int(soil_moisture),
-            "air_quality_sensor": int(air_quality),
-            "light_sensor": int(light_level),
-            "water_level_sensor": water_level,
-            "temperature_sensor": temperature
-        }
+        wanted = frozenset(self._bounds if fields is None else fields)
+        started = time.monotonic()
+        # All groups are read in parallel; the slowest deadline bounds the tick
+        futures = [(worker, worker.submit(wanted)) for worker in self._workers if not wanted.isdisjoint(worker.fields)]
+        readings: dict[str, int | float] = {}
+        self.stale_ages = {}
+        for worker, future in futures:
+            deadline = started + self.deadlines.get(worker.name, 1.0)
+            try:
+                values = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except TimeoutError as e:
+                if future.done() and future.exception() is not None:
+                    # concurrent.futures.TimeoutError is the builtin one, so this is
+                    # the read's own error (get_distance() without an echo), not the deadline
+                    logging.warning(f"{worker.name} read failed: {e}")
+                else:
+                    logging.warning(f"{worker.name} missed its {self.deadlines.get(worker.name, 1.0)} s deadline")
+                    self._read_timeouts(worker.name).inc()
+                values = {}
+            except Exception as e:
+                logging.warning(f"{worker.name} read failed: {e}")
+                values = {}
+            readings.update((field, value) for field, value in values.items() if field in wanted)
 
+        for field in wanted:
+            if field not in readings and field in self._bounds:
+                self._fall_back(field, readings)
         return readings
 
+    def _accept(self, values: dict[str, int | float]) -> dict[str, int | float]:
+        """
+        The in-range values of a read, remembered as the last good ones and published
+        to the bus. Runs on the worker thread, so a read that missed its deadline
+        still updates them when it returns.
+        """
+        now = time.monotonic()
+        good: dict[str, int | float] = {}
+        for field, value in values.items():
+            low, high = self._bounds[field]
+            if low <= value <= high:
+                good[field] = value
+                self._last_good[field] = (value, now)
+            else:
+                self._rejected_values(field).inc()
+        if good and self.bus is not None:
+            self.bus.publish(**good)
+        return good
+
+    def _fall_back(self, field: str, readings: dict[str, int | float]) -> None:
+        last = self._last_good.get(field)
+        if self.stale_fallback == "omit" or last is None:
+            return
+        value, read_at = last
+        age = time.monotonic() - read_at
+        if age <= self.max_stale_age:
+            readings[field] = value
+            self.stale_ages[field] = age
+
+    def _read_air_sensor(self, fields: frozenset[str]) -> dict[str, int | float]:
+        temperature, air_humidity = self._timed_read("air_sensor", atm_sensors.read_air_sensor_data)
+        if (temperature, air_humidity) == (-1, -1):
+            # The DHT11 read failed; _accept() rejects the values as out of range
+            self._sensor_metrics("air_sensor")[1].inc()
+        return {"temperature_sensor": temperature, "air_humidity_sensor": air_humidity}
+
+    def _read_analog_sensors(self, fields: frozenset[str]) -> dict[str, int | float]:
+        return {
+            field: int(self._timed_read(field, analog_inputs.read_channel, channel))
+            for field, channel in ANALOG_CHANNELS.items()
+            if field in fields
+        }
+
+    def _read_water_level(self, fields: frozenset[str]) -> dict[str, int | float]:
+        return {"water_level_sensor": self._timed_read("water_level_sensor", water_level_sensor.get_distance, *self._ultrasonic_pins)}
+
+    def _read_timeouts(self, sensor: str) -> Counter:
+        return self.metrics.counter("sensor_read_timeouts_total", "Sensor reads that missed their deadline", sensor=sensor)
+
+    def _rejected_values(self, field: str) -> Counter:
+        return self.metrics.counter("sensor_values_rejected_total", "Sensor values outside the SensorReading bounds", field=field)
+
+    def _notify_actuator(self, actuator: str, on: bool) -> None:
+        for listener in self.actuator_listeners:
+            try:
+                listener(actuator, on)
+            except Exception as e:
+                logging.error(f"Actuator listener failed: {e}")
+
+    def _on_transition(self, transition: Transition) -> None:
+        self._actuator_latency.observe(transition.latency_ns / 1e9)
+
+    def _timed_read(self, sensor: str, read: Callable[..., Any], *args: Any) -> Any:
+        """Call a sensor read function, recording its duration and counting exceptions"""
+        duration, failures = self._sensor_metrics(sensor)
+        start = time.perf_counter()
+        try:
+            return read(*args)
+        except Exception:
+            failures.inc()
+            raise
+        finally:
+            duration.observe(time.perf_counter() - start)
+
+    def _sensor_metrics(self, sensor: str) -> tuple[Histogram, Counter]:
+        metrics = self._per_sensor_metrics.get(sensor)
+        if metrics is None:
+            metrics = (
+                self.metrics.histogram("sensor_read_duration_seconds", "Duration of a single sensor read", sensor=sensor),
+                self.metrics.counter("sensor_read_failures_total", "Failed sensor reads", sensor=sensor),
+            )
+            self._per_sensor_metrics[sensor] = metrics
+        return metrics
+
     def water_pump_on(self) -> bool:
         if not self._running:
             logging.error("SensorsController is not running")
@@ -83,8 +346,10 @@ class SensorsController:
             return False
 
         logging.info("Turning water pump on")
-        self.water_pump.turn_on()
+        with tracing.span("actuator_handoff", actuator="water_pump", command="on"):
+            self.water_pump.turn_on()
         self._water_pump_running = True
+        self._notify_actuator("water_pump", True)
         return True
 
     def water_pump_off(self) -> bool:
@@ -97,8 +362,10 @@ class SensorsController:
             return False
         
         logging.info("Turning water pump off")
-        self.water_pump.turn_off()
+        with tracing.span("actuator_handoff", actuator="water_pump", command="off"):
+            self.water_pump.turn_off()
         self._water_pump_running = False
+        self._notify_actuator("water_pump", False)
         return True
 
     def light_bulb_on(self) -> bool:
@@ -111,8 +378,10 @@ class SensorsController:
             return False
 
         logging.info("Turning light bulb on")
-        self.light_bulb.turn_on()
+        with tracing.span("actuator_handoff", actuator="light_bulb", command="on"):
+            self.light_bulb.turn_on()
         self._light_bulb_running = True
+        self._notify_actuator("light_bulb", True)
         return True
 
     def light_bulb_off(self) -> bool:
@@ -125,6 +394,8 @@ class SensorsController:
             return False
 
         logging.info("Turning light bulb off")
-        self.light_bulb.turn_off()
+        with tracing.span("actuator_handoff", actuator="light_bulb", command="off"):
+            self.light_bulb.turn_off()
         self._light_bulb_running = False
+        self._notify_actuator("light_bulb", False)
         return True
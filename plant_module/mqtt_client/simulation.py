@@ -0,0 +1,100 @@
+'''
+Replay the device on simulated hardware and a virtual clock.
+
+Wires a GPIO_python.simulated.SimulatedBackend and a VirtualClock together,
+builds a real SensorsController, Scheduler and SensorPublisher on top of them
+and runs for a number of simulated days. Publishes go to a RecordingClient
+instead of a broker, so no Pi and no Mosquitto are needed.
+
+Run from the repository root:
+    python -m plant_module.mqtt_client.simulation --days 7
+'''
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Any, TextIO
+
+from GPIO_python.backend import set_backend
+from GPIO_python.simulated import SimulatedBackend
+
+from .clock import VirtualClock
+from .pot_config import PotConfig
+from .schedule import Scheduler, ScheduledEvent
+from .sensor_publisher import SensorPublisher
+from .sensors_translation import SensorsController
+
+
+class RecordingClient:
+    """Stands in for aiomqtt.Client: counts publishes and optionally logs them as JSON lines"""
+    def __init__(self, log: TextIO | None = None) -> None:
+        self.log: TextIO | None = log
+        self.messages: int = 0
+        self.bytes: int = 0
+
+    async def publish(self, topic: str, payload: Any = None, qos: int = 0, retain: bool = False, **kwargs: Any) -> None:
+        data = payload if isinstance(payload, (bytes, bytearray)) else str(payload).encode()
+        self.messages += 1
+        self.bytes += len(topic) + len(data)
+        if self.log is not None:
+            _ = self.log.write(json.dumps({"topic": topic, "payload": data.decode(errors="replace")}) + "\n")
+
+
+def next_time_of_day(now: datetime, hour: int, minute: int = 0) -> datetime:
+    candidate = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    return candidate if candidate > now else candidate + timedelta(days=1)
+
+
+async def simulate(days: float, interval: timedelta, clock: VirtualClock, client: RecordingClient) -> dict[str, Any]:
+    backend = SimulatedBackend(time_source=clock.monotonic, sleep=clock.advance)
+    set_backend(backend)
+    controller = SensorsController()
+    _ = controller.setup()
+
+    scheduler = Scheduler(clock=clock)
+    # Daily watering at 06:00 and light between 20:00 and 22:00
+    start = clock.now()
+    await scheduler.add_event(ScheduledEvent(next_time_of_day(start, 6), controller.water_pump_on, timedelta(days=1)))
+    await scheduler.add_event(ScheduledEvent(next_time_of_day(start, 6) + timedelta(seconds=5), controller.water_pump_off, timedelta(days=1)))
+    await scheduler.add_event(ScheduledEvent(next_time_of_day(start, 20), controller.light_bulb_on, timedelta(days=1)))
+    await scheduler.add_event(ScheduledEvent(next_time_of_day(start, 22), controller.light_bulb_off, timedelta(days=1)))
+    scheduler.start()
+
+    publisher = SensorPublisher(client, interval, PotConfig(), controller, clock=clock)  # pyright: ignore[reportArgumentType]
+    publisher_task = asyncio.create_task(publisher.start())
+
+    await asyncio.sleep(days * 24 * 3600)
+
+    await publisher.stop()
+    await publisher_task
+    await scheduler.stop()
+    _ = controller.close()
+    set_backend(None)
+    return {
+        "simulated_from": start.isoformat(),
+        "simulated_to": clock.now().isoformat(),
+        "messages": client.messages,
+        "bytes": client.bytes,
+        "pin_transitions": len(backend.history),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay the device on simulated hardware")
+    _ = parser.add_argument("--days", type=float, default=7.0, help="Simulated days to run (default: 7)")
+    _ = parser.add_argument("--interval", type=float, default=2.0, help="Sensor publish interval in seconds (default: 2)")
+    _ = parser.add_argument("--speed", type=float, help="Run at this multiple of real time instead of as fast as possible")
+    _ = parser.add_argument("--log", help="Write every publish to this file as JSON lines")
+    args = parser.parse_args()
+
+    log = open(args.log, "w") if args.log else None
+    clock = VirtualClock(speed=args.speed)
+    wall_start = time.perf_counter()
+    try:
+        summary = clock.run(simulate(args.days, timedelta(seconds=args.interval), clock, RecordingClient(log)))
+    finally:
+        if log is not None:
+            log.close()
+    summary["wall_seconds"] = time.perf_counter() - wall_start
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,17 @@
+'''
+Cold-start behaviour.
+
+With lazy startup (the default) the pydantic models are declared with
+``defer_build`` so their validators are built on first use instead of at import,
+and the shared TypeAdapters are created on first call. Set
+``PLANT_LAZY_STARTUP=0`` to build everything at import instead, which moves
+the cost from the first message to boot, or call pot_config.warm_up() once
+the device is idle.
+
+Hardware is always initialised lazily by GPIO_python.backend: RPi.GPIO is
+imported when the backend is first needed and SPI is opened on the first read.
+'''
+import os
+
+LAZY_STARTUP: bool = os.environ.get("PLANT_LAZY_STARTUP", "1") != "0"
+
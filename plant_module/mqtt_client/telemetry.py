@@ -0,0 +1,238 @@
+'''
+Fast encoding of the telemetry SensorPublisher sends every tick.
+
+The readings come from our own SensorsController, which already rejects values
+outside the SensorReading bounds, so building and validating a pydantic model
+per message only costs time. TelemetryEncoder writes the same JSON directly:
+
+    - topics are formatted once per pot: /<pot_id>/sensors, one per sensor
+      field and /<pot_id>/sensors/calibrated
+    - the key prefixes of every field (',"light_sensor":' and so on) are built
+      once, from SensorReading's own field list, so a new field in the model
+      shows up in the payloads without touching this file
+    - per message only the timestamp and the numbers are formatted and joined
+
+SensorReading and CalibratedReading stay the contract: the payloads are what
+model_dump_json() of the equivalent model returns (full readings with every
+field, null included; individual readings without the None fields), byte for
+byte, floats formatted like pydantic formats them. telemetry_test.py compares
+the two for every payload kind and floats of every magnitude; check_contract()
+validates payloads against the models, which the telemetry benchmark does on
+every sample it encodes.
+
+How much goes on the wire is set per deployment (PotConfig.telemetry):
+    - fanout: "both" sends the full reading on /<pot_id>/sensors and every value
+      on its own /<pot_id>/sensors/<field> topic, "full" only the former and
+      "per_sensor" only the latter
+    - topic_alias_maximum: with MQTT 5, the first message on a topic carries it
+      together with a topic alias number and every later one sends only the
+      number, so the UUID-heavy topic crosses the network once per connection.
+      Aliases are per connection and the broker caps how many a client may use
+      (Topic Alias Maximum in its CONNACK, 10 by default in Mosquitto), so set
+      it to at most that; 0 turns aliases off (and is the only choice with
+      MQTT 3.1.1).
+    - periods and adaptive: how often each sensor is read and published, fixed
+      or following the signal and the actuators, see sampling.py
+'''
+import math
+from datetime import datetime, timedelta
+from typing import Any, Callable, Literal, Mapping, get_args
+from uuid import UUID
+
+from pydantic import BaseModel, Field, model_validator
+
+from .control_rules import SensorField
+from .sampling import AdaptiveSamplingSpec
+from .sensor_reading import CalibratedReading, SensorReading
+from .startup import LAZY_STARTUP
+
+Number = int | float
+Fanout = Literal["full", "per_sensor", "both"]
+
+
+class TelemetryConfig(BaseModel):
+    fanout: Fanout = "both" # which of the full and per-sensor messages to send
+    topic_alias_maximum: int = Field(default=0, ge=0, le=65535) # MQTT 5 topic aliases to use, 0 for none
+    periods: dict[SensorField, timedelta] = Field(default_factory=dict) # sampling period per sensor, see sampling.py
+    adaptive: dict[SensorField, AdaptiveSamplingSpec] = Field(default_factory=dict) # periods that follow activity, see sampling.py
+    model_config = {"defer_build": LAZY_STARTUP}
+
+    @model_validator(mode="after")
+    def _check_periods(self):
+        if any(period <= timedelta(0) for period in self.periods.values()):
+            raise ValueError("Sampling periods must be positive")
+        return self
+
+SENSOR_FIELDS: tuple[str, ...] = tuple(
+    field for field in SensorReading.model_fields if field not in ("timestamp", "stale")
+)
+
+
+def encode_timestamp(timestamp: datetime) -> str:
+    '''ISO 8601 as pydantic writes it: like isoformat(), but UTC is "Z"'''
+    text = timestamp.isoformat()
+    if timestamp.utcoffset() == timedelta(0):
+        return text[:-6] + "Z"
+    return text
+
+
+def _number(value: Number) -> str:
+    '''A value of an int field: ints as they are, and whole floats as ints, like pydantic'''
+    if type(value) is int:
+        return int.__repr__(value)
+    if math.isfinite(value) and float(value).is_integer():
+        return int.__repr__(int(value))
+    return _float(value)
+
+
+def _float(value: Number) -> str:
+    '''A value of a float field, ints included (12 -> 12.0), like pydantic'''
+    if not math.isfinite(value):
+        raise ValueError(f"Can't encode {value} as JSON")
+    text = float.__repr__(float(value))
+    if "e-" in text:
+        return _small_float(text)
+    return text
+
+
+def _small_float(text: str) -> str:
+    '''
+    A repr() with a negative exponent the way pydantic writes it: the exponent
+    without zero padding (1e-07 -> 1e-7), and plain digits for exponent -5
+    (1.5e-05 -> 0.000015). Positive exponents are already the same.
+    '''
+    mantissa, exponent = text.split("e")
+    if exponent != "-05":
+        return f"{mantissa}e{int(exponent)}"
+    sign = "-" if mantissa.startswith("-") else ""
+    return sign + "0.0000" + mantissa.lstrip("-").replace(".", "")
+
+
+def _string(text: str) -> str:
+    '''JSON string literal; the keys are our own identifiers, so only quotes and backslashes need escaping'''
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _object(values: Mapping[str, float]) -> str:
+    return "{" + ",".join(_string(key) + ":" + _float(value) for key, value in values.items()) + "}"
+
+
+class TelemetryEncoder:
+    def __init__(self, pot_id: UUID | str) -> None:
+        self.full_topic: str = f"/{pot_id}/sensors"
+        self.calibrated_topic: str = f"{self.full_topic}/calibrated"
+        self.field_topics: dict[str, str] = {field: f"{self.full_topic}/{field}" for field in SENSOR_FIELDS}
+        # ,"<field>": for every field, in the model's order
+        self._prefixes: dict[str, str] = {field: f',"{field}":' for field in SENSOR_FIELDS}
+        # How each field's values are written: float fields always as floats
+        self._formats: dict[str, Callable[[Number], str]] = {
+            field: _float if float in get_args(SensorReading.model_fields[field].annotation) else _number
+            for field in SENSOR_FIELDS
+        }
+        self._full_keys: tuple[tuple[str, str, Callable[[Number], str]], ...] = tuple(
+            (field, prefix, self._formats[field]) for field, prefix in self._prefixes.items()
+        )
+
+    def topic(self, field: str) -> str:
+        topic = self.field_topics.get(field)
+        if topic is None:
+            # Not a SensorReading field; format it like the old path did
+            topic = self.field_topics[field] = f"{self.full_topic}/{field}"
+        return topic
+
+    def full(self, timestamp: str, readings: Mapping[str, Number | None], stale: Mapping[str, float] | None = None) -> str:
+        """
+        SensorReading(timestamp=..., stale=stale, **readings).model_dump_json(),
+        with ``timestamp`` already formatted by encode_timestamp()
+        """
+        parts = ['{"timestamp":"', timestamp, '"']
+        get = readings.get
+        for field, prefix, format in self._full_keys:
+            value = get(field)
+            parts.append(prefix)
+            parts.append("null" if value is None else format(value))
+        parts.append(',"stale":')
+        parts.append(_object(stale) if stale else "null")
+        parts.append("}")
+        return "".join(parts)
+
+    def single(self, timestamp: str, field: str, value: Number | None, age: float | None = None) -> str:
+        """SensorReading(timestamp=..., **{field: value}).model_dump_json(exclude_none=True), with the field's stale age if any"""
+        payload = '{"timestamp":"' + timestamp + '"'
+        if value is not None:
+            payload += self._prefixes.get(field) or "," + _string(field) + ":"
+            payload += self._formats.get(field, _number)(value)
+        if age is not None:
+            payload += ',"stale":{' + _string(field) + ":" + _float(age) + "}"
+        return payload + "}"
+
+    def calibrated(self, timestamp: str, values: Mapping[str, float]) -> str:
+        """CalibratedReading(timestamp=..., values=values).model_dump_json()"""
+        return '{"timestamp":"' + timestamp + '","values":' + _object(values) + "}"
+
+    def check_contract(
+        self,
+        timestamp: datetime,
+        readings: Mapping[str, Number | None],
+        stale: dict[str, float] | None = None,
+        calibrated: dict[str, float] | None = None,
+    ) -> None:
+        """
+        Raise ValueError unless the payloads for this tick validate as
+        SensorReading/CalibratedReading and decode to the same models that the
+        validated path would have built.
+        """
+        text = encode_timestamp(timestamp)
+        expected: list[tuple[str, Any, Any]] = [
+            (self.full(text, readings, stale), SensorReading, SensorReading.model_validate({"timestamp": timestamp, "stale": stale or None, **readings})),
+        ]
+        for field, value in readings.items():
+            age = stale.get(field) if stale else None
+            expected.append((
+                self.single(text, field, value, age),
+                SensorReading,
+                SensorReading.model_validate({"timestamp": timestamp, "stale": {field: age} if age is not None else None, field: value}),
+            ))
+        if calibrated is not None:
+            expected.append((self.calibrated(text, calibrated), CalibratedReading, CalibratedReading(timestamp=timestamp, values=calibrated)))
+        for payload, model, reference in expected:
+            decoded = model.model_validate_json(payload)
+            if decoded != reference:
+                raise ValueError(f"Fast telemetry payload {payload} doesn't match {reference.model_dump_json()}")
+
+
+class TopicAliases:
+    """
+    MQTT 5 topic aliases of one connection. Topics get the numbers 1..maximum
+    in the order they are first published; topics after that are sent in full.
+    """
+    def __init__(self, maximum: int) -> None:
+        # paho comes with aiomqtt; only needed once aliases are in use
+        from paho.mqtt.packettypes import PacketTypes
+        from paho.mqtt.properties import Properties
+
+        self.maximum: int = maximum
+        self._properties: type[Properties] = Properties
+        self._publish_packet: int = PacketTypes.PUBLISH
+        # topic -> PUBLISH properties carrying its alias
+        self._aliases: dict[str, Any] = {}
+        # topics whose alias the broker already knows on this connection
+        self._sent: set[str] = set()
+
+    def resolve(self, topic: str) -> tuple[str, Any | None]:
+        """The topic to put in the PUBLISH packet (empty once aliased) and its properties"""
+        properties = self._aliases.get(topic)
+        if properties is None:
+            if len(self._aliases) >= self.maximum:
+                return topic, None
+            properties = self._properties(self._publish_packet)
+            properties.TopicAlias = len(self._aliases) + 1
+            self._aliases[topic] = properties
+        if topic in self._sent:
+            return "", properties
+        self._sent.add(topic)
+        return topic, properties
+
+    def reset(self) -> None:
+        """Forget which aliases the broker knows, e.g. after the connection dropped"""
+        self._sent.clear()
@@ -0,0 +1,82 @@
+import random
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+from plant_module.mqtt_client.sensor_reading import CalibratedReading, SensorReading
+from plant_module.mqtt_client.telemetry import SENSOR_FIELDS, TelemetryEncoder, encode_timestamp
+
+ENCODER = TelemetryEncoder(UUID("b07dd10f-9a47-4624-8ff1-b4dde531d833"))
+TIMESTAMPS = [
+    datetime(2026, 1, 1, 12, 0, 0),
+    datetime(2026, 1, 1, 12, 0, 0, 123456),
+    datetime(2026, 1, 1, 12, 0, 0, tzinfo=timezone.utc),
+    datetime(2026, 1, 1, 12, 0, 0, 5000, tzinfo=timezone(timedelta(hours=2))),
+]
+
+
+def floats(rng: random.Random, count: int) -> list[float]:
+    '''Floats of every magnitude and sign, plus the edges of repr()'s formats'''
+    values = [0.0, -0.0, 1e-5, 1.5e-5, -1e-5, 9.99e-5, 1e-4, 1e-6, 1e-7, 1e15, 1e16, 1e17, 5e-324, 1.7976931348623157e308]
+    for _ in range(count):
+        values.append(rng.choice((-1, 1)) * rng.random() * 10 ** rng.randint(-300, 300))
+        values.append(round(rng.uniform(0, 30), rng.randint(0, 6)))
+    return values
+
+
+def test_full_matches_model_dump_json():
+    rng = random.Random(0)
+    for timestamp in TIMESTAMPS:
+        for _ in range(200):
+            readings = {
+                "air_quality_sensor": rng.randint(0, 1023),
+                "light_sensor": rng.randint(0, 1023),
+                "temperature_sensor": rng.randint(0, 50),
+                "air_humidity_sensor": rng.randint(0, 100),
+                "soil_moisture_sensor": rng.randint(0, 1023),
+                "water_level_sensor": rng.choice((rng.uniform(0, 30), round(rng.uniform(0, 30), 2), 1.5e-5, 12)),
+            }
+            # Some fields missing, sometimes with stale ages
+            readings = {field: value for field, value in readings.items() if rng.random() < 0.8}
+            stale = {field: rng.choice(floats(rng, 1)) for field in readings if rng.random() < 0.2} or None
+            expected = SensorReading.model_validate({"timestamp": timestamp, "stale": stale, **readings}).model_dump_json()
+            assert ENCODER.full(encode_timestamp(timestamp), readings, stale) == expected
+
+
+def test_single_matches_model_dump_json():
+    rng = random.Random(1)
+    for timestamp in TIMESTAMPS:
+        text = encode_timestamp(timestamp)
+        for field in SENSOR_FIELDS:
+            values = floats(rng, 50) if field == "water_level_sensor" else list(range(0, 51))
+            for value in values:
+                if field == "water_level_sensor" and not 0 <= value <= 30:
+                    continue
+                for age in (None, rng.choice(floats(rng, 1))):
+                    expected = SensorReading.model_validate(
+                        {"timestamp": timestamp, "stale": {field: age} if age is not None else None, field: value}
+                    ).model_dump_json(exclude_none=True)
+                    assert ENCODER.single(text, field, value, age) == expected
+
+
+def test_calibrated_matches_model_dump_json():
+    rng = random.Random(2)
+    for timestamp in TIMESTAMPS:
+        for value in floats(rng, 500):
+            values = {"soil_vwc_percent": value, "light_lux": rng.uniform(0, 1e5)}
+            expected = CalibratedReading(timestamp=timestamp, values=values).model_dump_json()
+            assert ENCODER.calibrated(encode_timestamp(timestamp), values) == expected
+
+
+def main():
+    for test in (test_full_matches_model_dump_json, test_single_matches_model_dump_json, test_calibrated_matches_model_dump_json):
+        print(test.__name__)
+        try:
+            test()
+        except AssertionError as e:
+            print(f"Fail {e}")
+            return
+        print("Pass")
+
+
+if __name__ == "__main__":
+    main()
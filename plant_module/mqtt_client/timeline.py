@@ -0,0 +1,194 @@
+'''
+Per-actuator timeline of "on" windows.
+
+Schedules that keep an actuator on for a while (a light from 20:00 for an hour,
+every day) are stored here as windows instead of as independent on and off
+events. The timeline merges the occurrences of all windows into a sorted list of
+disjoint intervals, so overlapping schedules turn into one longer "on" period
+and only real state changes are ever fired.
+
+Repeating windows are unbounded, so occurrences are only expanded for a horizon
+(default one week, shortened so no window expands to more than
+MAX_OCCURRENCES occurrences) starting at the last queried time, and re-expanded
+when a query falls outside it. Within the horizon, "is the actuator on at t" and "when
+is the next transition after t" are binary searches, O(log n).
+'''
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, NamedTuple
+
+from .recurrence import CronSchedule
+
+# End of a window that never ends
+FOREVER = datetime.max
+# Most occurrences of one repeating window expanded at a time
+MAX_OCCURRENCES = 1024
+
+
+class Window(NamedTuple):
+    start: datetime
+    end: datetime | None = None # None: on from start onwards
+    repeat_interval: timedelta | None = None
+    recurrence: CronSchedule | None = None # repeats at these fire times instead of every repeat_interval
+
+    def occurrences(self, since: datetime, until: datetime = FOREVER) -> Iterator[tuple[datetime, datetime]]:
+        '''(start, end) of every occurrence that is still on after `since` and starts before `until`'''
+        end = self.end or FOREVER
+        if self.recurrence is not None and end != FOREVER:
+            duration = end - self.start
+            # First fire time whose occurrence is still on after `since`
+            start = self.start if self.start + duration > since else self.recurrence.next_after(since - duration)
+            while start is not None and start < until:
+                yield (start, start + duration)
+                start = self.recurrence.next_after(start)
+            return
+        if self.repeat_interval is None or end == FOREVER:
+            if end > since and self.start < until:
+                yield (self.start, end)
+            return
+        duration = end - self.start
+        period = self.repeat_interval
+        # Skip straight to the first occurrence that ends after `since`
+        skip = max(0, -((end - since) // period))
+        start = self.start + skip * period
+        while start < until:
+            if start + duration > since:
+                yield (start, start + duration)
+            start += period
+
+
+class ActuatorTimeline:
+    def __init__(self, horizon: timedelta = timedelta(days=7)) -> None:
+        self.horizon: timedelta = horizon
+        # schedule id -> its windows
+        self.windows: dict[str, list[Window]] = {}
+        # Merged, disjoint intervals: the actuator is on from _starts[i] until _ends[i]
+        self._starts: list[datetime] = []
+        self._ends: list[datetime] = []
+        # Range the intervals were expanded for; None when they need rebuilding
+        self._since: datetime | None = None
+        self._until: datetime = FOREVER
+
+    def __len__(self) -> int:
+        return len(self.windows)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.windows
+
+    def set(self, key: str, windows: Iterable[Window]) -> None:
+        '''Add the windows of schedule `key`, replacing any it had before'''
+        self.windows[key] = [window for window in windows if window.end is None or window.end > window.start]
+        self._since = None
+
+    def remove(self, key: str) -> bool:
+        if self.windows.pop(key, None) is None:
+            return False
+        self._since = None
+        return True
+
+    def clear(self) -> list[str]:
+        keys = list(self.windows)
+        self.windows.clear()
+        self._since = None
+        return keys
+
+    def _capped_horizon(self) -> timedelta:
+        '''The horizon, shortened so no window expands to more than MAX_OCCURRENCES occurrences'''
+        span = self.horizon
+        for windows in self.windows.values():
+            for window in windows:
+                if window.end is None:
+                    continue
+                if window.repeat_interval is not None:
+                    span = min(span, window.repeat_interval * MAX_OCCURRENCES)
+                elif window.recurrence is not None and window.recurrence.times:
+                    span = min(span, timedelta(days=MAX_OCCURRENCES / len(window.recurrence.times)))
+        return span
+
+    def _build(self, since: datetime, span: timedelta | None = None) -> None:
+        if span is None:
+            span = self._capped_horizon()
+        until = since + span if FOREVER - since > span else FOREVER
+        occurrences = sorted(
+            occurrence
+            for windows in self.windows.values()
+            for window in windows
+            for occurrence in window.occurrences(since, until)
+        )
+        starts: list[datetime] = []
+        ends: list[datetime] = []
+        for start, end in occurrences:
+            if ends and start <= ends[-1]:
+                # Overlaps or touches the previous interval: extend it
+                if end > ends[-1]:
+                    ends[-1] = end
+            else:
+                starts.append(start)
+                ends.append(end)
+        self._starts, self._ends = starts, ends
+        self._since, self._until = since, until
+
+    def _expanded_for(self, t: datetime) -> None:
+        if self._since is None or not self._since <= t < self._until:
+            self._build(t)
+
+    def intervals(self, since: datetime) -> list[tuple[datetime, datetime]]:
+        '''The merged on-intervals from `since` to the end of the horizon'''
+        self._expanded_for(since)
+        return list(zip(self._starts, self._ends))
+
+    def state_at(self, t: datetime) -> bool:
+        '''Whether any window has the actuator on at `t`'''
+        self._expanded_for(t)
+        index = bisect_right(self._starts, t) - 1
+        return index >= 0 and t < self._ends[index]
+
+    def next_transition(self, after: datetime) -> tuple[datetime, bool] | None:
+        '''
+        The first state change strictly after `after` as (time, on), or None if
+        the state never changes again.
+        '''
+        self._expanded_for(after)
+        extensions = 0
+        while True:
+            index = bisect_right(self._starts, after) - 1
+            if index >= 0 and after < self._ends[index]:
+                at, on = self._ends[index], False
+            elif index + 1 < len(self._starts):
+                at, on = self._starts[index + 1], True
+            else:
+                # Off for the rest of the horizon. Every occurrence that starts
+                # inside it is already expanded, so the next start is the first
+                # occurrence of any window after the horizon.
+                if self._until == FOREVER:
+                    return None
+                starts = [
+                    occurrence[0]
+                    for windows in self.windows.values()
+                    for window in windows
+                    if (occurrence := next(window.occurrences(self._until), None)) is not None
+                ]
+                return (min(starts), True) if starts else None
+            if at == FOREVER:
+                return None
+            if at < self._until:
+                return (at, on)
+            # The interval runs past the horizon and may merge with occurrences
+            # beyond it; expand further so its end is exact
+            if extensions == 3:
+                # Windows that overlap back to back for a long time: report the
+                # end found so far, state_at() will still say on when it arrives
+                return (at, on)
+            extensions += 1
+            # Doubled from the capped horizon, not from the current range, so a
+            # range extended by an earlier call doesn't grow again on every call
+            self._build(after, self._capped_horizon() * 2 ** extensions)
+
+    def next_start(self, key: str, after: datetime) -> datetime | None:
+        '''Start of the first occurrence of schedule `key` that is still on after `after`'''
+        starts = [
+            occurrence[0]
+            for window in self.windows.get(key, [])
+            if (occurrence := next(window.occurrences(after), None)) is not None
+        ]
+        return min(starts) if starts else None
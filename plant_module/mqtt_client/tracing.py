@@ -0,0 +1,167 @@
+'''
+Optional sampled tracing of control messages.
+
+A :class:`Trace` is started when a message is received (subject to the sample
+rate) and travels with it through a :class:`contextvars.ContextVar`, so every
+stage that runs on its behalf (dispatcher queue, decode, ``create_task`` hop,
+scheduler insertion, firing, actuator hand-off) can add a span without the
+trace being passed around explicitly. ``asyncio.create_task`` copies the
+context, and :class:`ScheduledEvent` captures the trace at creation so spans
+recorded when it fires later belong to the same trace id.
+
+Spans are timestamped with :func:`time.monotonic_ns` and written as Chrome
+Trace Event Format "complete" events, one per line, to a size-rotated file.
+Each file starts with ``[`` and may be loaded directly in Perfetto or
+``chrome://tracing`` (the closing bracket is optional in that format).
+
+Tracing is disabled until :func:`configure` is called; when disabled,
+:func:`start_trace` returns None and :func:`span` is a no-op.
+'''
+import contextlib
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from contextvars import ContextVar, Token
+from typing import Any, Iterator
+
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 3
+
+
+class TraceWriter:
+    """Appends trace events to ``path``, rotating to ``path.1`` .. ``path.N`` when full"""
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES, backup_count: int = DEFAULT_BACKUP_COUNT) -> None:
+        self.path: str = path
+        self.max_bytes: int = max_bytes
+        self.backup_count: int = backup_count
+        self._lock: threading.Lock = threading.Lock()
+        self._file = self._open()
+
+    def _open(self):
+        f = open(self.path, "a", encoding="utf-8")
+        if f.tell() == 0:
+            _ = f.write("[\n")
+        return f
+
+    def _rotate(self) -> None:
+        self._file.close()
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = self._open()
+
+    def write(self, event: dict[str, Any]) -> None:
+        line = json.dumps(event, separators=(",", ":")) + ",\n"
+        with self._lock:
+            if self._file.tell() + len(line) > self.max_bytes:
+                self._rotate()
+            _ = self._file.write(line)
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class Trace:
+    """
+    One sampled message's journey. Spans share ``trace_id`` and are written as
+    soon as they end, so a trace whose event fires hours later is still recorded.
+    """
+    def __init__(self, writer: TraceWriter, name: str, **args: Any) -> None:
+        self.trace_id: str = uuid.uuid4().hex[:16]
+        self.writer: TraceWriter = writer
+        self.args: dict[str, Any] = args
+        self.start_ns: int = time.monotonic_ns()
+        # Use a stable per-trace track so each trace renders on its own row
+        self._tid: int = int(self.trace_id[:8], 16)
+        self._marks: dict[str, int] = {}
+        self.record(name, self.start_ns, self.start_ns)
+
+    def record(self, name: str, start_ns: int, end_ns: int, **args: Any) -> None:
+        self.writer.write({
+            "name": name,
+            "cat": "control",
+            "ph": "X",
+            "ts": start_ns / 1000,
+            "dur": (end_ns - start_ns) / 1000,
+            "pid": os.getpid(),
+            "tid": self._tid,
+            "args": {"trace_id": self.trace_id, **self.args, **args},
+        })
+
+    def mark(self, name: str) -> None:
+        """Remember the start of a stage that ends somewhere else (see :meth:`end`)"""
+        self._marks[name] = time.monotonic_ns()
+
+    def end(self, name: str, **args: Any) -> None:
+        """Record the span from :meth:`mark` to now; no-op if the mark is missing"""
+        start = self._marks.pop(name, None)
+        if start is not None:
+            self.record(name, start, time.monotonic_ns(), **args)
+
+    @contextlib.contextmanager
+    def span(self, name: str, **args: Any) -> Iterator[None]:
+        start = time.monotonic_ns()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.monotonic_ns(), **args)
+
+
+_current_trace: ContextVar[Trace | None] = ContextVar("current_trace", default=None)
+_writer: TraceWriter | None = None
+_sample_rate: float = 0.0
+
+
+def configure(path: str, sample_rate: float = 1.0, max_bytes: int = DEFAULT_MAX_BYTES, backup_count: int = DEFAULT_BACKUP_COUNT) -> None:
+    """Enable tracing, sampling ``sample_rate`` (0..1) of started traces into ``path``"""
+    global _writer, _sample_rate
+    if _writer is not None:
+        _writer.close()
+    _writer = TraceWriter(path, max_bytes, backup_count)
+    _sample_rate = sample_rate
+
+
+def disable() -> None:
+    global _writer, _sample_rate
+    if _writer is not None:
+        _writer.close()
+    _writer = None
+    _sample_rate = 0.0
+
+
+def start_trace(name: str, **args: Any) -> Trace | None:
+    """Start a new trace if tracing is enabled and this call is sampled"""
+    if _writer is None or random.random() >= _sample_rate:
+        return None
+    return Trace(_writer, name, **args)
+
+
+def current_trace() -> Trace | None:
+    return _current_trace.get()
+
+
+def activate(trace: Trace | None) -> Token[Trace | None]:
+    """Make ``trace`` current for this context; undo with :func:`deactivate`"""
+    return _current_trace.set(trace)
+
+
+def deactivate(token: Token[Trace | None]) -> None:
+    _current_trace.reset(token)
+
+
+def span(name: str, **args: Any) -> contextlib.AbstractContextManager[None]:
+    """Span on the current trace, or a no-op when the current message is not traced"""
+    trace = _current_trace.get()
+    if trace is None:
+        return contextlib.nullcontext()
+    return trace.span(name, **args)